@@ -0,0 +1,148 @@
+import numpy as np
+import pandas as pd
+
+from enums.lingagem import Linguagem
+from enums.tipo_codigo import TipoCodigo
+
+METRICAS = ['complexidade_ciclomatica', 'divida_tecnica', 'code_smells', 'loc']
+
+# Ordem fixa das categorias: os gráficos saem sempre com o mesmo eixo e legenda
+TIPOS = pd.CategoricalDtype([tipo.value for tipo in TipoCodigo], ordered=True)
+LINGUAGENS = pd.CategoricalDtype([linguagem.value for linguagem in Linguagem], ordered=True)
+
+
+def estatisticas_boxplot(valores, contagens, rotulo):
+    """
+    Estatísticas de um boxplot (formato de Axes.bxp) a partir de uma tabela de frequência
+    (valores distintos em ordem crescente e quantas vezes cada um aparece). Mesmo cálculo de
+    matplotlib.cbook.boxplot_stats: quartis com interpolação linear e bigodes a 1,5 IQR.
+    """
+    valores = np.asarray(valores, dtype=float)
+    acumulado = np.cumsum(contagens)
+    total = acumulado[-1]
+
+    def quantil(p):
+        # Valor na posição k (0-based) dos dados ordenados = primeiro valor com acumulado > k
+        posicao = (total - 1) * p
+        inferior = valores[np.searchsorted(acumulado, np.floor(posicao), side='right')]
+        superior = valores[np.searchsorted(acumulado, np.ceil(posicao), side='right')]
+        return inferior + (superior - inferior) * (posicao - np.floor(posicao))
+
+    q1, mediana, q3 = quantil(0.25), quantil(0.5), quantil(0.75)
+    iqr = q3 - q1
+    dentro_superior = valores[valores <= q3 + 1.5 * iqr]
+    dentro_inferior = valores[valores >= q1 - 1.5 * iqr]
+    bigode_superior = dentro_superior.max() if len(dentro_superior) and dentro_superior.max() >= q3 else q3
+    bigode_inferior = dentro_inferior.min() if len(dentro_inferior) and dentro_inferior.min() <= q1 else q1
+    return {
+        'label': rotulo,
+        'med': mediana,
+        'q1': q1,
+        'q3': q3,
+        'whislo': bigode_inferior,
+        'whishi': bigode_superior,
+        'mean': float(np.dot(valores, contagens) / total),
+        # Um ponto por valor distinto: repetições cairiam no mesmo lugar do gráfico
+        'fliers': valores[(valores < bigode_inferior) | (valores > bigode_superior)],
+    }
+
+
+def compactar_categorias(df):
+    df = df.copy()
+    for coluna in df.select_dtypes('category').columns:
+        df[coluna] = df[coluna].cat.remove_unused_categories()
+    return df
+
+
+class CubosResultados:
+    """
+    Resultados pré-agregados para os gráficos, calculados uma única vez:
+      - medias: contagem e soma de cada métrica por (modelo, tipo, linguagem);
+      - dispersao: frequência de cada par (loc, complexidade) por (tipo, linguagem).
+    As médias de qualquer agrupamento saem das somas; os boxplots de complexidade e LOC
+    saem das frequências (a dispersão somada em um dos eixos). Os cubos podem ser montados
+    em memória (de_linhas) ou pelo próprio banco com GROUP BY (do_banco).
+    """
+
+    def __init__(self, medias, dispersao):
+        self.medias = medias
+        self.dispersao = dispersao
+
+    @classmethod
+    def de_linhas(cls, linhas, modelos, tamanho_bloco=50000):
+        """
+        Carrega as linhas (dicts de getAllResultadosStream) em blocos, já em colunas tipadas:
+        categorias fixas para modelo/tipo/linguagem e inteiros de 32 bits para as métricas.
+        """
+        tipos_colunas = {
+            'modelo': pd.CategoricalDtype(modelos),
+            'tipo': TIPOS,
+            'linguagem': LINGUAGENS,
+            **{metrica: 'int32' for metrica in METRICAS},
+        }
+        colunas = list(tipos_colunas)
+        blocos, bloco = [], []
+        for linha in linhas:
+            bloco.append(linha)
+            if len(bloco) >= tamanho_bloco:
+                blocos.append(cls.converter_bloco(bloco, colunas, tipos_colunas))
+                bloco = []
+        if bloco or not blocos:
+            blocos.append(cls.converter_bloco(bloco, colunas, tipos_colunas))
+        return cls.de_dataframe(pd.concat(blocos, ignore_index=True))
+
+    @staticmethod
+    def converter_bloco(bloco, colunas, tipos_colunas):
+        df = pd.DataFrame.from_records(bloco, columns=colunas)
+        df[METRICAS] = df[METRICAS].fillna(0)
+        return df.astype(tipos_colunas)
+
+    @classmethod
+    def de_dataframe(cls, df):
+        """Os dois cubos em uma passada de groupby cada, sem combinações vazias (observed=True)"""
+        medias = df.groupby(['modelo', 'tipo', 'linguagem'], observed=True).agg(
+            contagem=('loc', 'size'),
+            **{f"soma_{metrica}": (metrica, 'sum') for metrica in METRICAS},
+        ).reset_index()
+        dispersao = (
+            df.groupby(['tipo', 'linguagem', 'loc', 'complexidade_ciclomatica'], observed=True)
+            .size().rename('contagem').reset_index()
+        )
+        return cls(medias, dispersao)
+
+    @classmethod
+    def do_banco(cls, repository):
+        """Cubos agregados pelo MySQL: nenhuma linha de resultado sai do banco"""
+        medias = pd.DataFrame(repository.getCuboMediasResultados(), columns=['modelo', 'tipo', 'linguagem', 'contagem', *(f"soma_{m}" for m in METRICAS)])
+        dispersao = pd.DataFrame(repository.getCuboDispersaoResultados(), columns=['tipo', 'linguagem', 'loc', 'complexidade_ciclomatica', 'contagem'])
+        for df in (medias, dispersao):
+            df['tipo'] = df['tipo'].astype(TIPOS)
+            df['linguagem'] = df['linguagem'].astype(LINGUAGENS)
+        medias['modelo'] = medias['modelo'].astype('category')
+        return cls(medias, dispersao)
+
+    def filtrar(self, tipos):
+        """Cubos só com os tipos de código informados (sem as categorias que ficaram vazias, que o seaborn desenharia)"""
+        return CubosResultados(
+            compactar_categorias(self.medias[self.medias['tipo'].isin(tipos)]),
+            compactar_categorias(self.dispersao[self.dispersao['tipo'].isin(tipos)]),
+        )
+
+    @property
+    def total(self):
+        return int(self.medias['contagem'].sum())
+
+    def media(self, metrica, por):
+        """Média de `metrica` agrupada pelas colunas `por` (subconjunto de modelo, tipo, linguagem)"""
+        agrupado = self.medias.groupby(por, observed=True)[['contagem', f"soma_{metrica}"]].sum()
+        return compactar_categorias((agrupado[f"soma_{metrica}"] / agrupado['contagem']).rename(metrica).reset_index())
+
+    def boxplots(self, metrica, grupo_x, grupo_cor):
+        """{(valor de grupo_x, valor de grupo_cor): estatísticas do boxplot} para 'loc' ou 'complexidade_ciclomatica'"""
+        frequencias = self.dispersao.groupby(['tipo', 'linguagem', metrica], observed=True)['contagem'].sum().reset_index()
+        estatisticas = {}
+        for (valor_x, valor_cor), grupo in frequencias.groupby([grupo_x, grupo_cor], observed=True):
+            grupo = grupo[grupo['contagem'] > 0].sort_values(metrica)
+            if not grupo.empty:
+                estatisticas[(valor_x, valor_cor)] = estatisticas_boxplot(grupo[metrica].to_numpy(), grupo['contagem'].to_numpy(), valor_x)
+        return estatisticas
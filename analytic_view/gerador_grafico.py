@@ -1,8 +1,5 @@
 import os
 import sys
-import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
 root_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
 if root_path not in sys.path:
     sys.path.append(root_path)
@@ -10,10 +7,39 @@ if root_path not in sys.path:
 from enums.tipo_codigo import TipoCodigo
 from repository.repository import Repository
 
+# pandas, matplotlib e seaborn só são importados quando algum gráfico vai ser gerado
+plt = None
+sns = None
+mpatches = None
+CubosResultados = None
+
+
+def carregar_bibliotecas_graficas():
+    global plt, sns, mpatches, CubosResultados
+    if plt is None:
+        import matplotlib
+        matplotlib.use('Agg')
+        import matplotlib.patches
+        import matplotlib.pyplot
+        import seaborn
+        from analytic_view.cubos_analiticos import CubosResultados as cubos
+        plt, sns, mpatches, CubosResultados = matplotlib.pyplot, seaborn, matplotlib.patches, cubos
+
 class GeradorGrafico:
     def __init__(self):
         self.repository = Repository()
+        self.estilo_configurado = False
         
+        # Pasta de saída para as imagens
+        self.output_dir = "resultados_tcc_graficos_finais"
+        if not os.path.exists(self.output_dir):
+            os.makedirs(self.output_dir)
+
+    def configurar_estilo(self):
+        carregar_bibliotecas_graficas()
+        if self.estilo_configurado:
+            return
+        self.estilo_configurado = True
         sns.set_theme(style="whitegrid", context="paper")
         plt.rcParams.update({
             'figure.figsize': [12, 6],
@@ -26,11 +52,6 @@ class GeradorGrafico:
             'savefig.dpi': 300, 
             'figure.autolayout': True 
         })
-        
-        # Pasta de saída para as imagens
-        self.output_dir = "resultados_tcc_graficos_finais"
-        if not os.path.exists(self.output_dir):
-            os.makedirs(self.output_dir)
 
     def salvar_figura(self, nome_arquivo):
         """Auxiliar para salvar e limpar a memória do Matplotlib"""
@@ -39,10 +60,13 @@ class GeradorGrafico:
         print(f"Gráfico final salvo em: {caminho}")
         plt.close()
 
-    def gerar_todos_os_graficos(self):
-        print("Buscando dados atualizados no banco de dados...")
-        resultados = self.repository.getAllResultados()
-
+    def gerar_todos_os_graficos(self, dry_run=False, agregar_no_banco=None):
+        """
+        Monta os cubos pré-agregados uma única vez e gera os dois conjuntos de gráficos a partir deles.
+        Com `agregar_no_banco` (--banco ou GRAFICOS_AGREGACAO=banco) o GROUP BY roda no MySQL.
+        """
+        if agregar_no_banco is None:
+            agregar_no_banco = os.getenv('GRAFICOS_AGREGACAO', 'memoria') == 'banco'
 
         tipos_baseline = {
             TipoCodigo.BASELINE.value, 
@@ -55,45 +79,78 @@ class GeradorGrafico:
             TipoCodigo.REFATORADO_ORIGEM_SIMPLIFICADO.value, 
             TipoCodigo.REFATORADO_SIMPLIFICADO_ORIGEM_SIMPLIFICADO.value
         }
-        self.processa_imagens(resultados=resultados, tipos=tipos_baseline, nome_complementar_arquivo="baseline")
-        self.processa_imagens(resultados=resultados, tipos=tipos_baseline_simplificado, nome_complementar_arquivo="baseline_simplificado")
+        if dry_run:
+            # Só confere o volume de dados de cada conjunto (contagens agregadas pelo banco), sem carregar as bibliotecas gráficas
+            medias = self.repository.getCuboMediasResultados()
+            for nome, tipos in (("baseline", tipos_baseline), ("baseline_simplificado", tipos_baseline_simplificado)):
+                print(f"{nome}: {sum(linha['contagem'] for linha in medias if linha['tipo'] in tipos)} registros.")
+            return
 
+        self.configurar_estilo()
+        print(f"Buscando dados atualizados no banco de dados ({'agregação no banco' if agregar_no_banco else 'agregação em memória'})...")
+        if agregar_no_banco:
+            cubos = CubosResultados.do_banco(self.repository)
+        else:
+            modelos = [m['nome_modelo'] for m in self.repository.select_into_table(table_name="modelos", campos=["nome_modelo"])]
+            cubos = CubosResultados.de_linhas(self.repository.getAllResultadosStream(), modelos)
 
-    def processa_imagens(self, resultados, tipos, nome_complementar_arquivo=""):
-        # Realizando o filtro
-        resultados_filtrados = [
-            x for x in resultados 
-            if x['tipo'] in tipos
-        ]
-        df = pd.DataFrame(resultados_filtrados)
-        
-        if df.empty:
-            print("Erro: O DataFrame está vazio. Verifique a sintaxe SQL e a conexão.")
+        self.processa_imagens(cubos=cubos, tipos=tipos_baseline, nome_complementar_arquivo="baseline")
+        self.processa_imagens(cubos=cubos, tipos=tipos_baseline_simplificado, nome_complementar_arquivo="baseline_simplificado")
+
+
+    def processa_imagens(self, cubos, tipos, nome_complementar_arquivo=""):
+        self.configurar_estilo()
+        cubos = cubos.filtrar(tipos)
+
+        if cubos.total == 0:
+            print("Erro: Nenhum resultado para esses tipos. Verifique a sintaxe SQL e a conexão.")
             return
 
-        print(f"Processando {len(df)} registros para visualização final...")
+        print(f"Processando {cubos.total} registros para visualização final...")
 
-        self.plot_boxplot_complexidade_zoom(df, nome_complementar_arquivo)
-        self.plot_barras_llm_divida_final(df, nome_complementar_arquivo)
-        self.plot_facet_code_smells_final(df, nome_complementar_arquivo)
-        self.plot_scatter_loc_complexidade_densidade(df, nome_complementar_arquivo)
-        self.plot_scatter_loc_complexidade_zoom(df, nome_complementar_arquivo)
-        self.plot_boxplot_loc_zoom(df, nome_complementar_arquivo)
+        self.plot_boxplot_complexidade_zoom(cubos, nome_complementar_arquivo)
+        self.plot_barras_llm_divida_final(cubos, nome_complementar_arquivo)
+        self.plot_facet_code_smells_final(cubos, nome_complementar_arquivo)
+        self.plot_scatter_loc_complexidade_densidade(cubos, nome_complementar_arquivo)
+        self.plot_scatter_loc_complexidade_zoom(cubos, nome_complementar_arquivo)
+        self.plot_boxplot_loc_zoom(cubos, nome_complementar_arquivo)
         print(f"\n✅ Processo concluído! Gráficos salvos na pasta '{self.output_dir}'.")
 
+    def desenhar_boxplot(self, estatisticas, ordem_x, ordem_cor, paleta, titulo_legenda):
+        """Boxplots agrupados por cor (como o hue do seaborn) desenhados com Axes.bxp a partir das estatísticas do cubo"""
+        ax = plt.gca()
+        cores = sns.color_palette(paleta, len(ordem_cor))
+        largura = 0.8 / len(ordem_cor)
+        for indice_cor, (valor_cor, cor) in enumerate(zip(ordem_cor, cores)):
+            posicoes, caixas = [], []
+            for indice_x, valor_x in enumerate(ordem_x):
+                if (valor_x, valor_cor) in estatisticas:
+                    posicoes.append(indice_x - 0.4 + largura * (indice_cor + 0.5))
+                    caixas.append(estatisticas[(valor_x, valor_cor)])
+            if caixas:
+                ax.bxp(
+                    caixas, positions=posicoes, widths=largura * 0.9, patch_artist=True, manage_ticks=False,
+                    showmeans=True,
+                    meanprops={"marker":"D", "markerfacecolor":"white", "markeredgecolor":"black", "markersize":"6"},
+                    boxprops={"facecolor": cor},
+                    medianprops={"color": "black"},
+                    flierprops={"marker": "d", "markersize": 4, "markerfacecolor": "0.3"}
+                )
+        ax.set_xticks(range(len(ordem_x)), ordem_x)
+        ax.set_xlim(-0.5, len(ordem_x) - 0.5)
+        ax.legend(handles=[mpatches.Patch(facecolor=cor, label=valor) for valor, cor in zip(ordem_cor, cores)], title=titulo_legenda)
+
 
-    def plot_boxplot_complexidade_zoom(self, df, nome_complementar_arquivo=""):
+    def plot_boxplot_complexidade_zoom(self, cubos, nome_complementar_arquivo=""):
         """Gráfico 1: Impacto da refatoração na Complexidade com Zoom nos dados principais"""
         plt.figure(figsize=(10, 6))
         
-        sns.boxplot(
-            data=df, 
-            x='tipo', 
-            y='complexidade_ciclomatica', 
-            hue='linguagem', 
-            palette='Set2',
-            showmeans=True,
-            meanprops={"marker":"D", "markerfacecolor":"white", "markeredgecolor":"black", "markersize":"6"}
+        self.desenhar_boxplot(
+            cubos.boxplots('complexidade_ciclomatica', 'tipo', 'linguagem'),
+            ordem_x=list(cubos.dispersao['tipo'].cat.categories),
+            ordem_cor=list(cubos.dispersao['linguagem'].cat.categories),
+            paleta='Set2',
+            titulo_legenda='linguagem'
         )
         
         plt.title('Distribuição da Complexidade Ciclomática por Estratégia')
@@ -104,11 +161,11 @@ class GeradorGrafico:
         
         self.salvar_figura(f'01_boxplot_complexidade_zoom{nome_complementar_arquivo}.png')
 
-    def plot_barras_llm_divida_final(self, df, nome_complementar_arquivo=""):
+    def plot_barras_llm_divida_final(self, cubos, nome_complementar_arquivo=""):
         """Gráfico 2: Qual LLM gera código com menor dívida técnica média"""
         plt.figure(figsize=(12, 6))
         
-        df_grouped = df.groupby(['modelo', 'tipo'])['divida_tecnica'].mean().reset_index()
+        df_grouped = cubos.media('divida_tecnica', ['modelo', 'tipo'])
         
         sns.barplot(data=df_grouped, x='modelo', y='divida_tecnica', hue='tipo', palette='mako')
         
@@ -119,8 +176,10 @@ class GeradorGrafico:
         plt.legend(title='Estratégia', bbox_to_anchor=(1.01, 1), loc='upper left')
         self.salvar_figura(f'02_media_divida_tecnica_llm{nome_complementar_arquivo}.png')
 
-    def plot_facet_code_smells_final(self, df, nome_complementar_arquivo=""):
+    def plot_facet_code_smells_final(self, cubos, nome_complementar_arquivo=""):
         """Gráfico 3: Comparação detalhada de Code Smells por Linguagem e Modelo"""
+        # Uma linha por (linguagem, modelo, tipo) com a média: a barra é a própria média
+        df = cubos.media('code_smells', ['linguagem', 'modelo', 'tipo'])
         g = sns.FacetGrid(df, col="linguagem", height=5, aspect=1.2, sharey=True)
         
         g.map_dataframe(sns.barplot, x="modelo", y="code_smells", hue="tipo", palette='rocket', errorbar=None)
@@ -135,12 +194,21 @@ class GeradorGrafico:
         g.savefig(caminho, dpi=300)
         plt.close()
 
-    def plot_scatter_loc_complexidade_densidade(self, df, nome_complementar_arquivo=""):
+    @staticmethod
+    def opacidade_sobreposta(eixo, contagens, alpha):
+        """
+        A dispersão tem um ponto por par (loc, complexidade) distinto: cada um recebe a opacidade
+        de `contagem` pontos iguais sobrepostos com `alpha`, como no gráfico de uma linha por resultado
+        (a legenda continua com `alpha`)
+        """
+        eixo.collections[-1].set_alpha(1 - (1 - alpha) ** contagens.to_numpy())
+
+    def plot_scatter_loc_complexidade_densidade(self, cubos, nome_complementar_arquivo=""):
         """Gráfico 4: Correlação entre tamanho do código e complexidade com ajuste de densidade"""
         plt.figure(figsize=(10, 7))
         
-        sns.scatterplot(
-            data=df, 
+        eixo = sns.scatterplot(
+            data=cubos.dispersao, 
             x='loc', 
             y='complexidade_ciclomatica', 
             hue='tipo', 
@@ -148,6 +216,7 @@ class GeradorGrafico:
             alpha=0.3,
             s=20 
         )
+        self.opacidade_sobreposta(eixo, cubos.dispersao['contagem'], 0.3)
         
         plt.title('Correlação: Tamanho do Código (LOC) vs Complexidade')
         plt.xlabel('Linhas de Código (ncloc)')
@@ -157,11 +226,11 @@ class GeradorGrafico:
         
         self.salvar_figura(f'04_dispersao_loc_complexidade_densidade{nome_complementar_arquivo}.png')
 
-    def plot_scatter_loc_complexidade_zoom(self, df, nome_complementar_arquivo=""):
+    def plot_scatter_loc_complexidade_zoom(self, cubos, nome_complementar_arquivo=""):
         """Gráfico 4 (Opção A): Dispersão com Zoom para remover outlier extremo"""
         plt.figure(figsize=(10, 7))
-        sns.scatterplot(
-            data=df, 
+        eixo = sns.scatterplot(
+            data=cubos.dispersao, 
             x='loc', 
             y='complexidade_ciclomatica', 
             hue='tipo', 
@@ -169,6 +238,7 @@ class GeradorGrafico:
             alpha=0.3,
             s=15
         )
+        self.opacidade_sobreposta(eixo, cubos.dispersao['contagem'], 0.3)
         
         plt.title('Correlação: LOC vs Complexidade (Foco na Maioria dos Dados)')
         plt.xlabel('Linhas de Código (ncloc)')
@@ -182,18 +252,16 @@ class GeradorGrafico:
         
         self.salvar_figura(f'04_dispersao_loc_complexidade_zoom{nome_complementar_arquivo}.png')
 
-    def plot_boxplot_loc_zoom(self, df, nome_complementar_arquivo=""):
+    def plot_boxplot_loc_zoom(self, cubos, nome_complementar_arquivo=""):
         """Gráfico 5: Verificação do volume de código com Zoom e Médias"""
         plt.figure(figsize=(10, 6))
         
-        sns.boxplot(
-            data=df, 
-            x='linguagem', 
-            y='loc', 
-            hue='tipo', 
-            palette='pastel',
-            showmeans=True,
-            meanprops={"marker":"D", "markerfacecolor":"white", "markeredgecolor":"black", "markersize":"6"}
+        self.desenhar_boxplot(
+            cubos.boxplots('loc', 'linguagem', 'tipo'),
+            ordem_x=list(cubos.dispersao['linguagem'].cat.categories),
+            ordem_cor=list(cubos.dispersao['tipo'].cat.categories),
+            paleta='pastel',
+            titulo_legenda='tipo'
         )
         
         plt.title('Variação de Linhas de Código (LOC) por Estratégia')
@@ -207,4 +275,4 @@ class GeradorGrafico:
 # Execução do script
 if __name__ == "__main__":
     gerador = GeradorGrafico()
-    gerador.gerar_todos_os_graficos()
\ No newline at end of file
+    gerador.gerar_todos_os_graficos(dry_run="--dry-run" in sys.argv, agregar_no_banco=True if "--banco" in sys.argv else None)
\ No newline at end of file
@@ -0,0 +1,73 @@
+import os
+import re
+import statistics
+import subprocess
+import sys
+root_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+# Orçamento de inicialização (ms) de cada script com __main__: tempo só para importar o módulo,
+# descontado o tempo de subir o interpretador. Ajuste aqui ao adicionar um novo ponto de entrada.
+ORCAMENTOS_MS = {
+    'gerar_codigo_llm.gerador_baseline': 400,
+    'gerar_codigo_llm.gerador_refatorado': 400,
+    'gerar_codigo_llm.pipeline_geracao': 450,
+    'sonarqube.executa_sonarqube': 350,
+    'carga_leetcode.carga_leetcode': 300,
+    'analytic_view.gerador_grafico': 250,
+}
+
+PADRAO_IMPORTTIME = re.compile(r'import time:\s+(\d+)\s+\|\s+(\d+)\s+\|\s*(\S+)')
+
+
+def tempo_importacao(modulo, repeticoes):
+    """Mediana (ms) do tempo para importar o módulo em um interpretador novo"""
+    codigo = (
+        "import sys, time; sys.path.insert(0, %r); inicio = time.perf_counter(); "
+        "import %s; print((time.perf_counter() - inicio) * 1000)" % (root_path, modulo)
+    )
+    tempos = []
+    for _ in range(repeticoes):
+        saida = subprocess.run([sys.executable, '-c', codigo], cwd=root_path, capture_output=True, text=True, check=True)
+        tempos.append(float(saida.stdout.strip().splitlines()[-1]))
+    return statistics.median(tempos)
+
+
+def imports_mais_pesados(modulo, quantidade=5):
+    """Bibliotecas externas que mais pesam na importação (tempo acumulado), segundo python -X importtime"""
+    codigo = "import sys; sys.path.insert(0, %r); import %s" % (root_path, modulo)
+    saida = subprocess.run([sys.executable, '-X', 'importtime', '-c', codigo], cwd=root_path, capture_output=True, text=True)
+    pacotes_projeto = {nome for nome in os.listdir(root_path) if os.path.isdir(os.path.join(root_path, nome))}
+    tempos = {}
+    for linha in saida.stderr.splitlines():
+        encontrado = PADRAO_IMPORTTIME.match(linha)
+        if not encontrado:
+            continue
+        pacote = encontrado.group(3).split('.')[0]
+        if pacote not in pacotes_projeto:
+            tempos[pacote] = max(tempos.get(pacote, 0), int(encontrado.group(2)) / 1000)
+    return sorted(tempos.items(), key=lambda item: item[1], reverse=True)[:quantidade]
+
+
+def executar(repeticoes=5):
+    estourados = []
+    for modulo, orcamento in ORCAMENTOS_MS.items():
+        try:
+            tempo = tempo_importacao(modulo, repeticoes)
+        except subprocess.CalledProcessError as e:
+            print(f"{modulo}: falha ao importar\n{e.stderr}")
+            estourados.append(modulo)
+            continue
+        situacao = "ok" if tempo <= orcamento else "ACIMA DO ORÇAMENTO"
+        print(f"{modulo}: {tempo:.0f} ms (orçamento {orcamento} ms) {situacao}")
+        if tempo > orcamento:
+            estourados.append(modulo)
+            for nome, tempo_import in imports_mais_pesados(modulo):
+                print(f"    {nome}: {tempo_import:.0f} ms")
+    return estourados
+
+
+if __name__ == "__main__":
+    estourados = executar(int(os.getenv('BENCHMARK_REPETICOES', 5)))
+    if estourados:
+        print(f"{len(estourados)} ponto(s) de entrada acima do orçamento de inicialização.")
+        sys.exit(1)
@@ -0,0 +1,132 @@
+import os
+import sys
+import uuid
+root_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if root_path not in sys.path:
+    sys.path.append(root_path)
+
+from repository.repository import Repository
+
+# Abaixo disso o otimizador pode preferir varredura completa mesmo com índice, e o teste perde valor
+MINIMO_LINHAS = 100000
+
+
+def consultas(repository):
+    """
+    (nome, sql, valores, expectativas). Expectativas por tabela (alias) do EXPLAIN:
+    'chave' é o índice que deve ser usado e 'somente_indice' exige "Using index" no Extra.
+    """
+    sql_refatoracao, valores_refatoracao = repository.sql_resultados_baseline_nao_executados('refatorado', 10000)
+    sql_metricas, valores_metricas = repository.montar_select(
+        "resultados", campos=["id_resultado", "codigo_fonte", "linguagem"], data={'status_metricas': 'pendente'}, size=10000)
+    sql_tipo, valores_tipo = repository.montar_select(
+        "resultados", campos=["id_resultado", "id_desafio", "id_modelo", "codigo_fonte", "linguagem"],
+        filter="tipo = 'baseline' and codigo_fonte is not null", size=10000)
+    return [
+        ("baseline sem refatoração", sql_refatoracao, valores_refatoracao, {
+            'BASELINE': {'chave': 'idx_resultados_tipo'},
+            'REFATORADO': {'chave': 'uk_resultados_chave', 'somente_indice': True},
+        }),
+        ("resultados sem métricas", sql_metricas, valores_metricas, {
+            'resultados': {'chave': 'idx_resultados_status_metricas'},
+        }),
+        ("resultados por tipo", sql_tipo, valores_tipo, {
+            'resultados': {'chave': 'idx_resultados_tipo'},
+        }),
+    ]
+
+
+def verificar_plano(repository, nome, sql, valores, expectativas):
+    """Roda EXPLAIN e devolve a lista de problemas encontrados no plano"""
+    repository.get_connection()
+    cursor = repository.conn.cursor(dictionary=True)
+    try:
+        cursor.execute(f"EXPLAIN {sql}", valores)
+        plano = cursor.fetchall()
+    finally:
+        cursor.close()
+
+    problemas = []
+    for linha in plano:
+        tabela = linha.get('table')
+        extra = linha.get('Extra') or ''
+        print(f"  {tabela}: type={linha.get('type')} key={linha.get('key')} rows={linha.get('rows')} extra={extra}")
+        if linha.get('type') == 'ALL':
+            problemas.append(f"{nome}: varredura completa em {tabela}")
+        esperado = expectativas.get(tabela)
+        if not esperado:
+            continue
+        if linha.get('key') != esperado['chave']:
+            problemas.append(f"{nome}: {tabela} usa {linha.get('key')} em vez de {esperado['chave']}")
+        if esperado.get('somente_indice') and 'Using index' not in extra:
+            problemas.append(f"{nome}: {tabela} deveria ser resolvida só no índice")
+    return problemas
+
+
+def semear(repository, quantidade):
+    """Gera `quantidade` resultados sintéticos; só permitido em bancos de teste (DB_NAME terminando em _teste)"""
+    if not (repository.db_config['database'] or '').endswith('_teste'):
+        raise SystemExit("--semear só pode ser usado com DB_NAME terminando em '_teste'.")
+
+    modelos = repository.select_into_table("modelos", campos=["id_modelo"])
+    if not modelos:
+        repository.insert_many("modelos", [{'nome_modelo': 'TESTE'}])
+        modelos = repository.select_into_table("modelos", campos=["id_modelo"])
+    # Cada desafio gera modelos x 2 linguagens x 2 tipos resultados
+    por_desafio = len(modelos) * 4
+    quantidade_desafios = -(-quantidade // por_desafio)
+    # Prefixo próprio de cada semeadura: rodar de novo cria desafios novos em vez de reaproveitar
+    # os ids antigos (que já têm resultados e violariam uk_resultados_chave)
+    prefixo = f"Desafio sintético {uuid.uuid4().hex[:8]}"
+    repository.insert_many("desafios", [
+        {'titulo': f"{prefixo} {i}", 'enunciado': "-", 'nivel': 'Easy'} for i in range(quantidade_desafios)
+    ])
+    desafios = repository.select_into_table("desafios", campos=["id_desafio"], filter=f"titulo LIKE '{prefixo} %'", size=quantidade_desafios)
+
+    registros = []
+    for i, desafio in enumerate(desafios):
+        for modelo in modelos:
+            for linguagem in ('python', 'java'):
+                registros.append({'id_desafio': desafio['id_desafio'], 'id_modelo': modelo['id_modelo'], 'tipo': 'baseline',
+                                  'linguagem': linguagem, 'codigo_fonte': "print(1)", 'status_metricas': 'calculado'})
+                # Metade dos baselines fica sem refatoração e metade dos refatorados sem métricas
+                if i % 2 == 0:
+                    registros.append({'id_desafio': desafio['id_desafio'], 'id_modelo': modelo['id_modelo'], 'tipo': 'refatorado',
+                                      'linguagem': linguagem, 'codigo_fonte': "print(2)", 'status_metricas': 'pendente' if i % 4 == 0 else 'calculado'})
+    repository.insert_many("resultados", registros, tamanho_lote=5000)
+
+
+def executar(quantidade_semear=0):
+    repository = Repository()
+    try:
+        if quantidade_semear:
+            semear(repository, quantidade_semear)
+
+        repository.get_connection()
+        cursor = repository.conn.cursor()
+        cursor.execute("ANALYZE TABLE resultados")
+        cursor.fetchall()
+        cursor.execute("SELECT COUNT(*) FROM resultados")
+        total_linhas = cursor.fetchone()[0]
+        cursor.close()
+        print(f"resultados: {total_linhas} linhas")
+        if total_linhas < MINIMO_LINHAS:
+            print(f"Aviso: menos de {MINIMO_LINHAS} linhas; o plano pode diferir do de produção (use --semear em um banco _teste).")
+
+        problemas = []
+        for nome, sql, valores, expectativas in consultas(repository):
+            print(nome)
+            problemas += verificar_plano(repository, nome, sql, valores, expectativas)
+        return problemas
+    finally:
+        repository.close_db_connection()
+
+
+if __name__ == "__main__":
+    quantidade = int(sys.argv[sys.argv.index("--semear") + 1]) if "--semear" in sys.argv else 0
+    problemas = executar(quantidade)
+    for problema in problemas:
+        print(f"❌ {problema}")
+    if problemas:
+        sys.exit(1)
+    print("✅ Consultas de trabalho pendente usando os índices esperados.")
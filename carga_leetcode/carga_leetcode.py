@@ -1,27 +1,51 @@
+import hashlib
+import json
 import os
 import sys
-import time
+from concurrent.futures import ThreadPoolExecutor
 
 
 root_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
 if root_path not in sys.path:
     sys.path.append(root_path)
 from repository.repository import Repository
+from service.ambiente import carregar_ambiente
+from service.limitador_taxa import LimitadorTaxa
 from service.request_service import RequestService
 
+ENUNCIADO_ERRO = "Erro ao carregar enunciado"
+
 
 class Carga_LeetCode:
 
-    def __init__(self):
-        self.api_url = "https://leetcode.com/api/problems/all/"
+    def __init__(self, api_url=None, graphql_url=None, requisicoes_por_segundo=None, workers=None):
+        carregar_ambiente()
+        # URLs configuráveis para apontar a carga para um stub HTTP local (carga_leetcode/stub_leetcode.py)
+        self.api_url = api_url or os.getenv('LEETCODE_API_URL', "https://leetcode.com/api/problems/all/")
+        self.graphql_url = graphql_url or os.getenv('LEETCODE_GRAPHQL_URL', "https://leetcode.com/graphql")
         self.headers = {"User-Agent": "Mozilla/5.0"}
-        self.service = RequestService()
+        # Mesma taxa do antigo time.sleep(0.6), agora respeitada com precisão entre todas as threads
+        taxa = requisicoes_por_segundo or float(os.getenv('LEETCODE_REQUISICOES_POR_SEGUNDO', 1 / 0.6))
+        self.workers = workers or int(os.getenv('LEETCODE_WORKERS', 4))
+        self.service = RequestService(tamanho_pool=self.workers, limitador=LimitadorTaxa(taxa))
         self.repository = Repository()
+        self.tamanho_lote_insercao = int(os.getenv('LEETCODE_TAMANHO_LOTE_INSERCAO', 50))
+        # Quantos slugs vão em cada POST do GraphQL (um alias question(...) por slug)
+        self.tamanho_lote_graphql = int(os.getenv('LEETCODE_TAMANHO_LOTE_GRAPHQL', 25))
+        # Sincronização incremental: ETag/Last-Modified do catálogo, cópia local dele e último slug gravado
+        self.arquivo_estado = os.getenv('LEETCODE_ARQUIVO_ESTADO', "carga_leetcode_estado.json")
+        self.arquivo_catalogo = os.getenv('LEETCODE_ARQUIVO_CATALOGO', "carga_leetcode_catalogo.json")
+
+    @staticmethod
+    def hash_conteudo(enunciado):
+        # Mesmo valor de SHA2(enunciado, 256) no MySQL (usado na migração 002)
+        return hashlib.sha256(enunciado.encode('utf-8')).hexdigest()
 
-    def get_problems_by_difficulty(self):
+    def get_problems_by_difficulty(self, response=None):
         print("Conectando ao LeetCode via API REST...")
         try:
-            response = self.service.get_request(self.api_url, headers=self.headers)
+            if response is None:
+                response = self.service.get_request(self.api_url, headers=self.headers)
             
             all_problems = response['stat_status_pairs']
             all_problems.sort(key=lambda x: x['stat']['frontend_question_id'], reverse=True)
@@ -51,40 +75,213 @@ class Carga_LeetCode:
 
     def get_description(self, title_slug):
         """Busca o enunciado via GraphQL."""
-        url = "https://leetcode.com/graphql"
         query = {
             "query": "query questionContent($titleSlug: String!) { question(titleSlug: $titleSlug) { content } }",
             "variables": {"titleSlug": title_slug}
         }
         try:
-            r = self.service.post_request(url, json=query, headers= self.headers)
+            r = self.service.post_request(self.graphql_url, json=query, headers= self.headers)
             content = r['data']['question']['content']
             return content if content else "Sem enunciado disponível"
-        except:
-            return "Erro ao carregar enunciado"
+        except Exception as e:
+            print(f"Erro ao carregar enunciado de {title_slug}: {e}")
+            return ENUNCIADO_ERRO
+
+    @staticmethod
+    def montar_query_lote(slugs):
+        """Um único documento GraphQL com um alias q<i> por slug, cada um com sua variável $s<i>"""
+        variaveis = ", ".join(f"$s{i}: String!" for i in range(len(slugs)))
+        selecoes = " ".join(f"q{i}: question(titleSlug: $s{i}) {{ content }}" for i in range(len(slugs)))
+        return {
+            "query": f"query questionContents({variaveis}) {{ {selecoes} }}",
+            "variables": {f"s{i}": slug for i, slug in enumerate(slugs)}
+        }
+
+    def get_descriptions(self, slugs):
+        """
+        Busca os enunciados de vários slugs em um único POST. Falhas são tratadas por alias:
+        aliases nulos ou com erro (e o lote inteiro, se o POST falhar) são buscados
+        individualmente com get_description. Devolve os enunciados na ordem dos slugs.
+        """
+        if len(slugs) == 1:
+            return [self.get_description(slugs[0])]
+        try:
+            r = self.service.post_request(self.graphql_url, json=self.montar_query_lote(slugs), headers= self.headers)
+        except Exception as e:
+            print(f"Erro no lote GraphQL de {len(slugs)} enunciados, buscando individualmente: {e}")
+            return [self.get_description(slug) for slug in slugs]
+
+        dados = r.get('data') or {}
+        aliases_com_erro = {erro['path'][0] for erro in r.get('errors') or [] if erro.get('path')}
+        enunciados = []
+        for i, slug in enumerate(slugs):
+            alias = f"q{i}"
+            questao = dados.get(alias)
+            if questao is None or alias in aliases_com_erro:
+                print(f"Alias {alias} ({slug}) falhou no lote, buscando individualmente...")
+                enunciados.append(self.get_description(slug))
+            else:
+                enunciados.append(questao.get('content') or "Sem enunciado disponível")
+        return enunciados
+
+    def buscar_enunciados(self, problems):
+        """Gera (problema, enunciado) na ordem da lista, buscando em lotes GraphQL paralelos"""
+        slugs = [p['slug'] for p in problems]
+        lotes = [slugs[inicio:inicio + self.tamanho_lote_graphql] for inicio in range(0, len(slugs), self.tamanho_lote_graphql)]
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            enunciados = (enunciado for lote in executor.map(self.get_descriptions, lotes) for enunciado in lote)
+            yield from zip(problems, enunciados)
+
+    def novo_desafio(self, p, enunciado):
+        return {
+            'titulo': p['title'],
+            'slug': p['slug'],
+            'enunciado': enunciado,
+            'hash_conteudo': self.hash_conteudo(enunciado),
+            'nivel': p['level']
+        }
 
     def save_to_problems(self, problems):
+        """
+        Busca os enunciados em lotes GraphQL paralelos (limitados pelo LimitadorTaxa do serviço)
+        e insere na tabela desafios em lotes, na mesma ordem da lista de problemas.
+        """
+        pendentes = []
         try:
-            for i, p in enumerate(problems, 1):
+            for i, (p, enunciado) in enumerate(self.buscar_enunciados(problems), 1):
                 print(f"[{i}/{len(problems)}] Processando: {p['title']}")
-                
-                enunciado = self.get_description(p['slug']) 
-                novo_desafio = {
-                    'titulo': p['title'], 
-                    'enunciado': enunciado, 
-                    'nivel': p['level']
-                }
-                self.repository.insert_into_table('desafios', novo_desafio)
-                time.sleep(0.6) 
+                pendentes.append(self.novo_desafio(p, enunciado))
+                if len(pendentes) >= self.tamanho_lote_insercao:
+                    self.repository.insert_many('desafios', pendentes)
+                    pendentes = []
+
+            self.repository.insert_many('desafios', pendentes)
+        except Exception as e:
+            print(f"❌ Erro inesperado: {e}")
+        finally:
+            self.service.close()
+            self.repository.close_db_connection()
+
+
+    def ler_json(self, caminho, padrao=None):
+        if not os.path.exists(caminho):
+            return padrao
+        try:
+            with open(caminho, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"Aviso: não foi possível ler {caminho}: {e}")
+            return padrao
+
+    def gravar_json(self, caminho, dados):
+        # Grava em arquivo temporário e troca de uma vez: uma interrupção não corrompe o estado
+        temporario = f"{caminho}.tmp"
+        with open(temporario, 'w', encoding='utf-8') as f:
+            json.dump(dados, f, ensure_ascii=False)
+        os.replace(temporario, caminho)
+
+    def obter_catalogo(self, estado):
+        """Catálogo com GET condicional; em 304 usa a cópia local gravada na última sincronização"""
+        catalogo = None
+        if os.path.exists(self.arquivo_catalogo):
+            catalogo, etag, last_modified = self.service.get_condicional(self.api_url, self.headers, estado.get('etag'), estado.get('last_modified'))
+            if catalogo is None:
+                print("Catálogo não mudou desde a última sincronização (304). Usando a cópia local.")
+                catalogo = self.ler_json(self.arquivo_catalogo)
+        if catalogo is None:
+            catalogo, etag, last_modified = self.service.get_condicional(self.api_url, self.headers)
+        self.gravar_json(self.arquivo_catalogo, catalogo)
+        estado.update(etag=etag, last_modified=last_modified)
+        return catalogo
+
+    def gravar_lote(self, novos, alterados):
+        """Insere os novos e atualiza os alterados; retorna se tudo foi gravado"""
+        gravado = self.repository.insert_many('desafios', novos) == len(novos)
+        if alterados:
+            gravado = self.repository.update_table_lote('desafios', alterados, 'id_desafio') and gravado
+        return gravado
+
+    def sincronizar(self, verificar_alteracoes=False):
+        """
+        Sincronização incremental: só busca o enunciado de slugs que ainda não estão em desafios
+        (com verificar_alteracoes, busca também os existentes e atualiza os que mudaram de hash).
+        Desafios antigos sem slug são casados pelo título. O arquivo de estado guarda o último
+        slug até o qual tudo foi buscado e gravado sem erro, e uma execução interrompida recomeça
+        logo depois dele; enunciados com erro ou lotes que falharam seguram o ponto de retomada.
+        """
+        try:
+            estado = self.ler_json(self.arquivo_estado, {})
+            problems = self.get_problems_by_difficulty(self.obter_catalogo(estado))
+            if not problems:
+                print("Falha ao obter lista do LeetCode.")
+                return
+
+            ultimo_slug = estado.get('ultimo_slug')
+            slugs = [p['slug'] for p in problems]
+            if ultimo_slug in slugs:
+                print(f"Retomando a sincronização após {ultimo_slug}.")
+                problems = problems[slugs.index(ultimo_slug) + 1:]
+
+            existentes = self.repository.select_into_table('desafios', campos=['id_desafio', 'titulo', 'slug', 'hash_conteudo'])
+            por_slug = {d['slug']: d for d in existentes if d['slug']}
+            sem_slug_por_titulo = {d['titulo']: d for d in existentes if not d['slug']}
+
+            legados = [{'id_desafio': sem_slug_por_titulo[p['title']]['id_desafio'], 'slug': p['slug']}
+                       for p in problems if p['slug'] not in por_slug and p['title'] in sem_slug_por_titulo]
+            # Só avança o ponto de retomada enquanto tudo antes dele foi buscado e gravado
+            prefixo_gravado = True
+            if legados:
+                prefixo_gravado = self.repository.update_table_lote('desafios', legados, 'id_desafio')
+                for legado in legados:
+                    por_slug[legado['slug']] = next(d for d in existentes if d['id_desafio'] == legado['id_desafio'])
+
+            a_buscar = [p for p in problems if verificar_alteracoes or p['slug'] not in por_slug]
+            print(f"{len(problems)} desafios no catálogo, {len(a_buscar)} enunciados a buscar.")
+
+            novos, alterados = [], []
+            total_novos, total_alterados = 0, 0
+            for i, (p, enunciado) in enumerate(self.buscar_enunciados(a_buscar), 1):
+                if enunciado == ENUNCIADO_ERRO:
+                    # Fica de fora do banco para ser buscado de novo na próxima sincronização
+                    prefixo_gravado = False
+                    continue
+                existente = por_slug.get(p['slug'])
+                if existente is None:
+                    novos.append(self.novo_desafio(p, enunciado))
+                    total_novos += 1
+                elif existente['hash_conteudo'] != self.hash_conteudo(enunciado):
+                    total_alterados += 1
+                    alterados.append({'id_desafio': existente['id_desafio'], 'enunciado': enunciado, 'hash_conteudo': self.hash_conteudo(enunciado)})
+
+                if len(novos) + len(alterados) >= self.tamanho_lote_insercao:
+                    prefixo_gravado = self.gravar_lote(novos, alterados) and prefixo_gravado
+                    print(f"[{i}/{len(a_buscar)}] {len(novos)} novos, {len(alterados)} alterados.")
+                    novos, alterados = [], []
+                    if prefixo_gravado:
+                        estado['ultimo_slug'] = p['slug']
+                        self.gravar_json(self.arquivo_estado, estado)
 
+            prefixo_gravado = self.gravar_lote(novos, alterados) and prefixo_gravado
+            if prefixo_gravado:
+                estado['ultimo_slug'] = None
+                self.gravar_json(self.arquivo_estado, estado)
+                print(f"✅ Sincronização concluída: {total_novos} novos, {total_alterados} alterados.")
+            else:
+                retomada = f"após {estado['ultimo_slug']}" if estado.get('ultimo_slug') else "do início do catálogo"
+                print(f"⚠️ Sincronização parcial: {total_novos} novos, {total_alterados} alterados. "
+                      f"A próxima execução recomeça {retomada}.")
         except Exception as e:
             print(f"❌ Erro inesperado: {e}")
         finally:
+            self.service.close()
             self.repository.close_db_connection()
 
 
 if __name__ == "__main__":
     carga = Carga_LeetCode()
+    if "--incremental" in sys.argv:
+        carga.sincronizar(verificar_alteracoes="--verificar-alteracoes" in sys.argv)
+        sys.exit(0)
     lista_desafios = carga.get_problems_by_difficulty()
     
     if len(lista_desafios) > 0:
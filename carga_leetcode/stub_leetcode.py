@@ -0,0 +1,109 @@
+import json
+import os
+import re
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class StubLeetCode(BaseHTTPRequestHandler):
+    """
+    Servidor HTTP local que imita os dois endpoints usados pela carga (catálogo REST e
+    GraphQL), com latência configurável. Uso:
+        python carga_leetcode/stub_leetcode.py 8765
+        LEETCODE_API_URL=http://localhost:8765/api/problems/all/ LEETCODE_GRAPHQL_URL=http://localhost:8765/graphql python carga_leetcode/carga_leetcode.py
+    """
+
+    quantidade_problemas = 400
+    latencia = 0.05
+    # Slugs que o stub responde com erro, para exercitar a falha parcial por alias
+    slugs_com_erro = set()
+    requisicoes = 0
+    lock = threading.Lock()
+
+    @classmethod
+    def catalogo(cls):
+        return {'stat_status_pairs': [
+            {
+                'stat': {'frontend_question_id': i, 'question__title': f"Problema {i}", 'question__title_slug': f"problema-{i}"},
+                'paid_only': i % 10 == 0,
+                'difficulty': {'level': i % 3 + 1},
+            }
+            for i in range(1, cls.quantidade_problemas + 1)
+        ]}
+
+    @staticmethod
+    def enunciado(slug):
+        return f"<p>Enunciado de {slug}</p>"
+
+    def contar_requisicao(self):
+        with StubLeetCode.lock:
+            StubLeetCode.requisicoes += 1
+        time.sleep(self.latencia)
+
+    def responder(self, status, corpo, cabecalhos=None):
+        dados = json.dumps(corpo).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(dados)))
+        for nome, valor in (cabecalhos or {}).items():
+            self.send_header(nome, valor)
+        self.end_headers()
+        self.wfile.write(dados)
+
+    def do_GET(self):
+        self.contar_requisicao()
+        if self.path.rstrip('/') == '/api/problems/all':
+            # ETag muda junto com o catálogo; If-None-Match igual responde 304 sem corpo
+            etag = f'"catalogo-{self.quantidade_problemas}"'
+            if self.headers.get('If-None-Match') == etag:
+                self.send_response(304)
+                self.send_header('ETag', etag)
+                self.end_headers()
+                return
+            self.responder(200, self.catalogo(), {'ETag': etag})
+        else:
+            self.responder(404, {'erro': 'não encontrado'})
+
+    def do_POST(self):
+        self.contar_requisicao()
+        if self.path.rstrip('/') != '/graphql':
+            self.responder(404, {'erro': 'não encontrado'})
+            return
+        corpo = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+        variaveis = corpo.get('variables', {})
+        # Consulta em lote: "q0: question(titleSlug: $s0) { content } q1: ..."
+        aliases = re.findall(r'(\w+):\s*question\(titleSlug:\s*\$(\w+)\)', corpo.get('query', ''))
+        if not aliases:
+            aliases = [('question', 'titleSlug')]
+
+        dados, erros = {}, []
+        for alias, variavel in aliases:
+            slug = variaveis.get(variavel)
+            if slug in self.slugs_com_erro:
+                dados[alias] = None
+                erros.append({'message': f"Erro ao buscar {slug}", 'path': [alias]})
+            else:
+                dados[alias] = {'content': self.enunciado(slug)} if slug else None
+        self.responder(200, {'data': dados, **({'errors': erros} if erros else {})})
+
+    def log_message(self, formato, *args):
+        pass
+
+
+def iniciar(porta=0):
+    """Sobe o stub em uma thread e devolve o servidor (porta em servidor.server_address[1])"""
+    servidor = ThreadingHTTPServer(('localhost', porta), StubLeetCode)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    return servidor
+
+
+if __name__ == "__main__":
+    porta = int(sys.argv[1]) if len(sys.argv) > 1 else int(os.getenv('STUB_LEETCODE_PORTA', 8765))
+    servidor = ThreadingHTTPServer(('localhost', porta), StubLeetCode)
+    print(f"Stub do LeetCode em http://localhost:{porta} (Ctrl+C para encerrar)")
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        print(f"{StubLeetCode.requisicoes} requisições atendidas.")
@@ -0,0 +1,24 @@
+-- Migração 001: chave única (id_desafio, id_modelo, tipo, linguagem) em resultados
+-- Necessária para o upsert em lote de Repository.insert_resultados.
+USE tcc_refatoracao_llm;
+
+-- 1. Remove duplicatas, mantendo por chave a linha com código preenchido de menor id_resultado
+DELETE duplicado FROM resultados AS duplicado
+JOIN resultados AS mantido
+    ON mantido.id_desafio = duplicado.id_desafio
+    AND mantido.id_modelo = duplicado.id_modelo
+    AND mantido.tipo = duplicado.tipo
+    AND mantido.linguagem = duplicado.linguagem
+    AND mantido.id_resultado <> duplicado.id_resultado
+WHERE (
+        (mantido.codigo_fonte IS NOT NULL AND mantido.codigo_fonte != '')
+        AND (duplicado.codigo_fonte IS NULL OR duplicado.codigo_fonte = '')
+    )
+    OR (
+        ((mantido.codigo_fonte IS NOT NULL AND mantido.codigo_fonte != '') = (duplicado.codigo_fonte IS NOT NULL AND duplicado.codigo_fonte != ''))
+        AND mantido.id_resultado < duplicado.id_resultado
+    );
+
+-- 2. Cria a chave única
+ALTER TABLE resultados
+    ADD UNIQUE KEY uk_resultados_chave (id_desafio, id_modelo, tipo, linguagem);
@@ -0,0 +1,13 @@
+-- Migração 002: slug e hash do enunciado em desafios
+-- Usados pela sincronização incremental de Carga_LeetCode (python carga_leetcode/carga_leetcode.py --incremental).
+-- Desafios já carregados ficam com slug NULL; a primeira sincronização preenche o slug
+-- casando pelo título, sem baixar o enunciado de novo.
+USE tcc_refatoracao_llm;
+
+ALTER TABLE desafios
+    ADD COLUMN slug VARCHAR(255) NULL AFTER titulo,
+    ADD COLUMN hash_conteudo CHAR(64) NULL AFTER enunciado,
+    ADD UNIQUE KEY uk_desafios_slug (slug);
+
+-- Hash dos enunciados já carregados (mesmo SHA-256 calculado em Carga_LeetCode.hash_conteudo)
+UPDATE desafios SET hash_conteudo = SHA2(enunciado, 256) WHERE hash_conteudo IS NULL;
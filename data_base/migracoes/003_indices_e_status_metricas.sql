@@ -0,0 +1,23 @@
+-- Migração 003: índices compostos para as consultas de trabalho pendente e coluna status_metricas
+-- Substitui o uso de loc = 0 como marcador de "sem métricas" (um código vazio também tem loc = 0).
+USE tcc_refatoracao_llm;
+
+-- 1. Estado das métricas de cada resultado
+ALTER TABLE resultados
+    ADD COLUMN status_metricas ENUM('pendente', 'calculado') NOT NULL DEFAULT 'pendente' AFTER loc;
+
+UPDATE resultados SET status_metricas = 'calculado' WHERE loc <> 0;
+
+-- 2. Índices
+-- Fila do Sonar/métricas locais: WHERE status_metricas = 'pendente', em ordem de id_resultado
+ALTER TABLE resultados
+    ADD INDEX idx_resultados_status_metricas (status_metricas, id_resultado);
+
+-- Lado externo do anti-join de pendentes de refatoração e filtros por tipo (WHERE tipo = ...)
+ALTER TABLE resultados
+    ADD INDEX idx_resultados_tipo (tipo, id_resultado);
+
+-- O lado interno do anti-join (tipo, id_desafio, id_modelo, linguagem) usa a chave única
+-- uk_resultados_chave da migração 001, só com leitura de índice.
+
+ANALYZE TABLE resultados;
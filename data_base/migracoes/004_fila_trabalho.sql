@@ -0,0 +1,29 @@
+-- Migração 004: fila de trabalho durável com lease, para vários workers (máquinas) sem trabalho duplicado
+-- Requer MySQL 8.0+ (SELECT ... FOR UPDATE SKIP LOCKED).
+USE tcc_refatoracao_llm;
+
+-- Cada tarefa identifica o resultado a produzir (id_desafio, id_modelo, linguagem, tipo) e
+-- id_resultado aponta para a entrada: o baseline a refatorar ou o resultado a medir.
+-- Um worker reivindica tarefas pendentes ou com lease vencido; se ele morrer, o lease
+-- expira e outro worker retoma a tarefa.
+CREATE TABLE fila_trabalho (
+    id_tarefa INT AUTO_INCREMENT PRIMARY KEY,
+    tipo_tarefa ENUM('refatoracao', 'metricas') NOT NULL,
+    id_resultado INT NOT NULL,
+    id_desafio INT NOT NULL,
+    id_modelo INT NOT NULL,
+    linguagem VARCHAR(20) NOT NULL,
+    tipo VARCHAR(50) NOT NULL,
+    status ENUM('pendente', 'em_andamento', 'concluida', 'falha') NOT NULL DEFAULT 'pendente',
+    tentativas INT NOT NULL DEFAULT 0,
+    lease_owner VARCHAR(100) NULL,
+    lease_expires DATETIME NULL, -- UTC, pelo relógio do banco (único para todos os nós)
+    atualizado_em TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+
+    -- Enfileirar de novo é idempotente (INSERT ... ON DUPLICATE KEY UPDATE, que só reabre tarefas em 'falha')
+    UNIQUE KEY uk_fila_tarefa (tipo_tarefa, id_desafio, id_modelo, linguagem, tipo),
+    -- Reivindicação: WHERE tipo_tarefa = ? AND status IN (...) ORDER BY id_tarefa
+    INDEX idx_fila_status (tipo_tarefa, status, lease_expires, id_tarefa),
+
+    FOREIGN KEY (id_resultado) REFERENCES resultados(id_resultado) ON DELETE CASCADE
+);
@@ -8,8 +8,11 @@ USE tcc_refatoracao_llm;
 CREATE TABLE desafios (
     id_desafio INT AUTO_INCREMENT PRIMARY KEY, 
     titulo VARCHAR(255) NOT NULL,
+    slug VARCHAR(255) NULL, -- titleSlug do LeetCode (sincronização incremental)
     enunciado LONGTEXT NOT NULL, -- Alterado para LONGTEXT para suportar enunciados complexos
-    nivel ENUM('Easy', 'Medium', 'Hard') NOT NULL
+    hash_conteudo CHAR(64) NULL, -- SHA-256 do enunciado, para detectar alterações
+    nivel ENUM('Easy', 'Medium', 'Hard') NOT NULL,
+    UNIQUE KEY uk_desafios_slug (slug)
 );
 
 -- 2. Tabela para os modelos LLM
@@ -33,13 +36,41 @@ CREATE TABLE resultados (
     complexidade_ciclomatica INT DEFAULT 0,
     duplicacao_percentual FLOAT DEFAULT 0.0,
     loc INT DEFAULT 0,
+    status_metricas ENUM('pendente', 'calculado') NOT NULL DEFAULT 'pendente',
     
     data_geracao TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     
+    -- Chave usada pelo upsert em lote de Repository.insert_resultados
+    UNIQUE KEY uk_resultados_chave (id_desafio, id_modelo, tipo, linguagem),
+    -- Consultas de trabalho pendente (migração 003)
+    INDEX idx_resultados_status_metricas (status_metricas, id_resultado),
+    INDEX idx_resultados_tipo (tipo, id_resultado),
+    
     FOREIGN KEY (id_desafio) REFERENCES desafios(id_desafio) ON DELETE CASCADE,
     FOREIGN KEY (id_modelo) REFERENCES modelos(id_modelo) ON DELETE CASCADE
 );
 
+-- 4. Fila de trabalho com lease para workers distribuídos (migração 004, MySQL 8.0+)
+CREATE TABLE fila_trabalho (
+    id_tarefa INT AUTO_INCREMENT PRIMARY KEY,
+    tipo_tarefa ENUM('refatoracao', 'metricas') NOT NULL,
+    id_resultado INT NOT NULL, -- entrada da tarefa: baseline a refatorar ou resultado a medir
+    id_desafio INT NOT NULL,
+    id_modelo INT NOT NULL,
+    linguagem VARCHAR(20) NOT NULL,
+    tipo VARCHAR(50) NOT NULL,
+    status ENUM('pendente', 'em_andamento', 'concluida', 'falha') NOT NULL DEFAULT 'pendente',
+    tentativas INT NOT NULL DEFAULT 0,
+    lease_owner VARCHAR(100) NULL,
+    lease_expires DATETIME NULL, -- UTC, pelo relógio do banco
+    atualizado_em TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+
+    UNIQUE KEY uk_fila_tarefa (tipo_tarefa, id_desafio, id_modelo, linguagem, tipo),
+    INDEX idx_fila_status (tipo_tarefa, status, lease_expires, id_tarefa),
+
+    FOREIGN KEY (id_resultado) REFERENCES resultados(id_resultado) ON DELETE CASCADE
+);
+
 -- Inserção inicial dos modelos
 INSERT INTO modelos (nome_modelo) VALUES 
 ('GEMINI'), 
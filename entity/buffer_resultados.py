@@ -0,0 +1,54 @@
+from entity.resultado import Resultado
+
+# Mesma ordem das colunas de Repository.SQL_UPSERT_RESULTADO
+COLUNAS = ('id_desafio', 'id_modelo', 'tipo', 'codigo_fonte', 'linguagem', 'id_resultado_origem')
+
+
+class BufferResultados:
+    """
+    Resultados em memória guardados por coluna (uma lista por campo) com índice
+    chave -> posição. Deduplicação em O(1) pela chave (id_desafio, id_modelo, tipo, linguagem)
+    e exportação para o executemany sem montar objetos intermediários: as tuplas de
+    linhas() apontam para os mesmos objetos guardados nas colunas.
+    """
+
+    def __init__(self, resultados=()):
+        self.colunas = {coluna: [] for coluna in COLUNAS}
+        self.indice = {}
+        for resultado in resultados:
+            self.adicionar(resultado)
+
+    def adicionar(self, resultado: Resultado):
+        """Guarda o resultado e devolve True; se a chave já existe, mantém o primeiro e devolve False"""
+        chave = resultado.chave()
+        if chave in self.indice:
+            return False
+        self.indice[chave] = len(self.indice)
+        for coluna, valores in self.colunas.items():
+            valores.append(getattr(resultado, coluna))
+        return True
+
+    def contem(self, id_desafio, id_modelo, tipo, linguagem):
+        return (id_desafio, id_modelo, tipo, linguagem) in self.indice
+
+    def obter(self, id_desafio, id_modelo, tipo, linguagem):
+        posicao = self.indice.get((id_desafio, id_modelo, tipo, linguagem))
+        if posicao is None:
+            return None
+        return Resultado(*(valores[posicao] for valores in self.colunas.values()))
+
+    def linhas(self, inicio=0, fim=None):
+        """Tuplas (na ordem de COLUNAS) das posições [inicio, fim), para o upsert em lote"""
+        return list(zip(*(valores[inicio:fim] for valores in self.colunas.values())))
+
+    def limpar(self):
+        for valores in self.colunas.values():
+            valores.clear()
+        self.indice.clear()
+
+    def __len__(self):
+        return len(self.indice)
+
+    def __iter__(self):
+        for linha in zip(*self.colunas.values()):
+            yield Resultado(*linha)
@@ -1,8 +1,38 @@
+import sys
+from dataclasses import dataclass
+
+from enums.lingagem import Linguagem
+from enums.tipo_codigo import TipoCodigo
+
+# Valor -> string canônica do membro do enum: todos os resultados compartilham o mesmo objeto
+_TIPOS = {membro.value: membro.value for membro in TipoCodigo}
+_LINGUAGENS = {membro.value: membro.value for membro in Linguagem}
+
+
+def internar(valor, canonicos):
+    """Aceita o membro do enum ou o seu valor e devolve a string canônica (sys.intern para valores fora do enum)"""
+    if hasattr(valor, 'value'):
+        valor = valor.value
+    return canonicos.get(valor) or sys.intern(valor)
+
+
+@dataclass(slots=True)
 class Resultado:
-    def __init__(self, id_desafio, id_modelo, tipo, codigo_fonte, linguagem, id_resultado_origem = None):
-        self.id_desafio = id_desafio
-        self.id_modelo = id_modelo
-        self.tipo = tipo
-        self.codigo_fonte = codigo_fonte
-        self.linguagem = linguagem
-        self.id_resultado_origem = id_resultado_origem
\ No newline at end of file
+    id_desafio: int
+    id_modelo: int
+    tipo: str
+    codigo_fonte: str
+    linguagem: str
+    id_resultado_origem: int = None
+
+    def __post_init__(self):
+        self.tipo = internar(self.tipo, _TIPOS)
+        self.linguagem = internar(self.linguagem, _LINGUAGENS)
+
+    def chave(self):
+        """Chave única (id_desafio, id_modelo, tipo, linguagem), a mesma de uk_resultados_chave"""
+        return (self.id_desafio, self.id_modelo, self.tipo, self.linguagem)
+
+    def para_dict(self):
+        # Sem __dict__ (slots): serialização explícita, na ordem dos campos
+        return {campo: getattr(self, campo) for campo in self.__slots__}
@@ -0,0 +1,132 @@
+import os
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+
+class TarefaGeracao:
+    def __init__(self, id_desafio, id_modelo, nome_modelo, linguagem, prompt, tipo_codigo, id_resultado_origem = None):
+        self.id_desafio = id_desafio
+        self.id_modelo = id_modelo
+        self.nome_modelo = nome_modelo
+        self.linguagem = linguagem
+        self.prompt = prompt
+        self.tipo_codigo = tipo_codigo
+        self.id_resultado_origem = id_resultado_origem
+        # Rodada de repescagem (0 = primeira passada)
+        self.repescagem = 0
+
+
+class TarefaLote:
+    """Várias tarefas do mesmo modelo enviadas em uma única chamada (prompt com múltiplas respostas)"""
+
+    def __init__(self, tarefas: list[TarefaGeracao]):
+        self.tarefas = tarefas
+        self.id_modelo = tarefas[0].id_modelo
+        self.nome_modelo = tarefas[0].nome_modelo
+        self.tipo_codigo = tarefas[0].tipo_codigo
+        self.id_desafio = [tarefa.id_desafio for tarefa in tarefas]
+        self.linguagem = "lote"
+
+
+def agrupar_em_lotes(tarefas, tamanho_lote, ordem_por_modelo=False):
+    """
+    Agrupa as tarefas de cada modelo em lotes de até `tamanho_lote`. Mantém um buffer por
+    modelo, então mesmo na ordem desafio -> modelo os lotes juntam desafios diferentes.
+    Com `ordem_por_modelo` (entrada já ordenada por modelo), o lote incompleto de um modelo
+    é enviado assim que o próximo modelo começa, preservando a afinidade.
+    """
+    buffers = {}
+    for tarefa in tarefas:
+        if ordem_por_modelo and tarefa.nome_modelo not in buffers:
+            for buffer in buffers.values():
+                if buffer:
+                    yield TarefaLote(buffer)
+            buffers = {}
+        buffer = buffers.setdefault(tarefa.nome_modelo, [])
+        buffer.append(tarefa)
+        if len(buffer) >= tamanho_lote:
+            yield TarefaLote(buffer)
+            buffers[tarefa.nome_modelo] = []
+    for buffer in buffers.values():
+        if buffer:
+            yield TarefaLote(buffer)
+
+
+def ordenar_por_modelo(tarefas):
+    """Reordena as tarefas modelo a modelo (estável: dentro de cada modelo a ordem original é mantida)"""
+    por_modelo = {}
+    for tarefa in tarefas:
+        por_modelo.setdefault(tarefa.nome_modelo, []).append(tarefa)
+    for tarefas_modelo in por_modelo.values():
+        yield from tarefas_modelo
+
+
+class AgendadorGeracao:
+    """
+    Mantém até `max_workers` solicitações de geração em andamento, limitando quantas
+    usam o mesmo modelo ao mesmo tempo. O limite por modelo é aplicado no envio: só vai
+    para o pool a tarefa que já pode rodar, então nenhum worker fica parado esperando vaga
+    de um modelo. Os resultados são entregues na mesma ordem em que as tarefas foram
+    enviadas, para que a persistência continue sequencial.
+
+    Com `afinidade_modelo`, a fila de um modelo é esvaziada (todas as tarefas em andamento
+    terminam) antes de a primeira tarefa do próximo modelo ser enviada, e `ao_trocar_modelo`
+    é chamado na troca. Use junto com ordenar_por_modelo para evitar que o Ollama
+    descarregue e recarregue pesos a cada chamada.
+    """
+
+    def __init__(self, funcao_geracao, max_workers=None, max_por_modelo=None, afinidade_modelo=False, ao_trocar_modelo=None):
+        self.funcao_geracao = funcao_geracao
+        self.max_workers = max_workers or int(os.getenv('LLM_MAX_WORKERS', 4))
+        # Com afinidade só um modelo fica ativo por vez: por padrão ele pode ocupar o pool inteiro
+        self.max_por_modelo = max_por_modelo or int(os.getenv('LLM_MAX_POR_MODELO', self.max_workers if afinidade_modelo else 1))
+        self.afinidade_modelo = afinidade_modelo
+        self.ao_trocar_modelo = ao_trocar_modelo
+        self.semaforos_modelo = {}
+        self.lock_semaforos = threading.Lock()
+
+    def semaforo_do_modelo(self, nome_modelo):
+        with self.lock_semaforos:
+            if nome_modelo not in self.semaforos_modelo:
+                self.semaforos_modelo[nome_modelo] = threading.Semaphore(self.max_por_modelo)
+            return self.semaforos_modelo[nome_modelo]
+
+    def enviar(self, executor, tarefa):
+        """Espera vaga no modelo da tarefa antes de enviá-la ao pool; a vaga é devolvida ao terminar"""
+        semaforo = self.semaforo_do_modelo(tarefa.nome_modelo)
+        semaforo.acquire()
+        try:
+            futuro = executor.submit(self.funcao_geracao, tarefa)
+        except BaseException:
+            semaforo.release()
+            raise
+        futuro.add_done_callback(lambda _: semaforo.release())
+        return futuro
+
+    def executar(self, tarefas):
+        """Gera (tarefa, resultado) na ordem de envio; resultado é None quando a geração falha."""
+        # A janela é maior que o pool para que um modelo lento não deixe workers ociosos
+        tamanho_janela = self.max_workers * 2
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            em_andamento = deque()
+            modelo_atual = None
+            for tarefa in tarefas:
+                if self.afinidade_modelo and tarefa.nome_modelo != modelo_atual:
+                    while em_andamento:
+                        yield self.aguardar(*em_andamento.popleft())
+                    if self.ao_trocar_modelo:
+                        self.ao_trocar_modelo(modelo_atual, tarefa.nome_modelo)
+                    modelo_atual = tarefa.nome_modelo
+                em_andamento.append((tarefa, self.enviar(executor, tarefa)))
+                if len(em_andamento) >= tamanho_janela:
+                    yield self.aguardar(*em_andamento.popleft())
+            while em_andamento:
+                yield self.aguardar(*em_andamento.popleft())
+
+    def aguardar(self, tarefa, futuro):
+        try:
+            return tarefa, futuro.result()
+        except Exception as e:
+            print(f"Falha no modelo {tarefa.nome_modelo} ({tarefa.linguagem}) para o desafio {tarefa.id_desafio}: {e}")
+            return tarefa, None
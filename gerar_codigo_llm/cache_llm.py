@@ -0,0 +1,33 @@
+import hashlib
+import json
+import os
+
+from repository.cache_sqlite import CacheSqlite
+
+
+class CacheRespostasLLM(CacheSqlite):
+    """
+    Cache em disco das respostas do Ollama. Com temperature 0 a resposta é determinística
+    para o mesmo (digest do modelo, prompt, opções), então uma nova execução após uma falha
+    reaproveita o que já foi gerado em vez de repetir a inferência.
+    """
+
+    def __init__(self, caminho_arquivo=None, max_bytes=None):
+        super().__init__(
+            caminho_arquivo or os.getenv('LLM_CACHE_ARQUIVO', 'cache_llm.sqlite'),
+            max_entradas=int(os.getenv('LLM_CACHE_MAX_ENTRADAS', 500000)),
+            max_bytes=max_bytes or int(float(os.getenv('LLM_CACHE_MAX_MB', 1024)) * 1024 * 1024)
+        )
+
+    @staticmethod
+    def chave(digest_modelo, prompt, options):
+        conteudo = json.dumps({'modelo': digest_modelo, 'prompt': prompt, 'options': options}, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(conteudo.encode('utf-8')).hexdigest()
+
+    def obter_resposta(self, digest_modelo, prompt, options):
+        resposta = self.obter(self.chave(digest_modelo, prompt, options))
+        return resposta['conteudo'] if resposta else None
+
+    def guardar_resposta(self, digest_modelo, prompt, options, conteudo):
+        if conteudo:
+            self.guardar(self.chave(digest_modelo, prompt, options), {'conteudo': conteudo})
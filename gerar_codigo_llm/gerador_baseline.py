@@ -1,6 +1,7 @@
 import os
 import sys
 import time
+from collections import deque
 root_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
 if root_path not in sys.path:
     sys.path.append(root_path)
@@ -8,25 +9,40 @@ if root_path not in sys.path:
 from entity.resultado import Resultado
 from enums.lingagem import Linguagem
 from enums.tipo_codigo import TipoCodigo
+from gerar_codigo_llm.agendador_geracao import AgendadorGeracao, TarefaGeracao, TarefaLote, agrupar_em_lotes, ordenar_por_modelo
 from gerar_codigo_llm.gerador_codigo_llm import gerador_codigo_llm
+from gerar_codigo_llm.journal_jsonl import JournalResultados
+from gerar_codigo_llm.retentativas import CodigoRejeitado
 from repository.repository import Repository
-import json
 
 class Gerador_Baseline:
-    def __init__(self):
+    def __init__(self, tamanho_lote=None, afinidade_modelo=None):
         self.llm_request = Repository()
         self.gerador_codigo_llm = gerador_codigo_llm()
         self.resultados_processados = list[Resultado]()
-        self.nome_arquivo_json = "resultado_baseline.json"
-        self.nome_arquivo_prompt_json = "resultado_baseline_prompts.json"
+        self.nome_arquivo_json = "resultado_baseline.jsonl"
+        self.nome_arquivo_prompt_json = "resultado_baseline_prompts.jsonl"
+        self.journal = JournalResultados(self.nome_arquivo_json)
+        # Afinidade de modelo: processa a fila de um modelo inteira antes de trocar (evita recargas no Ollama)
+        self.afinidade_modelo = afinidade_modelo if afinidade_modelo is not None else os.getenv('LLM_AFINIDADE_MODELO', '1') == '1'
+        # Sem afinidade, por padrão uma solicitação simultânea por modelo em cada backend de inferência;
+        # com afinidade o agendador deixa o modelo ativo ocupar o pool inteiro (LLM_MAX_WORKERS)
+        max_por_modelo = None if self.afinidade_modelo else int(os.getenv('LLM_MAX_POR_MODELO', len(self.gerador_codigo_llm.llm_request.roteador.backends)))
+        self.agendador = AgendadorGeracao(self.gerar_tarefa, max_por_modelo=max_por_modelo, afinidade_modelo=self.afinidade_modelo, ao_trocar_modelo=self.gerador_codigo_llm.trocar_modelo)
+        # Quantas solicitações vão em um único prompt no modo em lote (1 = desligado)
+        self.tamanho_lote = tamanho_lote or int(os.getenv('LLM_TAMANHO_LOTE', 1))
+        # Itens rejeitados na validação voltam no fim da execução, sem prender o worker
+        self.fila_repescagem = deque()
+        self.max_repescagens = int(os.getenv('LLM_REPESCAGENS', 1))
+        self.nome_arquivo_retentativas = "resultado_baseline_retentativas.json"
 
-    def executar_desafio(self, modelo_processado, id_desafio, id_modelo, prompt, nome_modelo, linguagem, tipo_codigo):
+    def executar_desafio(self, modelo_processado, id_desafio, id_modelo, prompt, nome_modelo, linguagem, tipo_codigo, repescagem=0):
         try:
             if modelo_processado:
                 print(f"Desafio {id_desafio} já processado para o modelo {nome_modelo} ({linguagem}) no arquivo JSON. Pulando...")
             else:
                 print(f"Processando {nome_modelo} ({linguagem})... Para o desafio {id_desafio}...")
-                codigo_py = self.gerador_codigo_llm.solicitar_codigo_llm(nome_modelo, prompt, linguagem)
+                codigo_py = self.gerador_codigo_llm.solicitar_codigo_llm(nome_modelo, prompt, linguagem, repescagem)
                 if not codigo_py:
                     raise ValueError("A IA não gerou um código válido.")
                 return Resultado(
@@ -35,65 +51,130 @@ class Gerador_Baseline:
                     tipo=tipo_codigo.value,
                     codigo_fonte=codigo_py,
                     linguagem=linguagem)
+        except CodigoRejeitado:
+            raise
         except Exception as e:
             print(f"Falha no modelo {nome_modelo} ({linguagem}): {e}")
         
+    def gerar_lote(self, lote: TarefaLote):
+        """Envia o lote em um único prompt; itens que não vierem na resposta são refeitos individualmente"""
+        resultados = list[Resultado]()
+        codigos = {}
+        try:
+            print(f"Processando lote de {len(lote.tarefas)} itens com {lote.nome_modelo}... Desafios {lote.id_desafio}...")
+            # Cada item leva o mesmo prompt do modo individual (GetPrompt do tipo da tarefa)
+            itens = [(tarefa.prompt, tarefa.linguagem) for tarefa in lote.tarefas]
+            codigos = self.gerador_codigo_llm.solicitar_codigo_llm_lote(lote.nome_modelo, itens)
+        except Exception as e:
+            print(f"Falha no lote do modelo {lote.nome_modelo}: {e}")
+
+        for indice, tarefa in enumerate(lote.tarefas):
+            if indice in codigos:
+                resultados.append(Resultado(
+                    id_desafio=tarefa.id_desafio,
+                    id_modelo=tarefa.id_modelo,
+                    tipo=tarefa.tipo_codigo.value,
+                    codigo_fonte=codigos[indice],
+                    linguagem=tarefa.linguagem))
+            else:
+                resultado = self.gerar_tarefa(tarefa)
+                if resultado:
+                    resultados.append(resultado)
+        return resultados
+
+    def gerar_tarefa(self, tarefa):
+        if isinstance(tarefa, TarefaLote):
+            return self.gerar_lote(tarefa)
+        try:
+            return self.executar_desafio(modelo_processado = False, id_desafio = tarefa.id_desafio, id_modelo = tarefa.id_modelo, prompt = tarefa.prompt, nome_modelo = tarefa.nome_modelo, linguagem = tarefa.linguagem, tipo_codigo = tarefa.tipo_codigo, repescagem = tarefa.repescagem)
+        except CodigoRejeitado as e:
+            if tarefa.repescagem < self.max_repescagens:
+                print(f"[{tarefa.nome_modelo}] {e} Desafio {tarefa.id_desafio} ({tarefa.linguagem}) reenfileirado para o fim da execução.")
+                self.fila_repescagem.append(tarefa)
+            else:
+                print(f"[{tarefa.nome_modelo}] {e} Desafio {tarefa.id_desafio} ({tarefa.linguagem}) rejeitado também na repescagem.")
+
+    def consumir(self, execucao):
+        """Registra no journal os resultados que chegam do agendador e grava no banco a cada 100"""
+        for tarefa, resultado in execucao:
+            if not resultado:
+                continue
+            for resultado_gerado in (resultado if isinstance(resultado, list) else [resultado]):
+                self.journal.registrar(resultado_gerado)
+                self.gerador_codigo_llm.marcar_processado(resultado_gerado)
+            if(self.journal.pendentes.__len__() >= 100):
+                self.journal.persistir(self.llm_request)
+
+    def executar_repescagem(self):
+        rodada = 0
+        while self.fila_repescagem and rodada < self.max_repescagens:
+            rodada += 1
+            tarefas = list(self.fila_repescagem)
+            self.fila_repescagem.clear()
+            print(f"Repescagem {rodada}: {len(tarefas)} itens rejeitados na validação...")
+            for tarefa in tarefas:
+                tarefa.repescagem = rodada
+            if self.afinidade_modelo:
+                tarefas = ordenar_por_modelo(tarefas)
+            self.consumir(self.agendador.executar(tarefas))
+
+    def listar_tarefas(self, desafios, modelos, tipo_codigo):
+        """Aplica as mesmas regras de pulo/retomada e gera apenas as tarefas pendentes"""
+        for desafio in desafios:
+            prompt_python = self.gerador_codigo_llm.GetPrompt(desafio['descricao'], tipo_codigo, Linguagem.PYTHON.value)
+            prompt_java = self.gerador_codigo_llm.GetPrompt(desafio['descricao'], tipo_codigo, Linguagem.JAVA.value)
+
+            for modelo in modelos:
+                modelo_processado_python = self.gerador_codigo_llm.ModeloJaProcessado(desafio['id_desafio'], modelo['id_modelo'], tipo_codigo.value, Linguagem.PYTHON.value)
+                modelo_processado_java = self.gerador_codigo_llm.ModeloJaProcessado(desafio['id_desafio'], modelo['id_modelo'], tipo_codigo.value, Linguagem.JAVA.value)
+
+                if modelo_processado_python and modelo_processado_java:
+                    print(f"Desafio {desafio['id_desafio']} já processado. Pulando...")
+                    continue
+
+                modelo_processado_python_Json = self.journal.contem(desafio['id_desafio'], modelo['id_modelo'], tipo_codigo.value, Linguagem.PYTHON.value)
+                modelo_processado_java_Json = self.journal.contem(desafio['id_desafio'], modelo['id_modelo'], tipo_codigo.value, Linguagem.JAVA.value)
+                if(modelo_processado_python_Json and modelo_processado_java_Json):
+                    print(f"Desafio {desafio['id_desafio']} já processado para o modelo {modelo['nome_modelo']} no arquivo JSON. Pulando...")
+                    continue
+                if (modelo_processado_python or modelo_processado_python_Json):
+                    print(f"Desafio {desafio['id_desafio']} já processado para o modelo {modelo['nome_modelo']} (Python). Pulando...")
+                else:
+                    yield TarefaGeracao(desafio['id_desafio'], modelo['id_modelo'], modelo['nome_modelo'], Linguagem.PYTHON.value, prompt_python, tipo_codigo)
+                if (modelo_processado_java or modelo_processado_java_Json):
+                    print(f"Desafio {desafio['id_desafio']} já processado para o modelo {modelo['nome_modelo']} (Java). Pulando...")
+                else:
+                    yield TarefaGeracao(desafio['id_desafio'], modelo['id_modelo'], modelo['nome_modelo'], Linguagem.JAVA.value, prompt_java, tipo_codigo)
+
     def processar_desafios(self, tipo_codigo):
         try:
             desafios = self.llm_request.select_into_table(table_name="desafios", campos=["id_desafio", "enunciado AS descricao"], size=10000)
             modelos = self.llm_request.select_into_table(table_name="modelos", campos=["id_modelo", "nome_modelo"], size=4)
-            resultados_salvos = 0;
-            for desafio in desafios:
-                prompt_python = self.gerador_codigo_llm.GetPrompt(desafio['descricao'], tipo_codigo, Linguagem.PYTHON.value)
-                prompt_java = self.gerador_codigo_llm.GetPrompt(desafio['descricao'], tipo_codigo, Linguagem.JAVA.value)
-                
-                for modelo in modelos:   
-                    modelo_processado_python = self.gerador_codigo_llm.ModeloJaProcessado(desafio['id_desafio'], modelo['id_modelo'], tipo_codigo.value, Linguagem.PYTHON.value)
-                    modelo_processado_java = self.gerador_codigo_llm.ModeloJaProcessado(desafio['id_desafio'], modelo['id_modelo'], tipo_codigo.value, Linguagem.JAVA.value)
-                    
-
-                    if modelo_processado_python and modelo_processado_java:
-                        print(f"Desafio {desafio['id_desafio']} já processado. Pulando...")
-                        continue
-
-                    resultados_acumulados = self.gerador_codigo_llm.ler_resultados_processados_do_arquivo(self.nome_arquivo_json) or []
-                    modelo_processado_python_Json = any(r.id_desafio == desafio['id_desafio'] and r.id_modelo == modelo['id_modelo'] and r.tipo == tipo_codigo.value and r.linguagem == Linguagem.PYTHON.value for r in resultados_acumulados)
-                    modelo_processado_java_Json = any(r.id_desafio == desafio['id_desafio'] and r.id_modelo == modelo['id_modelo'] and r.tipo == tipo_codigo.value and r.linguagem == Linguagem.JAVA.value for r in resultados_acumulados)
-                    if(modelo_processado_python_Json and modelo_processado_java_Json):
-                        print(f"Desafio {desafio['id_desafio']} já processado para o modelo {modelo['nome_modelo']} no arquivo JSON. Pulando...")
-                        continue
-                    if (modelo_processado_python or modelo_processado_python_Json):
-                        print(f"Desafio {desafio['id_desafio']} já processado para o modelo {modelo['nome_modelo']} (Python). Pulando...")
-                    else:
-                        # print(prompt_python)
-                        desafio_python = self.executar_desafio(modelo_processado = modelo_processado_python_Json, id_desafio = desafio['id_desafio'], id_modelo = modelo['id_modelo'], prompt = prompt_python, nome_modelo = modelo['nome_modelo'], linguagem = Linguagem.PYTHON.value, tipo_codigo = tipo_codigo)
-                        if desafio_python:
-                            resultados_acumulados.append(desafio_python)
-                    if (modelo_processado_java or modelo_processado_java_Json):
-                      print(f"Desafio {desafio['id_desafio']} já processado para o modelo {modelo['nome_modelo']} (Java). Pulando...")
-                    else:
-                        # print(prompt_java)
-                        desafio_java = self.executar_desafio(modelo_processado = modelo_processado_java_Json, id_desafio = desafio['id_desafio'], id_modelo = modelo['id_modelo'], prompt = prompt_java, nome_modelo = modelo['nome_modelo'], linguagem = Linguagem.JAVA.value, tipo_codigo = tipo_codigo)
-                        if desafio_java:
-                            resultados_acumulados.append(desafio_java)
-                    
-                    self.gerador_codigo_llm.escrever_resultados_em_json(caminho_arquivo = self.nome_arquivo_json, resultados_acumulados = resultados_acumulados)
-                    if(resultados_acumulados.__len__() >= 100):
-                        self.llm_request.insert_resultados(resultados_acumulados)
-                        resultados_salvos = resultados_salvos + 1
-                        self.nome_arquivo_json = f"resultado_baseline_{resultados_salvos}.json"
-
-
-            # Após processar todos os desafios e modelos, ler os resultados acumulados do arquivo JSON para garantir que a variável esteja definida
-            self.resultados_processados = self.gerador_codigo_llm.ler_resultados_processados_do_arquivo(self.nome_arquivo_json)
+            # Reproduz o journal uma única vez: índice de chaves e resultados ainda não gravados no banco
+            self.journal.abrir()
+            self.gerador_codigo_llm.carregar_indice_processados(self.journal)
+
+            tarefas = self.listar_tarefas(desafios, modelos, tipo_codigo)
+            if self.afinidade_modelo:
+                tarefas = ordenar_por_modelo(tarefas)
+            if self.tamanho_lote > 1 and tipo_codigo == TipoCodigo.BASELINE_SIMPLIFICADO:
+                tarefas = agrupar_em_lotes(tarefas, self.tamanho_lote, ordem_por_modelo=self.afinidade_modelo)
+            self.consumir(self.agendador.executar(tarefas))
+            self.executar_repescagem()
+
+            self.resultados_processados = self.journal.pendentes
             
-            # Persistência no Banco
-            if self.resultados_processados:
-                self.llm_request.insert_resultados(self.resultados_processados)
+            # Persistência no Banco (o que falhar fica no journal para a próxima execução)
+            self.journal.persistir(self.llm_request)
 
         except Exception as e:
             print(f"Erro geral: {e}")
         finally:
+            self.journal.fechar()
+            print(f"Cache de respostas da LLM: {self.gerador_codigo_llm.llm_request.estatisticas_cache()}")
+            self.gerador_codigo_llm.llm_request.relatorio_carga()
+            self.gerador_codigo_llm.llm_request.relatorio_backends()
+            self.gerador_codigo_llm.estatisticas_retentativa.exportar(self.nome_arquivo_retentativas)
             self.llm_request.close_db_connection()
 
 
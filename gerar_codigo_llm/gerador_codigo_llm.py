@@ -1,9 +1,7 @@
-import json
 import os
 import re
 import sys
 from entity.resultado import Resultado
-from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception_type
 root_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
 if root_path not in sys.path:
     sys.path.append(root_path)
@@ -11,7 +9,14 @@ from enums.lingagem import Linguagem
 from repository.repository import Repository
 from enums.llm import llm 
 from enums.tipo_codigo import TipoCodigo
+from gerar_codigo_llm.indice_processados import IndiceProcessados
+from gerar_codigo_llm.journal_jsonl import JournalJsonl
 from gerar_codigo_llm.llm_request import LLMRequester
+from gerar_codigo_llm.retentativas import CodigoRejeitado, EstatisticasRetentativa, politica_retentativa
+
+
+# Marcador de início de cada resposta no modo em lote: "### RESPOSTA 2", "**RESPOSTA 2**", "RESPOSTA 2:"
+PADRAO_MARCADOR_RESPOSTA = re.compile(r'^[#*\s]*RESPOSTA\s*(?:N[º°o.]?\s*)?(\d+)[*:\s]*$', re.IGNORECASE | re.MULTILINE)
 
 
 class gerador_codigo_llm:
@@ -19,6 +24,9 @@ class gerador_codigo_llm:
     def __init__(self):
         self.llm_request = LLMRequester()
         self.repostitory = Repository()
+        self.journals_prompt = {}
+        self.indice_processados = None
+        self.estatisticas_retentativa = EstatisticasRetentativa()
 
     def validar_codigo_python(self, codigo):
         """Verifica se a resposta realmente parece um código funcional"""
@@ -57,21 +65,28 @@ class gerador_codigo_llm:
             return codigo_parcial
             
         return texto.strip()
-    # @retry(
-    #     stop=stop_after_attempt(1),
-    #     wait=wait_exponential(multiplier=2, min=4, max=20),
-    #     retry=retry_if_exception_type(Exception),
-    #     before_sleep=lambda retry_state: print(f"Aguardando próxima tentativa... (Tentativa {retry_state.attempt_number})")
-    # )
-    def solicitar_codigo_llm(self, modelo_nome, prompt_corpo, linguagem):
+    def request_com_retentativa(self, modelo_nome, id_tecnico, prompt, **kwargs):
+        """Chamada à LLM com backoff só para erros transitórios; esgotadas as tentativas, o erro sobe"""
+        self.estatisticas_retentativa.registrar(modelo_nome, 'solicitacoes')
+        try:
+            return politica_retentativa(modelo_nome, self.estatisticas_retentativa)(self.llm_request.request_llama, id_tecnico, prompt, **kwargs)
+        except CodigoRejeitado:
+            raise
+        except Exception:
+            self.estatisticas_retentativa.registrar(modelo_nome, 'falhas_transitorias')
+            raise
+
+    def solicitar_codigo_llm(self, modelo_nome, prompt_corpo, linguagem, repescagem=0):
         """
-        Tenta gerar o código. Se a validação falhar, levanta exceção 
-        para o @retry tentar novamente (até 5 vezes com espera exponencial).
+        Gera o código. Erros de transporte são repetidos com backoff; se a validação falhar,
+        levanta CodigoRejeitado para o chamador reenfileirar o item no fim da execução.
+        `repescagem` é a rodada (0 = primeira tentativa): a partir da 1 a amostragem muda
+        (LLMRequester.opcoes), senão o modelo repetiria a resposta rejeitada.
         """
         try: 
             codigo_bruto = ""
             id_tecnico = llm[modelo_nome.upper()].value
-            codigo_bruto = self.llm_request.request_llama(id_tecnico, prompt_corpo)
+            codigo_bruto = self.request_com_retentativa(modelo_nome, id_tecnico, prompt_corpo, rodada=int(repescagem))
 
             # 2. Extração e Limpeza
             if Linguagem.PYTHON.value in linguagem:
@@ -82,27 +97,112 @@ class gerador_codigo_llm:
             # 3. Defensiva: Validação de Conteúdo
             if Linguagem.PYTHON.value in linguagem:
                 if not self.validar_codigo_python(codigo_limpo) or len(codigo_limpo) < 20:
-                    print(f"[{modelo_nome}] Falha na validação. Tentando novamente...")
-                    raise ValueError("A IA não gerou um código Python válido.")
+                    self.estatisticas_retentativa.registrar(modelo_nome, 'rejeicoes')
+                    raise CodigoRejeitado("A IA não gerou um código Python válido.")
             elif Linguagem.JAVA.value in linguagem:
                 if not self.validar_codigo_java(codigo_limpo) or len(codigo_limpo) < 20:
-                    print(f"[{modelo_nome}] Falha na validação. Tentando novamente...")
-                    raise ValueError("A IA não gerou um código Java válido.")
+                    self.estatisticas_retentativa.registrar(modelo_nome, 'rejeicoes')
+                    raise CodigoRejeitado("A IA não gerou um código Java válido.")
 
+            if repescagem:
+                self.estatisticas_retentativa.registrar(modelo_nome, 'recuperadas')
             return codigo_limpo
         except Exception as e:
             print(f"Erro ao solicitar código do modelo {modelo_nome}: {e}")
             raise
 
+    def solicitar_codigo_llm_lote(self, modelo_nome, itens):
+        """
+        Envia vários itens (prompt, linguagem) em um único prompt e devolve {índice do item: código}.
+        Itens ausentes na resposta ou que não passam na validação ficam de fora, para o
+        chamador refazê-los individualmente.
+        """
+        id_tecnico = llm[modelo_nome.upper()].value
+        prompt = self.GetPromptLote(itens)
+        # Várias respostas no mesmo texto: não pode parar no primeiro bloco de código
+        codigo_bruto = self.request_com_retentativa(modelo_nome, id_tecnico, prompt, parar_no_primeiro_bloco=False)
+        respostas = self.separar_respostas_lote(codigo_bruto, len(itens))
+
+        codigos = {}
+        for indice, (_, linguagem) in enumerate(itens):
+            if indice not in respostas:
+                print(f"[{modelo_nome}] Item {indice + 1} do lote ausente na resposta.")
+                continue
+            if Linguagem.PYTHON.value in linguagem:
+                codigo_limpo = self.extrair_codigo(respostas[indice])
+                valido = self.validar_codigo_python(codigo_limpo)
+            else:
+                codigo_limpo = self.extrair_codigo_java(respostas[indice])
+                valido = self.validar_codigo_java(codigo_limpo)
+            if valido and len(codigo_limpo) >= 20:
+                codigos[indice] = codigo_limpo
+            else:
+                print(f"[{modelo_nome}] Item {indice + 1} do lote falhou na validação.")
+        return codigos
+
+    def separar_respostas_lote(self, texto, quantidade):
+        """
+        Divide a resposta de um prompt em lote pelos marcadores "RESPOSTA <n>" e devolve
+        {índice (0-based): trecho}. Sem marcadores, usa os blocos de código na ordem se a
+        quantidade bater com a de itens.
+        """
+        marcadores = list(PADRAO_MARCADOR_RESPOSTA.finditer(texto))
+        respostas = {}
+        for posicao, marcador in enumerate(marcadores):
+            numero = int(marcador.group(1))
+            fim = marcadores[posicao + 1].start() if posicao + 1 < len(marcadores) else len(texto)
+            if 1 <= numero <= quantidade and (numero - 1) not in respostas:
+                respostas[numero - 1] = texto[marcador.end():fim]
+        if respostas:
+            return respostas
+
+        blocos = re.findall(r'```[^\n]*\n.*?\n[ \t]*```', texto, re.DOTALL)
+        if len(blocos) == quantidade:
+            return dict(enumerate(blocos))
+        return {}
+
+    def GetPromptLote(self, itens):
+        """
+        Junta os prompts individuais (GetPrompt, texto inalterado) de vários itens em um só, com
+        instruções para responder cada um sob o marcador RESPOSTA <n>
+        """
+        partes = [
+            "Atenda cada um dos itens abaixo, de forma independente.\n\n "
+        ]
+        for indice, (prompt, _) in enumerate(itens, 1):
+            partes.append(
+                f"ITEM {indice}: \n\n "
+                f"{prompt} \n\n "
+            )
+        partes.append(
+            "Instruções para a saída:\n "
+            "Para cada item, escreva uma linha com \"### RESPOSTA <número do item>\" seguida da solução "
+            "na linguagem indicada dentro de um bloco de código.\n "
+            f"Responda os {len(itens)} itens, na ordem.\n "
+        )
+        return "".join(partes)
+
+    def trocar_modelo(self, modelo_anterior, modelo_novo):
+        """Descarrega o modelo anterior e pré-carrega o novo no Ollama (nomes da tabela modelos)"""
+        anterior = llm[modelo_anterior.upper()].value if modelo_anterior else None
+        self.llm_request.trocar_modelo(anterior, llm[modelo_novo.upper()].value)
+
+    def carregar_indice_processados(self, journal=None):
+        """Monta o índice de processados com uma consulta em lote e mescla as chaves do journal local"""
+        self.indice_processados = IndiceProcessados(self.validar_codigo_python)
+        self.indice_processados.carregar_do_banco(self.repostitory)
+        if journal is not None:
+            self.indice_processados.mesclar(journal.chaves)
+
+    def marcar_processado(self, resultado: Resultado):
+        if self.indice_processados is not None:
+            self.indice_processados.adicionar(resultado.id_desafio, resultado.id_modelo, resultado.tipo, resultado.linguagem)
+
     def ModeloJaProcessado(self, id_desafio, id_modelo, tipo_codigo, linguagem):
         """Verifica se já existe um resultado para esse desafio e modelo"""
-        resultados = self.repostitory.select_into_table(
-            table_name='resultados', 
-            campos=['codigo_fonte'], 
-            data={'id_desafio': id_desafio, 'id_modelo': id_modelo, 'tipo': tipo_codigo, 'linguagem': linguagem},
-            size=1
-        )
-        return len(resultados) > 0 and resultados[0]['codigo_fonte'] is not None and self.validar_codigo_python(resultados[0]['codigo_fonte'])
+        if self.indice_processados is None:
+            self.carregar_indice_processados()
+        return self.indice_processados.contem(id_desafio, id_modelo, tipo_codigo, linguagem)
 
     def GetPrompt(self, descricao, tipo_codigo, linguagem):
         """Gera o prompt específico para o tipo de código solicitado"""
@@ -153,52 +253,10 @@ class gerador_codigo_llm:
                 f" 2. Certifique-se de que o código gerado seja funcionalmente correto, seguindo as melhores práticas de desenvolvimento e seja significativamente melhor em termos de qualidade em comparação com o código original. \n"
                 f" 3. O código não pode conter erros de sintaxe ou semântica e deve ser funcionalmente correto, seguindo as melhores práticas de desenvolvimento."
             )
-    def escrever_resultados_em_json(self, caminho_arquivo, resultados_acumulados):
-        try:
-            with open(caminho_arquivo, 'w') as f:
-                dados_para_salvar = [r.__dict__ for r in resultados_acumulados]
-                json.dump(dados_para_salvar, f, indent=4)
-        except Exception as e:
-            print(f"Erro ao escrever resultados no arquivo JSON: {e}")
-    
     def escrever_prompt_em_json(self, caminho_arquivo, prompt):
         try:
-            dados = []
-            if os.path.exists(caminho_arquivo):
-                with open(caminho_arquivo, 'r', encoding='utf-8') as f:
-                    try:
-                        dados = json.load(f)
-                        if not isinstance(dados, list):
-                            dados = []
-                    except json.JSONDecodeError:
-                        dados = []
-
-            dados.append(prompt)
-
-            with open(caminho_arquivo, 'w', encoding='utf-8') as f:
-                json.dump(dados, f, indent=4, ensure_ascii=False)
+            if caminho_arquivo not in self.journals_prompt:
+                self.journals_prompt[caminho_arquivo] = JournalJsonl(caminho_arquivo)
+            self.journals_prompt[caminho_arquivo].anexar(prompt)
         except Exception as e:
-            print(f"Erro ao escrever prompts no arquivo JSON: {e}")
-
-    def ler_resultados_processados_do_arquivo(self, caminho_arquivo):
-        if not os.path.exists(caminho_arquivo):
-            print(f"Aviso: Arquivo {caminho_arquivo} não encontrado.")
-            return
-        resultados_processados = list[Resultado]()
-        with open(caminho_arquivo, 'r') as f:
-            try:
-                dados = json.load(f)
-                if isinstance(dados, list):
-                    for item in dados:
-                        resultado = Resultado(
-                            id_desafio=item['id_desafio'],
-                            id_modelo=item['id_modelo'],
-                            tipo=item['tipo'],
-                            codigo_fonte=item['codigo_fonte'],
-                            linguagem=item['linguagem']
-                        )
-                        resultados_processados.append(resultado)
-            except json.JSONDecodeError:
-                print(f"Erro: O arquivo {caminho_arquivo} está corrompido ou vazio.")
-        return resultados_processados
-
+            print(f"Erro ao escrever prompts no arquivo JSONL: {e}")
@@ -1,4 +1,3 @@
-import json
 import os
 import sys
 root_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
@@ -9,6 +8,9 @@ from entity.resultado import Resultado
 from enums.lingagem import Linguagem
 from enums.tipo_codigo import TipoCodigo
 from gerar_codigo_llm.gerador_codigo_llm import gerador_codigo_llm
+from gerar_codigo_llm.journal_jsonl import JournalResultados
+from gerar_codigo_llm.retentativas import CodigoRejeitado
+from repository.fila_trabalho import TAREFA_REFATORACAO, FilaTrabalho
 from repository.repository import Repository
 
 class Gerador_Refatorado:
@@ -16,14 +18,20 @@ class Gerador_Refatorado:
         self.repository = Repository()
         self.gerador_codigo_llm = gerador_codigo_llm()
         self.resultados_processados: list[Resultado]
-        self.nome_arquivo_json = f"resultado_{tipocodigo.value}.json"
-        self.nome_arquivo_prompt_json = f"resultado_{tipocodigo.value}_prompts.json"
+        self.nome_arquivo_json = f"resultado_{tipocodigo.value}.jsonl"
+        self.nome_arquivo_prompt_json = f"resultado_{tipocodigo.value}_prompts.jsonl"
+        self.journal = JournalResultados(self.nome_arquivo_json)
         self.tipo_codigo = tipocodigo
+        self.tipo_origem = 'baseline_simplificado'
+        # Itens rejeitados na validação são refeitos no fim da execução, por até LLM_REPESCAGENS rodadas
+        self.fila_repescagem = []
+        self.max_repescagens = int(os.getenv('LLM_REPESCAGENS', 1))
+        self.nome_arquivo_retentativas = f"resultado_{tipocodigo.value}_retentativas.json"
     
-    def executar_refatoracao(self, prompt, id_desafio, id_modelo, nome_modelo, linguagem, id_resultado):
+    def executar_refatoracao(self, prompt, id_desafio, id_modelo, nome_modelo, linguagem, id_resultado, repescagem=0):
         try:
             print(f"Processando Desafio {id_desafio} com {nome_modelo}, para a linguagem {linguagem}... Para o resultado de id {id_resultado}...")
-            codigo_Java_gerado = self.gerador_codigo_llm.solicitar_codigo_llm(nome_modelo, prompt, linguagem)
+            codigo_Java_gerado = self.gerador_codigo_llm.solicitar_codigo_llm(nome_modelo, prompt, linguagem, repescagem)
             if not codigo_Java_gerado:
                 raise ValueError("A IA não gerou um código válido.")
             return Resultado(
@@ -37,13 +45,22 @@ class Gerador_Refatorado:
             print(f"Falha no modelo {nome_modelo} ({linguagem}): {e}")
             raise
 
+    def refatorar_e_registrar(self, prompt, resultado, modelo, repescagem=0):
+        resultado_gerado = self.executar_refatoracao(prompt, resultado['id_desafio'], resultado['id_modelo'], modelo['nome_modelo'], resultado['linguagem'], resultado['id_resultado'], repescagem)
+        self.journal.registrar(resultado_gerado)
+        self.gerador_codigo_llm.marcar_processado(resultado_gerado)
+
+        if len(self.journal.pendentes) >= 100:
+            self.journal.persistir(self.repository)
+
     def processar_refatoracao(self):
         try:
-            resultados = self.repository.select_into_table(table_name= "resultados", campos=["id_resultado", "id_desafio", "id_modelo", "codigo_fonte", "linguagem"], filter="tipo = 'baseline_simplificado' and codigo_fonte is not null", size=10000)
-            #resultados = self.repository.getResultadosBaselineNaoExecutados(self.tipo_codigo.value, 10000)
+            # Linhas chegam em streaming: a refatoração começa sem esperar o resultado inteiro
+            resultados = self.repository.select_into_table_stream(table_name= "resultados", campos=["id_resultado", "id_desafio", "id_modelo", "codigo_fonte", "linguagem"], filter=f"tipo = '{self.tipo_origem}' and codigo_fonte is not null", size=10000)
+            #resultados = self.repository.getResultadosBaselineNaoExecutadosStream(self.tipo_codigo.value, 10000)
             modelos = self.repository.select_into_table(table_name = "modelos", campos=["id_modelo", "nome_modelo"])
-            self.resultados_processados = self.gerador_codigo_llm.ler_resultados_processados_do_arquivo(self.nome_arquivo_json) or list[Resultado]()
-            count_arquivo = 1
+            self.journal.abrir()
+            self.gerador_codigo_llm.carregar_indice_processados(self.journal)
             for resultado in resultados:
                 modelo = next((m for m in modelos if m['id_modelo'] == resultado['id_modelo']), None)
                 # pega o enum de modelos pelo nome do modelo    
@@ -59,35 +76,106 @@ class Gerador_Refatorado:
                 # self.gerador_codigo_llm.escrever_prompt_em_json(self.nome_arquivo_prompt_json, prompt)
                 # continue
                 try:
-                    modelo_processado = any(r.id_desafio == resultado['id_desafio'] and r.id_modelo == modelo['id_modelo'] and r.tipo == self.tipo_codigo.value and r.linguagem == resultado['linguagem'] for r in self.resultados_processados)
+                    modelo_processado = self.journal.contem(resultado['id_desafio'], modelo['id_modelo'], self.tipo_codigo.value, resultado['linguagem'])
                     if(modelo_processado):
                         print(f"Desafio {resultado['id_desafio']} já processado para o modelo {modelo['nome_modelo']} ({resultado['linguagem']}) no arquivo JSON. Pulando...")
                         continue
 
-                    resultado_gerado = self.executar_refatoracao(prompt, resultado['id_desafio'], resultado['id_modelo'], modelo['nome_modelo'], resultado['linguagem'], resultado['id_resultado'])
-                    self.resultados_processados.append(resultado_gerado)
-                    self.gerador_codigo_llm.escrever_resultados_em_json(self.nome_arquivo_json, self.resultados_processados)
-
-                    if len(self.resultados_processados) >= 100:
-                        self.repository.insert_resultados(self.resultados_processados)
-                        self.resultados_processados = list[Resultado]()
-                        count_arquivo = count_arquivo + 1
-                        self.nome_arquivo_json = f"resultado_refatorado{count_arquivo}.json"
-                    
+                    self.refatorar_e_registrar(prompt, resultado, modelo)
+                except CodigoRejeitado:
+                    print(f"Desafio {resultado['id_desafio']} ({resultado['linguagem']}) reenfileirado para o fim da execução.")
+                    self.fila_repescagem.append((prompt, resultado, modelo))
                 except Exception as e:
                     print(f"Falha crítica após retentativas no desafio {resultado['id_desafio']} para o tipo de código {self.tipo_codigo.value}: {e}")
+
+            self.executar_repescagem()
             
-            # Persistência no Banco
-            if self.resultados_processados:
-                self.repository.insert_resultados(self.resultados_processados)
+            # Persistência no Banco (o que falhar fica no journal para a próxima execução)
+            self.resultados_processados = self.journal.pendentes
+            self.journal.persistir(self.repository)
         except Exception as e:
             print(f"Erro ao processar desafios: {e}")
         finally:
-            self.repository.close_db_connection()
+            self.finalizar()
+
+    def executar_repescagem(self):
+        rodada = 0
+        while self.fila_repescagem and rodada < self.max_repescagens:
+            rodada += 1
+            itens = self.fila_repescagem
+            self.fila_repescagem = []
+            print(f"Repescagem {rodada}: {len(itens)} itens rejeitados na validação...")
+            for prompt, resultado, modelo in itens:
+                try:
+                    self.refatorar_e_registrar(prompt, resultado, modelo, repescagem=rodada)
+                except CodigoRejeitado:
+                    self.fila_repescagem.append((prompt, resultado, modelo))
+                except Exception as e:
+                    print(f"Desafio {resultado['id_desafio']} ({resultado['linguagem']}) falhou na repescagem {rodada}: {e}")
+        for prompt, resultado, modelo in self.fila_repescagem:
+            print(f"Desafio {resultado['id_desafio']} ({resultado['linguagem']}) rejeitado também na repescagem.")
+
+    def processar_refatoracao_distribuida(self, tamanho_lote=None):
+        """
+        Como processar_refatoracao, mas o trabalho vem da tabela fila_trabalho: cada máquina
+        reivindica lotes com lease e só conclui as tarefas depois de gravar os resultados no banco.
+        Tarefas que falham voltam para a fila (até FILA_MAX_TENTATIVAS), para qualquer worker.
+        """
+        tamanho_lote = tamanho_lote or int(os.getenv('FILA_TAMANHO_LOTE', 10))
+        fila = FilaTrabalho(TAREFA_REFATORACAO, self.repository)
+        try:
+            fila.enfileirar_refatoracao(self.tipo_codigo.value, self.tipo_origem)
+            modelos = {m['id_modelo']: m for m in self.repository.select_into_table(table_name = "modelos", campos=["id_modelo", "nome_modelo"])}
+            self.journal.abrir()
+            while True:
+                tarefas = fila.reivindicar(tamanho_lote)
+                if not tarefas:
+                    break
+                ids_tarefas = [tarefa['id_tarefa'] for tarefa in tarefas]
+                concluidas, falhas = [], []
+                for tarefa in tarefas:
+                    modelo = modelos[tarefa['id_modelo']]
+                    # Gerado antes de uma queda, mas ainda não gravado: vai junto com os pendentes do journal
+                    if self.journal.contem(tarefa['id_desafio'], tarefa['id_modelo'], self.tipo_codigo.value, tarefa['linguagem']):
+                        concluidas.append(tarefa['id_tarefa'])
+                        continue
+                    prompt = self.gerador_codigo_llm.GetPrompt(tarefa['codigo_fonte'], self.tipo_codigo, tarefa['linguagem'])
+                    try:
+                        # Reivindicada de novo = já falhou ou foi rejeitada antes: cada tentativa é uma rodada de repescagem
+                        self.refatorar_e_registrar(prompt, tarefa, modelo, repescagem=tarefa['tentativas'] - 1)
+                        concluidas.append(tarefa['id_tarefa'])
+                    except Exception as e:
+                        print(f"Tarefa {tarefa['id_tarefa']} (desafio {tarefa['id_desafio']}, {tarefa['linguagem']}) devolvida à fila: {e}")
+                        falhas.append(tarefa['id_tarefa'])
+                    fila.renovar(ids_tarefas)
+
+                # Gravação com falha: nada é concluído e o lote volta para a fila (os resultados
+                # seguem no journal e são regravados quando a tarefa for reivindicada de novo)
+                if not self.journal.persistir(self.repository):
+                    falhas += concluidas
+                    concluidas = []
+                fila.concluir(concluidas)
+                fila.devolver(falhas)
+            print(f"Fila de refatoração ({fila.dono}): {fila.resumo()}")
+        except Exception as e:
+            print(f"Erro ao processar a fila de refatoração: {e}")
+        finally:
+            self.finalizar()
+
+    def finalizar(self):
+        self.journal.fechar()
+        print(f"Cache de respostas da LLM: {self.gerador_codigo_llm.llm_request.estatisticas_cache()}")
+        self.gerador_codigo_llm.llm_request.relatorio_backends()
+        self.gerador_codigo_llm.estatisticas_retentativa.exportar(self.nome_arquivo_retentativas)
+        self.repository.close_db_connection()
                     
 
 if __name__ == "__main__":
-    gerador = Gerador_Refatorado(TipoCodigo.REFATORADO_ORIGEM_SIMPLIFICADO)
-    gerador.processar_refatoracao()
-    gerador = Gerador_Refatorado(TipoCodigo.REFATORADO_SIMPLIFICADO_ORIGEM_SIMPLIFICADO)
-    gerador.processar_refatoracao()
\ No newline at end of file
+    # --distribuido: consome a fila_trabalho, para rodar o mesmo comando em várias máquinas
+    distribuido = "--distribuido" in sys.argv
+    for tipo_codigo in (TipoCodigo.REFATORADO_ORIGEM_SIMPLIFICADO, TipoCodigo.REFATORADO_SIMPLIFICADO_ORIGEM_SIMPLIFICADO):
+        gerador = Gerador_Refatorado(tipo_codigo)
+        if distribuido:
+            gerador.processar_refatoracao_distribuida()
+        else:
+            gerador.processar_refatoracao()
\ No newline at end of file
@@ -0,0 +1,39 @@
+import threading
+
+
+class IndiceProcessados:
+    """
+    Conjunto em memória das chaves (id_desafio, id_modelo, tipo, linguagem) já processadas.
+    É carregado com uma única consulta em `resultados`, mesclado com o journal local
+    e atualizado conforme novos resultados são gerados.
+    """
+
+    def __init__(self, validar_codigo):
+        self.validar_codigo = validar_codigo
+        self.chaves = set()
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def chave(id_desafio, id_modelo, tipo, linguagem):
+        return (id_desafio, id_modelo, tipo, linguagem)
+
+    def carregar_do_banco(self, repository):
+        chaves = set()
+        for linha in repository.getChavesResultados():
+            # Mesma regra de validade aplicada antes na consulta linha a linha
+            if linha['codigo_fonte'] is not None and self.validar_codigo(linha['codigo_fonte']):
+                chaves.add(self.chave(linha['id_desafio'], linha['id_modelo'], linha['tipo'], linha['linguagem']))
+        with self.lock:
+            self.chaves.update(chaves)
+        print(f"Índice de processados carregado do banco: {len(chaves)} chaves.")
+
+    def mesclar(self, chaves):
+        with self.lock:
+            self.chaves.update(chaves)
+
+    def adicionar(self, id_desafio, id_modelo, tipo, linguagem):
+        with self.lock:
+            self.chaves.add(self.chave(id_desafio, id_modelo, tipo, linguagem))
+
+    def contem(self, id_desafio, id_modelo, tipo, linguagem):
+        return self.chave(id_desafio, id_modelo, tipo, linguagem) in self.chaves
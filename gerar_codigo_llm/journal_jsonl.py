@@ -0,0 +1,151 @@
+import json
+import os
+import threading
+
+from entity.buffer_resultados import BufferResultados
+from entity.resultado import Resultado
+
+
+class JournalJsonl:
+    """
+    Arquivo JSONL somente de anexação: cada registro é uma linha, gravada de uma vez.
+    O fsync é feito em lotes de `fsync_a_cada` registros; uma queda no meio da escrita
+    deixa no máximo uma linha incompleta no final, que é truncada ao reabrir o arquivo.
+    """
+
+    def __init__(self, caminho_arquivo, fsync_a_cada=20):
+        self.caminho_arquivo = caminho_arquivo
+        self.fsync_a_cada = fsync_a_cada
+        self.registros_sem_fsync = 0
+        self.arquivo = None
+        self.lock = threading.Lock()
+
+    def reparar(self):
+        """Remove a última linha se ela não terminar em '\\n' (escrita interrompida)"""
+        if not os.path.exists(self.caminho_arquivo):
+            return
+        with open(self.caminho_arquivo, 'rb+') as f:
+            tamanho = f.seek(0, os.SEEK_END)
+            if tamanho == 0:
+                return
+            f.seek(tamanho - 1)
+            if f.read(1) == b'\n':
+                return
+
+            posicao = tamanho
+            while posicao > 0:
+                inicio = max(0, posicao - 4096)
+                f.seek(inicio)
+                bloco = f.read(posicao - inicio)
+                indice = bloco.rfind(b'\n')
+                if indice != -1:
+                    f.truncate(inicio + indice + 1)
+                    break
+                posicao = inicio
+            else:
+                f.truncate(0)
+            print(f"Aviso: última linha incompleta removida de {self.caminho_arquivo}.")
+
+    def ler(self):
+        if not os.path.exists(self.caminho_arquivo):
+            return
+        with open(self.caminho_arquivo, 'r', encoding='utf-8') as f:
+            for numero_linha, linha in enumerate(f, 1):
+                if not linha.strip():
+                    continue
+                try:
+                    yield json.loads(linha)
+                except json.JSONDecodeError:
+                    print(f"Erro: linha {numero_linha} do arquivo {self.caminho_arquivo} está corrompida. Ignorando...")
+
+    def anexar(self, registro):
+        linha = json.dumps(registro, ensure_ascii=False) + '\n'
+        with self.lock:
+            if self.arquivo is None:
+                self.reparar()
+                self.arquivo = open(self.caminho_arquivo, 'a', encoding='utf-8')
+            self.arquivo.write(linha)
+            self.arquivo.flush()
+            self.registros_sem_fsync += 1
+            if self.registros_sem_fsync >= self.fsync_a_cada:
+                os.fsync(self.arquivo.fileno())
+                self.registros_sem_fsync = 0
+
+    def sincronizar(self):
+        with self.lock:
+            if self.arquivo is not None and self.registros_sem_fsync:
+                self.arquivo.flush()
+                os.fsync(self.arquivo.fileno())
+                self.registros_sem_fsync = 0
+
+    def fechar(self):
+        self.sincronizar()
+        with self.lock:
+            if self.arquivo is not None:
+                self.arquivo.close()
+                self.arquivo = None
+
+
+class JournalResultados(JournalJsonl):
+    """
+    Journal de resultados gerados com índice das chaves (id_desafio, id_modelo, tipo, linguagem).
+    Uma linha {"_persistido": true} marca que tudo o que veio antes já foi gravado no banco.
+    """
+
+    def __init__(self, caminho_arquivo, fsync_a_cada=20):
+        super().__init__(caminho_arquivo, fsync_a_cada)
+        self.chaves = set()
+        self.pendentes = BufferResultados()
+
+    @staticmethod
+    def chave(id_desafio, id_modelo, tipo, linguagem):
+        return (id_desafio, id_modelo, tipo, linguagem)
+
+    def abrir(self):
+        """Repara o arquivo e reproduz o journal uma única vez para montar o índice e os pendentes"""
+        self.reparar()
+        self.chaves = set()
+        self.pendentes = BufferResultados()
+        for item in self.ler():
+            if item.get('_persistido'):
+                self.pendentes = BufferResultados()
+                continue
+            resultado = Resultado(
+                id_desafio=item['id_desafio'],
+                id_modelo=item['id_modelo'],
+                tipo=item['tipo'],
+                codigo_fonte=item['codigo_fonte'],
+                linguagem=item['linguagem'],
+                id_resultado_origem=item.get('id_resultado_origem')
+            )
+            self.chaves.add(resultado.chave())
+            self.pendentes.adicionar(resultado)
+        print(f"Journal {self.caminho_arquivo}: {len(self.chaves)} resultados, {len(self.pendentes)} pendentes de persistência.")
+
+    def contem(self, id_desafio, id_modelo, tipo, linguagem):
+        return self.chave(id_desafio, id_modelo, tipo, linguagem) in self.chaves
+
+    def registrar(self, resultado: Resultado):
+        self.anexar(resultado.para_dict())
+        self.chaves.add(resultado.chave())
+        self.pendentes.adicionar(resultado)
+
+    def marcar_persistido(self):
+        self.anexar({'_persistido': True})
+        self.sincronizar()
+        self.pendentes = BufferResultados()
+
+    def persistir(self, repository):
+        """
+        Grava os pendentes no banco e só marca o journal como persistido se nenhuma linha falhar.
+        Caso contrário os pendentes continuam no journal e são regravados na próxima chamada ou
+        na próxima execução (chaves já gravadas são ignoradas pelo upsert). Retorna se gravou tudo.
+        """
+        if not self.pendentes:
+            return True
+        contagem = repository.insert_resultados(self.pendentes)
+        if contagem['falhas']:
+            print(f"  [!] {contagem['falhas']} resultados não gravados: {len(self.pendentes)} pendentes mantidos no journal {self.caminho_arquivo}.")
+            return False
+        self.marcar_persistido()
+        return True
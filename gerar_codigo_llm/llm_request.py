@@ -1,38 +1,197 @@
 import os
-from google.genai import types
-from google import genai
-from dotenv import load_dotenv
-from ollama import Client
+import re
+import threading
+import time
 
+from gerar_codigo_llm.cache_llm import CacheRespostasLLM
+from gerar_codigo_llm.roteador_llm import RoteadorLLM
+from service.ambiente import carregar_ambiente
 
-load_dotenv()
 
-# Configurações de Conexão
-client_google = genai.Client(api_key=os.getenv('GEMINI_API_KEY'))
+_client_google = None
+_lock_client_google = threading.Lock()
+
+
+def get_client_google():
+    """Cliente do Gemini criado só no primeiro uso (importar google.genai é caro)"""
+    global _client_google
+    if _client_google is None:
+        with _lock_client_google:
+            if _client_google is None:
+                from google import genai
+                carregar_ambiente()
+                _client_google = genai.Client(api_key=os.getenv('GEMINI_API_KEY'))
+    return _client_google
+
+# Bloco de código cercado completo: abertura ``` (com ou sem linguagem) até o ``` de fechamento
+PADRAO_BLOCO_CODIGO = re.compile(r'```[^\n]*\n.*?\n[ \t]*```', re.DOTALL)
+
+
+def fim_primeiro_bloco(texto):
+    """Posição logo após o fechamento do primeiro bloco de código, ou -1 se ele ainda não fechou"""
+    bloco = PADRAO_BLOCO_CODIGO.search(texto)
+    return bloco.end() if bloco else -1
 
 
 class LLMRequester():
-    def __init__(self):
-        self.client = Client(host='http://localhost:11434', timeout=600)
+    def __init__(self, usar_cache=None, streaming=None, roteador=None):
+        carregar_ambiente()
+        # Um ou mais servidores de inferência (OLLAMA_HOSTS / LLM_OPENAI_HOSTS)
+        self.roteador = roteador or RoteadorLLM()
+        # Com streaming a geração é cancelada assim que o primeiro bloco de código fecha
+        self.streaming = streaming if streaming is not None else os.getenv('LLM_STREAMING', '1') == '1'
+        # LLM_CACHE_BYPASS=1 força sempre uma nova inferência (o resultado ainda é gravado no cache)
+        self.usar_cache = usar_cache if usar_cache is not None else os.getenv('LLM_CACHE_BYPASS', '0') != '1'
+        self.cache = CacheRespostasLLM()
+        self.digests = None
+        self.lock_digests = threading.Lock()
+        # Tempo que o Ollama mantém o modelo ativo carregado entre chamadas
+        self.keep_alive = os.getenv('LLM_KEEP_ALIVE', '30m')
+        # load_duration acima disso (em segundos) conta como recarga dos pesos
+        self.limiar_carga = float(os.getenv('LLM_LIMIAR_CARGA', 0.5))
+        # Stream encerrado antes do pedaço final (sem load_duration): primeiro token acima disso conta como recarga
+        self.limiar_carga_primeiro_token = float(os.getenv('LLM_LIMIAR_CARGA_PRIMEIRO_TOKEN', 3))
+        self.estatisticas_carga = {}
+        self.lock_carga = threading.Lock()
+        # Na repescagem a resposta com temperature 0 já foi rejeitada: amostra com esta temperatura
+        self.temperatura_repescagem = float(os.getenv('LLM_TEMPERATURA_REPESCAGEM', 0.7))
+
+    def registrar_carga(self, llm_model, segundos, estimada=False):
+        """`estimada`: carga deduzida da latência do primeiro token, sem o load_duration do Ollama"""
+        with self.lock_carga:
+            estatistica = self.estatisticas_carga.setdefault(llm_model, {'cargas': 0, 'estimadas': 0, 'tempo_carga': 0.0})
+            estatistica['cargas'] += 1
+            estatistica['estimadas'] += int(estimada)
+            estatistica['tempo_carga'] = round(estatistica['tempo_carga'] + segundos, 3)
 
-    def request_llama(self, llm_model, prompt):
+    def registrar_load_duration(self, llm_model, resposta):
+        """O Ollama informa load_duration (ns) na resposta final; acima do limiar houve carga dos pesos"""
+        load_duration = (resposta.get('load_duration') or 0) / 1e9
+        if load_duration > self.limiar_carga:
+            self.registrar_carga(llm_model, load_duration)
+
+    def carregar_modelo(self, llm_model):
+        """Pré-carrega o modelo (prompt vazio) em cada backend ativo fixando keep_alive, e mede o tempo de carga"""
+        for backend in self.roteador.backends_ativos():
+            inicio = time.time()
+            backend.carregar_modelo(llm_model, self.keep_alive)
+            duracao = time.time() - inicio
+            if duracao > self.limiar_carga:
+                self.registrar_carga(llm_model, duracao)
+
+    def descarregar_modelo(self, llm_model):
+        for backend in self.roteador.backends_ativos():
+            backend.carregar_modelo(llm_model, 0)
+
+    def trocar_modelo(self, anterior, novo):
         try:
-            options = {
-                'temperature': 0,
-                }
-            response = self.client.chat(
-                model=llm_model,
-                messages=[{"role": "user", "content": prompt}],
-                options = options
-            )
-            message = response.get('message', {})
-            
-            conteudo = message.get('content', '').strip()
-            
-            if not conteudo:
-                conteudo = message.get('thinking', '').strip()
+            if anterior:
+                self.descarregar_modelo(anterior)
+            print(f"Carregando modelo {novo}...")
+            self.carregar_modelo(novo)
+        except Exception as e:
+            print(f"Aviso: falha ao trocar o modelo de {anterior} para {novo}: {e}")
+
+    def digest_modelo(self, llm_model):
+        """Digest dos pesos instalados: se o modelo for atualizado no Ollama, o cache deixa de valer"""
+        with self.lock_digests:
+            if self.digests is None:
+                try:
+                    self.digests = self.roteador.digests()
+                except Exception as e:
+                    print(f"Aviso: não foi possível listar os modelos dos backends para o cache: {e}")
+                    self.digests = {}
+        return self.digests.get(llm_model) or llm_model
+
+    def opcoes(self, rodada=0):
+        """
+        Opções de amostragem: temperature 0 na primeira tentativa; na repescagem `rodada` (1, 2...)
+        temperature LLM_TEMPERATURA_REPESCAGEM com seed = rodada, reprodutível e diferente a cada rodada.
+        As opções entram na chave do cache, então cada rodada tem a sua própria resposta guardada.
+        """
+        if not rodada:
+            return {'temperature': 0}
+        return {'temperature': self.temperatura_repescagem, 'seed': int(rodada)}
 
+    def request_llama(self, llm_model, prompt, parar_no_primeiro_bloco=True, usar_cache=True, rodada=0):
+        try:
+            options = self.opcoes(rodada)
+            digest = self.digest_modelo(llm_model)
+            parar_no_primeiro_bloco = self.streaming and parar_no_primeiro_bloco
+            # A resposta truncada no primeiro bloco é diferente da completa: entra na chave do cache
+            options_cache = {**options, 'parar_no_primeiro_bloco': True} if parar_no_primeiro_bloco else options
+            if self.usar_cache and usar_cache:
+                conteudo = self.cache.obter_resposta(digest, prompt, options_cache)
+                if conteudo:
+                    return conteudo
+
+            messages = [{"role": "user", "content": prompt}]
+            with self.roteador.reservar(llm_model) as backend:
+                if self.streaming:
+                    stream = backend.chat_stream(llm_model, messages, options, self.keep_alive)
+                    conteudo = self.consumir_stream(llm_model, stream, parar_no_primeiro_bloco)
+                else:
+                    response = backend.chat(llm_model, messages, options, self.keep_alive)
+                    self.registrar_load_duration(llm_model, response)
+                    message = response.get('message', {})
+
+                    conteudo = (message.get('content') or '').strip()
+
+                    if not conteudo:
+                        conteudo = (message.get('thinking') or '').strip()
+
+            self.cache.guardar_resposta(digest, prompt, options_cache, conteudo)
             return conteudo
         except Exception as e:
-            print(f"Erro crítico no Ollama Proxy ({llm_model}): {e}")
-            raise
\ No newline at end of file
+            print(f"Erro crítico no LLM ({llm_model}): {e}")
+            raise
+
+    def consumir_stream(self, llm_model, stream, parar_no_primeiro_bloco=True):
+        """
+        Acumula os pedaços da resposta (stream=True) e encerra o stream assim que o primeiro
+        bloco de código cercado fecha. Fechar a conexão faz o servidor interromper a geração,
+        então a prosa que viria depois do código não é gerada.
+        O load_duration só vem no pedaço final; se o stream for encerrado antes, a latência do
+        primeiro token (a requisição só é enviada na primeira iteração) acima de
+        LLM_LIMIAR_CARGA_PRIMEIRO_TOKEN é registrada como carga estimada.
+        """
+        conteudo = ""
+        pensamento = ""
+        inicio = time.monotonic()
+        primeiro_token = None
+        terminou = False
+        try:
+            for chunk in stream:
+                if primeiro_token is None:
+                    primeiro_token = time.monotonic() - inicio
+                if chunk.get('done'):
+                    terminou = True
+                    self.registrar_load_duration(llm_model, chunk)
+                message = chunk.get('message', {})
+                pensamento += message.get('thinking', '') or ''
+                pedaco = message.get('content', '') or ''
+                conteudo += pedaco
+                if parar_no_primeiro_bloco and '`' in pedaco:
+                    fim = fim_primeiro_bloco(conteudo)
+                    if fim != -1:
+                        conteudo = conteudo[:fim]
+                        break
+        finally:
+            stream.close()
+        if not terminou and primeiro_token is not None and primeiro_token > self.limiar_carga_primeiro_token:
+            self.registrar_carga(llm_model, primeiro_token, estimada=True)
+
+        conteudo = conteudo.strip()
+        return conteudo if conteudo else pensamento.strip()
+
+    def relatorio_carga(self):
+        total_cargas = sum(e['cargas'] for e in self.estatisticas_carga.values())
+        total_tempo = sum(e['tempo_carga'] for e in self.estatisticas_carga.values())
+        total_estimadas = sum(e['estimadas'] for e in self.estatisticas_carga.values())
+        print(f"Cargas de modelo: {total_cargas}, {total_estimadas} estimadas pelo primeiro token ({total_tempo:.1f}s carregando) {self.estatisticas_carga}")
+
+    def relatorio_backends(self):
+        print(f"Backends de LLM: {self.roteador.estatisticas()}")
+
+    def estatisticas_cache(self):
+        return self.cache.estatisticas()
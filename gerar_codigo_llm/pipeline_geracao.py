@@ -0,0 +1,400 @@
+import json
+import os
+import queue
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+root_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if root_path not in sys.path:
+    sys.path.append(root_path)
+
+from entity.resultado import Resultado
+from enums.tipo_codigo import TipoCodigo
+from gerar_codigo_llm.gerador_baseline import Gerador_Baseline
+from gerar_codigo_llm.journal_jsonl import JournalResultados
+from gerar_codigo_llm.retentativas import CodigoRejeitado
+from repository.repository import Repository
+from sonarqube import metricas_locais
+from sonarqube.executa_sonarqube import executa_sonarqube
+
+TIPO_BASELINE = TipoCodigo.BASELINE_SIMPLIFICADO
+TIPOS_REFATORACAO = (TipoCodigo.REFATORADO_ORIGEM_SIMPLIFICADO, TipoCodigo.REFATORADO_SIMPLIFICADO_ORIGEM_SIMPLIFICADO)
+
+# Sentinela que encerra os workers de um estágio
+FIM = object()
+
+
+class Estagio:
+    """
+    Consumidor/produtor de uma fila limitada: quando a fila enche, quem emite para ela
+    espera (contrapressão). Cada worker retira até `tamanho_lote` itens de uma vez, sem
+    esperar o lote encher, então um item sozinho segue adiante na hora.
+    """
+
+    def __init__(self, nome, processar, concorrencia=1, capacidade=None, tamanho_lote=1):
+        self.nome = nome
+        self.processar = processar
+        self.concorrencia = concorrencia
+        self.tamanho_lote = tamanho_lote
+        self.fila = queue.Queue(maxsize=capacidade or max(2 * concorrencia, tamanho_lote))
+        self.threads = []
+        self.lock = threading.Lock()
+        self.processados = 0
+        self.tempo_ocupado = 0.0
+        self.maior_fila = 0
+
+    def retirar(self):
+        itens = [self.fila.get()]
+        while len(itens) < self.tamanho_lote and itens[-1] is not FIM:
+            try:
+                itens.append(self.fila.get_nowait())
+            except queue.Empty:
+                break
+        return itens
+
+    def estatisticas(self):
+        return {
+            'concorrencia': self.concorrencia,
+            'processados': self.processados,
+            'tempo_ocupado_s': round(self.tempo_ocupado, 2),
+            'tempo_medio_por_item_s': round(self.tempo_ocupado / self.processados, 3) if self.processados else None,
+            'maior_fila': self.maior_fila,
+        }
+
+
+class PipelineGeracao:
+    """
+    Baseline -> refatoração -> métricas como um fluxo contínuo: cada resultado gravado segue
+    direto para os estágios seguintes, sem esperar o estágio anterior terminar para todos.
+
+        fontes -> baseline -> gravacao_baseline -> refatoracao -> gravacao_refatorado -> metricas
+                                           \\---------------------------------------------/
+
+    Fontes no início da execução: tarefas de baseline pendentes, baselines já gravados sem
+    refatoração e resultados já gravados sem métricas (até o maior id_resultado do momento,
+    para não repetir o que o próprio pipeline grava). Com o mesmo `id_execucao`, os journals
+    da execução anterior são reaproveitados e o restante é retomado a partir do banco.
+    """
+
+    def __init__(self, id_execucao=None):
+        self.id_execucao = id_execucao or os.getenv('PIPELINE_EXECUCAO') or time.strftime('%Y%m%d_%H%M%S')
+        concorrencia_metricas = int(os.getenv('PIPELINE_CONCORRENCIA_METRICAS', 2))
+        self.repository = Repository()
+        # Conexões simultâneas: thread principal, as duas gravações, métricas e as fontes (duas em
+        # streaming). O pool é compartilhado por configuração, então é criado aqui já no tamanho certo
+        self.repository.pool_size = max(self.repository.pool_size, min(32, 8 + concorrencia_metricas))
+        self.repository.get_pool()
+        # Um único gerador (e roteador de LLM) para todos os estágios; os semáforos por modelo
+        # do agendador do baseline limitam as chamadas simultâneas da geração e da refatoração.
+        # Sem afinidade: no pipeline vários modelos ficam ativos ao mesmo tempo
+        self.gerador_baseline = Gerador_Baseline(afinidade_modelo=False)
+        self.gerador_codigo_llm = self.gerador_baseline.gerador_codigo_llm
+        self.journal_baseline = JournalResultados(f"pipeline_{self.id_execucao}_baseline.jsonl")
+        self.journal_refatorado = JournalResultados(f"pipeline_{self.id_execucao}_refatorado.jsonl")
+        self.gerador_baseline.journal = self.journal_baseline
+        # Resultados do journal cuja gravação falhou, por journal, refeitos na próxima gravação
+        self.aguardando_gravacao = {self.journal_baseline: [], self.journal_refatorado: []}
+        self.nome_arquivo_estatisticas = f"pipeline_{self.id_execucao}_estatisticas.json"
+
+        self.backend_metricas = os.getenv('PIPELINE_METRICAS', 'local')
+        self.sonar = executa_sonarqube()
+        self.processos_metricas = None
+        self.workers_sonar = None
+
+        capacidade = os.getenv('PIPELINE_CAPACIDADE_FILA')
+        capacidade = int(capacidade) if capacidade else None
+        self.estagio_baseline = Estagio("baseline", self.gerar_baseline, int(os.getenv('PIPELINE_CONCORRENCIA_BASELINE', 4)), capacidade)
+        self.estagio_gravacao_baseline = Estagio("gravacao_baseline", self.gravar_baseline, 1, capacidade, int(os.getenv('PIPELINE_LOTE_GRAVACAO', 50)))
+        self.estagio_refatoracao = Estagio("refatoracao", self.refatorar, int(os.getenv('PIPELINE_CONCORRENCIA_REFATORACAO', 4)), capacidade)
+        self.estagio_gravacao_refatorado = Estagio("gravacao_refatorado", self.gravar_refatorado, 1, capacidade, int(os.getenv('PIPELINE_LOTE_GRAVACAO', 50)))
+        self.estagio_metricas = Estagio("metricas", self.medir, concorrencia_metricas, capacidade, int(os.getenv('PIPELINE_LOTE_METRICAS', 20)))
+        self.estagios = [self.estagio_baseline, self.estagio_gravacao_baseline, self.estagio_refatoracao, self.estagio_gravacao_refatorado, self.estagio_metricas]
+
+        # Itens emitidos e ainda não processados + fontes ainda produzindo: quando ambos
+        # chegam a zero não há mais trabalho em nenhum estágio
+        self.condicao = threading.Condition()
+        self.em_andamento = 0
+        self.fontes_ativas = 0
+
+        self.modelos = {}
+        self.maior_id_inicial = 0
+        self.inicio_desafio = {}
+        self.fim_desafio = {}
+
+    # ---- Fluxo ----
+
+    def emitir(self, estagio, item):
+        with self.condicao:
+            self.em_andamento += 1
+        estagio.fila.put(item)
+
+    def concluir_itens(self, quantidade):
+        with self.condicao:
+            self.em_andamento -= quantidade
+            self.condicao.notify_all()
+
+    def trabalhador(self, estagio):
+        while True:
+            itens = estagio.retirar()
+            encerrar = itens[-1] is FIM
+            if encerrar:
+                itens.pop()
+            if itens:
+                with estagio.lock:
+                    estagio.maior_fila = max(estagio.maior_fila, estagio.fila.qsize() + len(itens))
+                inicio = time.monotonic()
+                try:
+                    estagio.processar(itens)
+                except Exception as e:
+                    print(f"[{estagio.nome}] Falha ao processar {len(itens)} itens: {e}")
+                finally:
+                    with estagio.lock:
+                        estagio.processados += len(itens)
+                        estagio.tempo_ocupado += time.monotonic() - inicio
+                    self.concluir_itens(len(itens))
+            if encerrar:
+                # Devolve ao pool as conexões que esta thread retirou
+                self.repository.close_db_connection()
+                self.sonar.repository.close_db_connection()
+                return
+
+    def fonte(self, produzir):
+        try:
+            produzir()
+        except Exception as e:
+            print(f"Erro ao listar trabalho pendente ({produzir.__name__}): {e}")
+        finally:
+            self.repository.close_db_connection()
+            with self.condicao:
+                self.fontes_ativas -= 1
+                self.condicao.notify_all()
+
+    def marcar_inicio(self, id_desafio):
+        agora = time.monotonic()
+        with self.condicao:
+            self.inicio_desafio.setdefault(id_desafio, agora)
+
+    def marcar_fim(self, id_desafio):
+        with self.condicao:
+            self.fim_desafio[id_desafio] = time.monotonic()
+
+    # ---- Fontes ----
+
+    def listar_baseline(self):
+        desafios = self.repository.select_into_table(table_name="desafios", campos=["id_desafio", "enunciado AS descricao"], size=10000)
+        for tarefa in self.gerador_baseline.listar_tarefas(desafios, list(self.modelos.values()), TIPO_BASELINE):
+            self.emitir(self.estagio_baseline, tarefa)
+
+    def listar_refatoracao_pendente(self):
+        linhas = self.repository.select_into_table_stream(
+            table_name="resultados", campos=["id_resultado", "id_desafio", "id_modelo", "codigo_fonte", "linguagem"],
+            filter=f"tipo = '{TIPO_BASELINE.value}' and codigo_fonte is not null and id_resultado <= {self.maior_id_inicial}", size=1000000)
+        for linha in linhas:
+            self.emitir_refatoracoes(linha)
+
+    def listar_metricas_pendentes(self):
+        linhas = self.repository.select_into_table_stream(
+            table_name="resultados", campos=["id_resultado", "id_desafio", "codigo_fonte", "linguagem"],
+            filter=f"status_metricas = 'pendente' and codigo_fonte is not null and id_resultado <= {self.maior_id_inicial}", size=1000000)
+        for linha in linhas:
+            self.emitir(self.estagio_metricas, linha)
+
+    def emitir_refatoracoes(self, linha):
+        for tipo_codigo in TIPOS_REFATORACAO:
+            if self.journal_refatorado.contem(linha['id_desafio'], linha['id_modelo'], tipo_codigo.value, linha['linguagem']):
+                continue
+            if not self.gerador_codigo_llm.ModeloJaProcessado(linha['id_desafio'], linha['id_modelo'], tipo_codigo.value, linha['linguagem']):
+                self.emitir(self.estagio_refatoracao, (linha, tipo_codigo))
+
+    # ---- Estágios ----
+
+    def solicitar_codigo(self, nome_modelo, prompt, linguagem):
+        """
+        Rejeição na validação é refeita na hora (esperar o fim da execução atrasaria o desafio
+        inteiro), por até LLM_REPESCAGENS rodadas, cada uma com amostragem diferente.
+        """
+        with self.gerador_baseline.agendador.semaforo_do_modelo(nome_modelo):
+            rodada = 0
+            while True:
+                try:
+                    return self.gerador_codigo_llm.solicitar_codigo_llm(nome_modelo, prompt, linguagem, repescagem=rodada)
+                except CodigoRejeitado:
+                    if rodada >= self.gerador_baseline.max_repescagens:
+                        raise
+                    rodada += 1
+
+    def gerar_baseline(self, tarefas):
+        for tarefa in tarefas:
+            self.marcar_inicio(tarefa.id_desafio)
+            try:
+                codigo = self.solicitar_codigo(tarefa.nome_modelo, tarefa.prompt, tarefa.linguagem)
+            except Exception as e:
+                print(f"[baseline] Desafio {tarefa.id_desafio} ({tarefa.nome_modelo}, {tarefa.linguagem}) descartado: {e}")
+                continue
+            self.emitir(self.estagio_gravacao_baseline, Resultado(
+                id_desafio=tarefa.id_desafio,
+                id_modelo=tarefa.id_modelo,
+                tipo=TIPO_BASELINE.value,
+                codigo_fonte=codigo,
+                linguagem=tarefa.linguagem))
+
+    def refatorar(self, itens):
+        for linha, tipo_codigo in itens:
+            self.marcar_inicio(linha['id_desafio'])
+            nome_modelo = self.modelos[linha['id_modelo']]['nome_modelo']
+            prompt = self.gerador_codigo_llm.GetPrompt(linha['codigo_fonte'], tipo_codigo, linha['linguagem'])
+            try:
+                codigo = self.solicitar_codigo(nome_modelo, prompt, linha['linguagem'])
+            except Exception as e:
+                print(f"[refatoracao] Desafio {linha['id_desafio']} ({nome_modelo}, {linha['linguagem']}, {tipo_codigo.value}) descartado: {e}")
+                continue
+            self.emitir(self.estagio_gravacao_refatorado, Resultado(
+                id_desafio=linha['id_desafio'],
+                id_modelo=linha['id_modelo'],
+                tipo=tipo_codigo.value,
+                codigo_fonte=codigo,
+                linguagem=linha['linguagem'],
+                id_resultado_origem=linha['id_resultado']))
+
+    def gravar(self, journal, resultados):
+        """
+        Journal + upsert em lote (um único escritor por journal) e devolve [(resultado, id_resultado)].
+        Resultados que não chegaram ao banco ficam pendentes no journal e são tentados de novo na
+        próxima gravação do estágio; se a execução terminar antes, a próxima os grava em preparar().
+        """
+        for resultado in resultados:
+            journal.registrar(resultado)
+            self.gerador_codigo_llm.marcar_processado(resultado)
+        resultados = self.aguardando_gravacao[journal] + list(resultados)
+        journal.persistir(self.repository)
+        chaves = [resultado.chave() for resultado in resultados]
+        ids = self.repository.ids_resultados(chaves)
+        gravados, aguardando = [], []
+        for chave, resultado in zip(chaves, resultados):
+            if chave in ids:
+                gravados.append((resultado, ids[chave]))
+            else:
+                aguardando.append(resultado)
+        if aguardando:
+            print(f"  [!] {len(aguardando)} resultados ainda não gravados no banco: mantidos no journal {journal.caminho_arquivo}.")
+        self.aguardando_gravacao[journal] = aguardando
+        return gravados
+
+    def gravar_baseline(self, resultados):
+        for resultado, id_resultado in self.gravar(self.journal_baseline, resultados):
+            linha = {'id_resultado': id_resultado, 'id_desafio': resultado.id_desafio, 'id_modelo': resultado.id_modelo,
+                     'codigo_fonte': resultado.codigo_fonte, 'linguagem': resultado.linguagem}
+            self.emitir_refatoracoes(linha)
+            self.emitir(self.estagio_metricas, linha)
+
+    def gravar_refatorado(self, resultados):
+        for resultado, id_resultado in self.gravar(self.journal_refatorado, resultados):
+            self.emitir(self.estagio_metricas, {'id_resultado': id_resultado, 'id_desafio': resultado.id_desafio,
+                                                'codigo_fonte': resultado.codigo_fonte, 'linguagem': resultado.linguagem})
+
+    def medir(self, linhas):
+        for linha in linhas:
+            self.marcar_inicio(linha['id_desafio'])
+        if self.backend_metricas == 'sonar':
+            a_analisar = list(self.sonar.filtrar_cache(linhas, self.sonar.versao_sonar_lote()))
+            if a_analisar:
+                self.sonar.analisar_lote(a_analisar, self.workers_sonar)
+        else:
+            lote = [(linha['id_resultado'], linha['codigo_fonte'], linha['linguagem']) for linha in linhas]
+            self.sonar.salvar_metricas_calculadas(lote, self.processos_metricas.submit(metricas_locais.calcular_metricas_lote, lote))
+        for linha in linhas:
+            self.marcar_fim(linha['id_desafio'])
+
+    # ---- Execução ----
+
+    def preparar(self):
+        """Grava o que ficou pendente nos journals desta execução e fixa o ponto de corte das fontes"""
+        self.modelos = {m['id_modelo']: m for m in self.repository.select_into_table(table_name="modelos", campos=["id_modelo", "nome_modelo"])}
+        for journal in (self.journal_baseline, self.journal_refatorado):
+            journal.abrir()
+            # Gravados antes do ponto de corte: as fontes abaixo os encaminham aos estágios seguintes.
+            # Se a gravação falhar, seguem pela próxima gravação do estágio (depois do ponto de corte)
+            if not journal.persistir(self.repository):
+                self.aguardando_gravacao[journal] = list(journal.pendentes)
+        self.gerador_codigo_llm.carregar_indice_processados(self.journal_baseline)
+        self.gerador_codigo_llm.indice_processados.mesclar(self.journal_refatorado.chaves)
+        maior = self.repository.select_into_table(table_name="resultados", campos=["COALESCE(MAX(id_resultado), 0) AS maior"], size=1)
+        self.maior_id_inicial = maior[0]['maior'] if maior else 0
+
+    def executar(self):
+        inicio = time.monotonic()
+        print(f"Pipeline {self.id_execucao}: iniciando...")
+        try:
+            self.preparar()
+            if self.backend_metricas == 'sonar':
+                self.workers_sonar = self.sonar.criar_workers(self.estagio_metricas.concorrencia)
+            else:
+                self.processos_metricas = ProcessPoolExecutor(max_workers=self.estagio_metricas.concorrencia)
+
+            for estagio in self.estagios:
+                for _ in range(estagio.concorrencia):
+                    thread = threading.Thread(target=self.trabalhador, args=(estagio,), name=f"{estagio.nome}", daemon=True)
+                    thread.start()
+                    estagio.threads.append(thread)
+
+            # Fontes mais próximas do fim primeiro na lista: cada uma tem a sua thread e conexão
+            fontes = [self.listar_metricas_pendentes, self.listar_refatoracao_pendente, self.listar_baseline]
+            with self.condicao:
+                self.fontes_ativas = len(fontes)
+            for produzir in fontes:
+                threading.Thread(target=self.fonte, args=(produzir,), name=produzir.__name__, daemon=True).start()
+
+            with self.condicao:
+                while self.fontes_ativas or self.em_andamento:
+                    self.condicao.wait()
+
+            for estagio in self.estagios:
+                for _ in estagio.threads:
+                    estagio.fila.put(FIM)
+                for thread in estagio.threads:
+                    thread.join()
+        except Exception as e:
+            print(f"Erro no pipeline {self.id_execucao}: {e}")
+        finally:
+            if self.processos_metricas:
+                self.processos_metricas.shutdown()
+            self.journal_baseline.fechar()
+            self.journal_refatorado.fechar()
+            self.exportar_estatisticas(time.monotonic() - inicio)
+            self.gerador_codigo_llm.llm_request.relatorio_backends()
+            self.gerador_codigo_llm.estatisticas_retentativa.exportar(f"pipeline_{self.id_execucao}_retentativas.json")
+            self.repository.close_db_connection()
+
+    def exportar_estatisticas(self, makespan):
+        latencias = sorted(
+            self.fim_desafio[id_desafio] - self.inicio_desafio[id_desafio]
+            for id_desafio in self.fim_desafio if id_desafio in self.inicio_desafio
+        )
+
+        def percentil(p):
+            return round(latencias[min(len(latencias) - 1, int(p * len(latencias)))], 2) if latencias else None
+
+        estatisticas = {
+            'id_execucao': self.id_execucao,
+            'makespan_s': round(makespan, 2),
+            'desafios_concluidos': len(latencias),
+            'latencia_por_desafio_s': {
+                'media': round(sum(latencias) / len(latencias), 2) if latencias else None,
+                'p50': percentil(0.5),
+                'p95': percentil(0.95),
+                'maxima': percentil(1),
+            },
+            'estagios': {estagio.nome: estagio.estatisticas() for estagio in self.estagios},
+        }
+        with open(self.nome_arquivo_estatisticas, 'w', encoding='utf-8') as f:
+            json.dump(estatisticas, f, ensure_ascii=False, indent=2)
+        print(f"Pipeline {self.id_execucao}: makespan {estatisticas['makespan_s']}s, "
+              f"latência por desafio p50 {estatisticas['latencia_por_desafio_s']['p50']}s / p95 {estatisticas['latencia_por_desafio_s']['p95']}s "
+              f"({len(latencias)} desafios). Detalhes em {self.nome_arquivo_estatisticas}.")
+
+
+if __name__ == "__main__":
+    # --execucao <id> retoma uma execução anterior (mesmos journals e arquivos de estatística)
+    id_execucao = sys.argv[sys.argv.index("--execucao") + 1] if "--execucao" in sys.argv else None
+    PipelineGeracao(id_execucao).executar()
@@ -0,0 +1,75 @@
+import json
+import os
+import threading
+
+from tenacity import Retrying, retry_if_exception, stop_after_attempt, wait_random_exponential
+
+from gerar_codigo_llm.roteador_llm import falha_do_backend
+
+
+class CodigoRejeitado(ValueError):
+    """A LLM respondeu, mas o conteúdo não passou na validação (não adianta repetir na hora)"""
+
+
+def erro_transitorio(erro):
+    """Falhas de transporte, timeouts e 5xx/429 do servidor: vale tentar de novo após uma espera"""
+    if isinstance(erro, CodigoRejeitado):
+        return False
+    if isinstance(erro, (ConnectionError, TimeoutError)):
+        return True
+    if getattr(erro, 'status_code', None) == 429:
+        return True
+    return falha_do_backend(erro)
+
+
+class EstatisticasRetentativa:
+    """Contadores por modelo de solicitações, retentativas, falhas transitórias esgotadas e rejeições"""
+
+    CAMPOS = ('solicitacoes', 'retentativas', 'falhas_transitorias', 'rejeicoes', 'recuperadas')
+
+    def __init__(self):
+        self.por_modelo = {}
+        self.lock = threading.Lock()
+
+    def registrar(self, nome_modelo, campo, quantidade=1):
+        with self.lock:
+            contadores = self.por_modelo.setdefault(nome_modelo, dict.fromkeys(self.CAMPOS, 0))
+            contadores[campo] += quantidade
+
+    def resumo(self):
+        with self.lock:
+            resumo = {}
+            for nome_modelo, contadores in self.por_modelo.items():
+                solicitacoes = contadores['solicitacoes'] or 1
+                resumo[nome_modelo] = {
+                    **contadores,
+                    'taxa_retentativa': round(contadores['retentativas'] / solicitacoes, 4),
+                    'taxa_rejeicao': round(contadores['rejeicoes'] / solicitacoes, 4),
+                }
+            return resumo
+
+    def exportar(self, caminho_arquivo):
+        resumo = self.resumo()
+        with open(caminho_arquivo, 'w', encoding='utf-8') as f:
+            json.dump(resumo, f, ensure_ascii=False, indent=2)
+        for nome_modelo, dados in resumo.items():
+            print(f"[{nome_modelo}] retentativas: {dados['retentativas']} ({dados['taxa_retentativa']:.1%}), rejeições: {dados['rejeicoes']} ({dados['taxa_rejeicao']:.1%}), recuperadas na repescagem: {dados['recuperadas']}")
+        print(f"Estatísticas de retentativa salvas em {caminho_arquivo}.")
+
+
+def politica_retentativa(nome_modelo, estatisticas):
+    """
+    Backoff exponencial com jitter (LLM_RETENTATIVAS tentativas, espera de até LLM_BACKOFF_MAX s)
+    aplicado só a erros transitórios; código rejeitado sobe direto para o chamador.
+    """
+    def antes_de_esperar(estado):
+        estatisticas.registrar(nome_modelo, 'retentativas')
+        print(f"[{nome_modelo}] Erro transitório ({estado.outcome.exception()}). Tentativa {estado.attempt_number}, aguardando {estado.next_action.sleep:.1f}s...")
+
+    return Retrying(
+        stop=stop_after_attempt(int(os.getenv('LLM_RETENTATIVAS', 4))),
+        wait=wait_random_exponential(multiplier=float(os.getenv('LLM_BACKOFF_BASE', 2)), max=float(os.getenv('LLM_BACKOFF_MAX', 60))),
+        retry=retry_if_exception(erro_transitorio),
+        before_sleep=antes_de_esperar,
+        reraise=True,
+    )
@@ -0,0 +1,280 @@
+import json
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+
+# ollama (httpx + pydantic) e requests são importados só quando um backend é criado
+
+
+def falha_do_backend(erro):
+    """Erros de transporte ou 5xx indicam problema no servidor (contam para o circuito); 4xx não"""
+    import httpx
+    import requests
+    from ollama import ResponseError
+
+    if isinstance(erro, (httpx.TransportError, requests.ConnectionError, requests.Timeout, ConnectionError, TimeoutError)):
+        return True
+    if isinstance(erro, ResponseError):
+        return erro.status_code >= 500
+    if isinstance(erro, requests.HTTPError) and erro.response is not None:
+        return erro.response.status_code >= 500
+    return False
+
+
+class BackendLLM(ABC):
+    """
+    Um servidor de inferência com pool de conexões persistentes e disjuntor (circuit breaker).
+    Após `falhas_para_abrir` falhas seguidas o backend sai do rodízio por `espera_circuito`
+    segundos; passado esse tempo uma verificação de saúde decide se ele volta.
+    """
+
+    def __init__(self, url, conexoes=8, timeout=600, falhas_para_abrir=3, espera_circuito=30):
+        self.url = url.rstrip('/')
+        self.conexoes = conexoes
+        self.timeout = timeout
+        self.falhas_para_abrir = falhas_para_abrir
+        self.espera_circuito = espera_circuito
+        self.em_andamento = 0
+        self.falhas_seguidas = 0
+        self.aberto_ate = 0.0
+        self.modelos = {}
+        self.total_requisicoes = 0
+        self.total_falhas = 0
+        self.lock_saude = threading.Lock()
+
+    def disponivel(self):
+        return self.aberto_ate <= time.time()
+
+    def atende(self, llm_model):
+        # Sem lista de modelos (verificação ainda não feita ou falhou) o backend é considerado apto
+        return not self.modelos or llm_model in self.modelos
+
+    def registrar_sucesso(self):
+        self.falhas_seguidas = 0
+        self.aberto_ate = 0.0
+
+    def registrar_falha(self):
+        self.total_falhas += 1
+        self.falhas_seguidas += 1
+        if self.falhas_seguidas >= self.falhas_para_abrir:
+            self.abrir_circuito()
+
+    def abrir_circuito(self):
+        if self.disponivel():
+            print(f"Aviso: backend {self.url} fora do rodízio por {self.espera_circuito}s.")
+        self.aberto_ate = time.time() + self.espera_circuito
+
+    def verificar_saude(self):
+        """Consulta os modelos instalados; fecha o circuito se o servidor responder"""
+        with self.lock_saude:
+            try:
+                self.modelos = self.listar_modelos()
+                self.registrar_sucesso()
+                return True
+            except Exception as e:
+                print(f"Aviso: verificação de saúde de {self.url} falhou: {e}")
+                self.falhas_seguidas = self.falhas_para_abrir
+                self.abrir_circuito()
+                return False
+
+    @abstractmethod
+    def listar_modelos(self):
+        """{nome do modelo: digest}"""
+
+    @abstractmethod
+    def chat(self, llm_model, messages, options, keep_alive):
+        """Resposta no formato do Ollama: {'message': {'content', 'thinking'}, 'load_duration'}"""
+
+    @abstractmethod
+    def chat_stream(self, llm_model, messages, options, keep_alive):
+        """Iterador de pedaços no formato do Ollama; fechar o iterador encerra a conexão"""
+
+    def carregar_modelo(self, llm_model, keep_alive):
+        pass
+
+    def fechar(self):
+        pass
+
+
+class BackendOllama(BackendLLM):
+    def __init__(self, url, **kwargs):
+        super().__init__(url, **kwargs)
+        import httpx
+        from ollama import Client
+
+        # Transporte (pool de conexões) próprio, repassado ao httpx.Client do ollama: fechar() o encerra
+        limites = httpx.Limits(max_connections=self.conexoes, max_keepalive_connections=self.conexoes)
+        self.transporte = httpx.HTTPTransport(limits=limites)
+        self.client = Client(host=self.url, timeout=self.timeout, transport=self.transporte)
+
+    def listar_modelos(self):
+        return {m.get('model'): m.get('digest') for m in self.client.list().get('models', [])}
+
+    def chat(self, llm_model, messages, options, keep_alive):
+        return self.client.chat(model=llm_model, messages=messages, options=options, keep_alive=keep_alive)
+
+    def chat_stream(self, llm_model, messages, options, keep_alive):
+        return self.client.chat(model=llm_model, messages=messages, options=options, keep_alive=keep_alive, stream=True)
+
+    def carregar_modelo(self, llm_model, keep_alive):
+        self.client.generate(model=llm_model, prompt='', keep_alive=keep_alive)
+
+    def fechar(self):
+        self.transporte.close()
+
+
+class BackendOpenAI(BackendLLM):
+    """
+    Servidor compatível com a API da OpenAI (/v1/chat/completions), como llama.cpp ou vLLM.
+    Não há keep_alive nem digest de pesos: o modelo servido é fixo no servidor.
+    """
+
+    def __init__(self, url, api_key=None, **kwargs):
+        super().__init__(url, **kwargs)
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        self.sessao = requests.Session()
+        adaptador = HTTPAdapter(pool_connections=1, pool_maxsize=self.conexoes)
+        self.sessao.mount('http://', adaptador)
+        self.sessao.mount('https://', adaptador)
+        if api_key:
+            self.sessao.headers['Authorization'] = f"Bearer {api_key}"
+
+    def listar_modelos(self):
+        response = self.sessao.get(f"{self.url}/v1/models", timeout=10)
+        response.raise_for_status()
+        return {m['id']: None for m in response.json().get('data', [])}
+
+    def corpo(self, llm_model, messages, options, stream):
+        corpo = {'model': llm_model, 'messages': messages, 'stream': stream}
+        for opcao in ('temperature', 'seed'):
+            if options and opcao in options:
+                corpo[opcao] = options[opcao]
+        return corpo
+
+    def chat(self, llm_model, messages, options, keep_alive):
+        response = self.sessao.post(f"{self.url}/v1/chat/completions", json=self.corpo(llm_model, messages, options, False), timeout=self.timeout)
+        response.raise_for_status()
+        message = response.json()['choices'][0]['message']
+        return {'message': {'content': message.get('content') or '', 'thinking': message.get('reasoning_content') or ''}}
+
+    def chat_stream(self, llm_model, messages, options, keep_alive):
+        response = self.sessao.post(f"{self.url}/v1/chat/completions", json=self.corpo(llm_model, messages, options, True), timeout=self.timeout, stream=True)
+        try:
+            response.raise_for_status()
+            for linha in response.iter_lines(decode_unicode=True):
+                if not linha or not linha.startswith('data:'):
+                    continue
+                dados = linha[len('data:'):].strip()
+                if dados == '[DONE]':
+                    yield {'done': True, 'message': {}}
+                    break
+                delta = json.loads(dados)['choices'][0].get('delta', {})
+                yield {'message': {'content': delta.get('content') or '', 'thinking': delta.get('reasoning_content') or ''}}
+        finally:
+            response.close()
+
+    def fechar(self):
+        self.sessao.close()
+
+
+class RoteadorLLM:
+    """
+    Distribui as requisições entre vários servidores de inferência escolhendo o backend
+    disponível com menos requisições em andamento (least outstanding requests).
+
+    Backends configurados por variáveis de ambiente (listas separadas por vírgula):
+      OLLAMA_HOSTS       servidores Ollama (padrão: OLLAMA_HOST ou http://localhost:11434)
+      LLM_OPENAI_HOSTS   servidores compatíveis com a API da OpenAI
+    """
+
+    def __init__(self, backends=None):
+        self.backends = backends if backends is not None else self.backends_do_ambiente()
+        if not self.backends:
+            raise ValueError("Nenhum backend de LLM configurado (OLLAMA_HOSTS / LLM_OPENAI_HOSTS).")
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def backends_do_ambiente():
+        configuracao = {
+            'conexoes': int(os.getenv('LLM_CONEXOES_POR_BACKEND', 8)),
+            'timeout': int(os.getenv('LLM_TIMEOUT', 600)),
+            'falhas_para_abrir': int(os.getenv('LLM_FALHAS_CIRCUITO', 3)),
+            'espera_circuito': int(os.getenv('LLM_ESPERA_CIRCUITO', 30)),
+        }
+        hosts_ollama = os.getenv('OLLAMA_HOSTS') or os.getenv('OLLAMA_HOST') or 'http://localhost:11434'
+        backends = [BackendOllama(host.strip(), **configuracao) for host in hosts_ollama.split(',') if host.strip()]
+        hosts_openai = os.getenv('LLM_OPENAI_HOSTS', '')
+        api_key = os.getenv('LLM_OPENAI_API_KEY')
+        backends += [BackendOpenAI(host.strip(), api_key=api_key, **configuracao) for host in hosts_openai.split(',') if host.strip()]
+        return backends
+
+    def verificar_saude(self):
+        for backend in self.backends:
+            backend.verificar_saude()
+        return [backend.url for backend in self.backends if backend.disponivel()]
+
+    def escolher(self, llm_model):
+        # Backends com o tempo de espera vencido passam por uma verificação antes de voltar (meio-aberto)
+        for backend in self.backends:
+            if backend.aberto_ate and backend.disponivel():
+                backend.verificar_saude()
+
+        with self.lock:
+            candidatos = [b for b in self.backends if b.disponivel() and b.atende(llm_model)]
+            if not candidatos:
+                raise ConnectionError(f"Nenhum backend de LLM disponível para o modelo {llm_model}.")
+            backend = min(candidatos, key=lambda b: b.em_andamento)
+            backend.em_andamento += 1
+            backend.total_requisicoes += 1
+            return backend
+
+    def liberar(self, backend, erro=None):
+        with self.lock:
+            backend.em_andamento -= 1
+            if erro is None:
+                backend.registrar_sucesso()
+            elif falha_do_backend(erro):
+                backend.registrar_falha()
+
+    @contextmanager
+    def reservar(self, llm_model):
+        """Reserva o backend menos ocupado durante a requisição e devolve ao final"""
+        backend = self.escolher(llm_model)
+        try:
+            yield backend
+        except Exception as e:
+            self.liberar(backend, e)
+            raise
+        else:
+            self.liberar(backend)
+
+    def backends_ativos(self):
+        return [backend for backend in self.backends if backend.disponivel()]
+
+    def digests(self):
+        digests = {}
+        for backend in self.backends:
+            if not backend.modelos:
+                backend.verificar_saude()
+            for modelo, digest in backend.modelos.items():
+                digests.setdefault(modelo, digest)
+        return digests
+
+    def estatisticas(self):
+        return {
+            backend.url: {
+                'requisicoes': backend.total_requisicoes,
+                'falhas': backend.total_falhas,
+                'em_andamento': backend.em_andamento,
+                'disponivel': backend.disponivel(),
+            }
+            for backend in self.backends
+        }
+
+    def fechar(self):
+        for backend in self.backends:
+            backend.fechar()
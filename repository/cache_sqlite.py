@@ -0,0 +1,86 @@
+import json
+import sqlite3
+import threading
+import time
+
+
+class CacheSqlite:
+    """
+    Cache chave -> valor JSON persistido em um arquivo SQLite local, limitado a
+    `max_entradas` e, opcionalmente, a `max_bytes` com descarte LRU (as entradas
+    acessadas há mais tempo saem primeiro).
+    """
+
+    def __init__(self, caminho_arquivo, max_entradas=100000, max_bytes=None):
+        self.caminho_arquivo = caminho_arquivo
+        self.max_entradas = max_entradas
+        self.max_bytes = max_bytes
+        self.acertos = 0
+        self.falhas = 0
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(caminho_arquivo, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            "chave TEXT PRIMARY KEY, "
+            "valor TEXT NOT NULL, "
+            "tamanho INTEGER NOT NULL, "
+            "ultimo_acesso REAL NOT NULL)"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_cache_ultimo_acesso ON cache (ultimo_acesso)")
+        self.conn.commit()
+        self.total_entradas, self.total_bytes = self.conn.execute("SELECT COUNT(*), COALESCE(SUM(tamanho), 0) FROM cache").fetchone()
+
+    def obter(self, chave):
+        with self.lock:
+            linha = self.conn.execute("SELECT valor FROM cache WHERE chave = ?", (chave,)).fetchone()
+            if linha is None:
+                self.falhas += 1
+                return None
+            self.acertos += 1
+            self.conn.execute("UPDATE cache SET ultimo_acesso = ? WHERE chave = ?", (time.time(), chave))
+            self.conn.commit()
+        return json.loads(linha[0])
+
+    def guardar(self, chave, valor):
+        texto = json.dumps(valor, ensure_ascii=False)
+        with self.lock:
+            existente = self.conn.execute("SELECT tamanho FROM cache WHERE chave = ?", (chave,)).fetchone()
+            self.conn.execute(
+                "INSERT OR REPLACE INTO cache (chave, valor, tamanho, ultimo_acesso) VALUES (?, ?, ?, ?)",
+                (chave, texto, len(texto), time.time())
+            )
+            if existente is None:
+                self.total_entradas += 1
+            else:
+                self.total_bytes -= existente[0]
+            self.total_bytes += len(texto)
+            if self.total_entradas > self.max_entradas:
+                self.descartar(self.total_entradas - self.max_entradas)
+            while self.max_bytes is not None and self.total_bytes > self.max_bytes and self.total_entradas > 0:
+                self.descartar(1)
+            self.conn.commit()
+
+    def descartar(self, quantidade):
+        # Libera um pouco além do necessário para não descartar a cada inserção
+        quantidade = max(quantidade, self.max_entradas // 100)
+        self.conn.execute(
+            "DELETE FROM cache WHERE chave IN (SELECT chave FROM cache ORDER BY ultimo_acesso LIMIT ?)",
+            (quantidade,)
+        )
+        self.total_entradas, self.total_bytes = self.conn.execute("SELECT COUNT(*), COALESCE(SUM(tamanho), 0) FROM cache").fetchone()
+
+    def estatisticas(self):
+        total = self.acertos + self.falhas
+        return {
+            'acertos': self.acertos,
+            'falhas': self.falhas,
+            'taxa_acerto': round(self.acertos / total, 3) if total else 0.0,
+            'entradas': self.total_entradas,
+            'bytes': self.total_bytes
+        }
+
+    def fechar(self):
+        with self.lock:
+            self.conn.close()
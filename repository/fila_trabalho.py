@@ -0,0 +1,157 @@
+import os
+import socket
+import uuid
+
+from repository.repository import Repository
+
+TAREFA_REFATORACAO = 'refatoracao'
+TAREFA_METRICAS = 'metricas'
+
+# Reenfileirar reabre as tarefas que esgotaram as tentativas e ainda são necessárias. O MySQL
+# aplica as atribuições da esquerda para a direita: tentativas é avaliada com o status antigo.
+REABRIR_FALHAS = ("ON DUPLICATE KEY UPDATE "
+                  "tentativas = IF(fila_trabalho.status = 'falha', 0, fila_trabalho.tentativas), "
+                  "status = IF(fila_trabalho.status = 'falha', 'pendente', fila_trabalho.status)")
+
+
+class FilaTrabalho:
+    """
+    Fila durável na tabela fila_trabalho (migração 004). Cada worker reivindica um lote com
+    SELECT ... FOR UPDATE SKIP LOCKED e marca as linhas com o seu lease; tarefas com lease
+    vencido (worker que morreu ou travou) voltam a ser reivindicáveis. Vários processos, em
+    máquinas diferentes, podem consumir a mesma fila sem repetir trabalho.
+    """
+
+    def __init__(self, tipo_tarefa, repository=None, dono=None, duracao_lease=None, max_tentativas=None):
+        self.tipo_tarefa = tipo_tarefa
+        self.repository = repository or Repository()
+        self.dono = dono or os.getenv('FILA_DONO') or f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+        self.duracao_lease = int(duracao_lease or os.getenv('FILA_LEASE_SEGUNDOS', 900))
+        self.max_tentativas = int(max_tentativas or os.getenv('FILA_MAX_TENTATIVAS', 3))
+
+    def enfileirar_refatoracao(self, tipo, tipo_origem):
+        """Cria (idempotente) uma tarefa para cada resultado `tipo_origem` ainda sem o resultado `tipo`"""
+        sql = ("INSERT INTO fila_trabalho (tipo_tarefa, id_resultado, id_desafio, id_modelo, linguagem, tipo) "
+               "SELECT %s, ORIGEM.id_resultado, ORIGEM.id_desafio, ORIGEM.id_modelo, ORIGEM.linguagem, %s "
+               "FROM resultados AS ORIGEM "
+               "WHERE ORIGEM.tipo = %s AND ORIGEM.codigo_fonte is not null "
+               "AND NOT EXISTS ("
+                   "SELECT 1 FROM resultados AS DESTINO "
+                   "WHERE DESTINO.id_desafio = ORIGEM.id_desafio "
+                   "AND DESTINO.id_modelo = ORIGEM.id_modelo "
+                   "AND DESTINO.tipo = %s "
+                   "AND DESTINO.linguagem = ORIGEM.linguagem) "
+               f"{REABRIR_FALHAS}")
+        return self.executar_enfileiramento(sql, (TAREFA_REFATORACAO, tipo, tipo_origem, tipo))
+
+    def enfileirar_metricas(self):
+        """Cria (idempotente) uma tarefa para cada resultado com status_metricas = 'pendente'"""
+        sql = ("INSERT INTO fila_trabalho (tipo_tarefa, id_resultado, id_desafio, id_modelo, linguagem, tipo) "
+               "SELECT %s, id_resultado, id_desafio, id_modelo, linguagem, tipo FROM resultados "
+               "WHERE status_metricas = 'pendente' AND codigo_fonte is not null "
+               f"{REABRIR_FALHAS}")
+        return self.executar_enfileiramento(sql, (TAREFA_METRICAS,))
+
+    def executar_enfileiramento(self, sql, valores):
+        # INSERT ... SELECT roda inteiro no servidor; na chave uk_fila_tarefa, o que já está na fila
+        # fica como está, exceto tarefas em 'falha', que voltam a 'pendente' com as tentativas zeradas
+        with self.repository.transacao() as conn:
+            cursor = conn.cursor()
+            try:
+                cursor.execute(sql, valores)
+                novas = cursor.rowcount
+            finally:
+                cursor.close()
+        # rowcount do MySQL: 1 por tarefa criada, 2 por tarefa reaberta
+        print(f"Fila '{self.tipo_tarefa}': {novas} linhas afetadas (tarefas novas ou reabertas)")
+        return novas
+
+    def reivindicar(self, quantidade):
+        """
+        Reivindica até `quantidade` tarefas (pendentes ou com lease vencido e tentativas abaixo de
+        max_tentativas; as que esgotaram as tentativas passam a 'falha') e devolve cada uma
+        com os dados do resultado de entrada: id_tarefa, tentativas, id_resultado, id_desafio,
+        id_modelo, linguagem, tipo e codigo_fonte. Lista vazia quando não há mais trabalho.
+        """
+        with self.repository.transacao() as conn:
+            cursor = conn.cursor(dictionary=True)
+            try:
+                # Lease vencido na última tentativa (worker que cai ou trava sempre): desiste da tarefa.
+                # As linhas também são travadas com SKIP LOCKED, para não esperar outro worker.
+                cursor.execute(
+                    "SELECT id_tarefa FROM fila_trabalho "
+                    "WHERE tipo_tarefa = %s AND status = 'em_andamento' AND lease_expires < UTC_TIMESTAMP() AND tentativas >= %s "
+                    "FOR UPDATE SKIP LOCKED",
+                    (self.tipo_tarefa, self.max_tentativas))
+                esgotadas = [linha['id_tarefa'] for linha in cursor.fetchall()]
+                if esgotadas:
+                    cursor.execute(
+                        "UPDATE fila_trabalho SET status = 'falha', lease_owner = NULL, lease_expires = NULL "
+                        f"WHERE id_tarefa IN ({', '.join(['%s'] * len(esgotadas))})",
+                        tuple(esgotadas))
+                # SKIP LOCKED: linhas travadas por outro worker são puladas em vez de esperadas
+                cursor.execute(
+                    "SELECT id_tarefa FROM fila_trabalho "
+                    "WHERE tipo_tarefa = %s AND (status = 'pendente' OR (status = 'em_andamento' AND lease_expires < UTC_TIMESTAMP() AND tentativas < %s)) "
+                    f"ORDER BY id_tarefa LIMIT {int(quantidade)} "
+                    "FOR UPDATE SKIP LOCKED",
+                    (self.tipo_tarefa, self.max_tentativas))
+                ids = [linha['id_tarefa'] for linha in cursor.fetchall()]
+                if not ids:
+                    return []
+                marcadores = ", ".join(["%s"] * len(ids))
+                cursor.execute(
+                    "UPDATE fila_trabalho SET status = 'em_andamento', lease_owner = %s, "
+                    "lease_expires = UTC_TIMESTAMP() + INTERVAL %s SECOND, tentativas = tentativas + 1 "
+                    f"WHERE id_tarefa IN ({marcadores})",
+                    (self.dono, self.duracao_lease, *ids))
+                cursor.execute(
+                    "SELECT FILA.id_tarefa, FILA.tentativas, FILA.id_resultado, FILA.id_desafio, FILA.id_modelo, "
+                    "FILA.linguagem, FILA.tipo, RESULTADO.codigo_fonte "
+                    "FROM fila_trabalho AS FILA JOIN resultados AS RESULTADO ON RESULTADO.id_resultado = FILA.id_resultado "
+                    f"WHERE FILA.id_tarefa IN ({marcadores}) ORDER BY FILA.id_tarefa",
+                    tuple(ids))
+                return cursor.fetchall()
+            finally:
+                cursor.close()
+
+    def atualizar(self, ids, atribuicoes, valores=()):
+        """Atualiza só as tarefas cujo lease ainda é deste worker (um lease vencido pode ter sido reassumido)"""
+        if not ids:
+            return 0
+        marcadores = ", ".join(["%s"] * len(ids))
+        with self.repository.transacao() as conn:
+            cursor = conn.cursor()
+            try:
+                cursor.execute(
+                    f"UPDATE fila_trabalho SET {atribuicoes} "
+                    f"WHERE lease_owner = %s AND status = 'em_andamento' AND id_tarefa IN ({marcadores})",
+                    (*valores, self.dono, *ids))
+                return cursor.rowcount
+            finally:
+                cursor.close()
+
+    def renovar(self, ids):
+        """Estende o lease das tarefas ainda em processamento"""
+        return self.atualizar(ids, "lease_expires = UTC_TIMESTAMP() + INTERVAL %s SECOND", (self.duracao_lease,))
+
+    def concluir(self, ids):
+        """Chamar só depois que o resultado da tarefa estiver gravado no banco"""
+        return self.atualizar(ids, "status = 'concluida', lease_owner = NULL, lease_expires = NULL")
+
+    def devolver(self, ids):
+        """Devolve tarefas que falharam; após max_tentativas elas ficam com status 'falha'"""
+        return self.atualizar(
+            ids,
+            "status = IF(tentativas >= %s, 'falha', 'pendente'), lease_owner = NULL, lease_expires = NULL",
+            (self.max_tentativas,))
+
+    def resumo(self):
+        """Contagem de tarefas por status"""
+        self.repository.get_connection()
+        cursor = self.repository.conn.cursor()
+        try:
+            cursor.execute("SELECT status, COUNT(*) FROM fila_trabalho WHERE tipo_tarefa = %s GROUP BY status", (self.tipo_tarefa,))
+            return dict(cursor.fetchall())
+        finally:
+            cursor.close()
@@ -1,13 +1,31 @@
 import os
+import threading
+import time
+from contextlib import contextmanager
 import mysql.connector
-from dotenv import load_dotenv
+from mysql.connector import pooling
 
+from entity.buffer_resultados import BufferResultados
 from entity.resultado import Resultado
+from service.ambiente import carregar_ambiente
+
+# Pools compartilhados por todas as instâncias de Repository com a mesma configuração
+_pools = {}
+_pools_lock = threading.Lock()
 
 
 class Repository():
-    def __init__(self):
-        load_dotenv()
+    # Só substitui o código de uma linha existente quando ela ainda está sem código_fonte
+    SQL_UPSERT_RESULTADO = (
+        "INSERT INTO resultados (id_desafio, id_modelo, tipo, codigo_fonte, linguagem, id_resultado_origem) "
+        "VALUES (%s, %s, %s, %s, %s, %s) "
+        "ON DUPLICATE KEY UPDATE "
+        "id_resultado_origem = IF(codigo_fonte IS NULL OR codigo_fonte = '', VALUES(id_resultado_origem), id_resultado_origem), "
+        "codigo_fonte = IF(codigo_fonte IS NULL OR codigo_fonte = '', VALUES(codigo_fonte), codigo_fonte)"
+    )
+
+    def __init__(self, pool=None):
+        carregar_ambiente()
         self.db_config = {
         'host': os.getenv('DB_HOST'),
         'port': int(os.getenv('DB_PORT')),
@@ -15,28 +33,88 @@ class Repository():
         'password': os.getenv('DB_PASSWORD') or '',
         'database': os.getenv('DB_NAME'),
         }
-        self.conn = None
+        self.pool_size = int(os.getenv('DB_POOL_SIZE', 5))
+        self.pool_timeout = float(os.getenv('DB_POOL_TIMEOUT', 30))
+        # Só valida a conexão (ping) se ela ficou ociosa por mais que esse tempo
+        self.ping_apos = float(os.getenv('DB_PING_APOS', 300))
+        self.tamanho_lote = int(os.getenv('DB_TAMANHO_LOTE', 500))
+        self.stream_timeout = int(os.getenv('DB_STREAM_TIMEOUT', 86400))
+        # Permite injetar um pool de teste (qualquer objeto com get_connection(), ex.: um MySQL local)
+        self.pool = pool
+        self.local = threading.local()
 
-    def get_connection(self):
-        # Verifica se a conexão existe e se ainda está ativa
-        if self.conn is None or not self.conn.is_connected():
+    @property
+    def conn(self):
+        return getattr(self.local, 'conn', None)
+
+    def get_pool(self):
+        if self.pool is None:
+            chave = (self.db_config['host'], self.db_config['port'], self.db_config['user'], self.db_config['database'])
+            with _pools_lock:
+                if chave not in _pools:
+                    _pools[chave] = pooling.MySQLConnectionPool(
+                        pool_name=f"tcc_{len(_pools)}",
+                        pool_size=self.pool_size,
+                        pool_reset_session=True,
+                        **self.db_config
+                    )
+                self.pool = _pools[chave]
+        return self.pool
+
+    def obter_conexao_do_pool(self):
+        """Retira uma conexão do pool, aguardando até pool_timeout se todas estiverem em uso"""
+        inicio = time.monotonic()
+        while True:
             try:
-                self.conn = mysql.connector.connect(**self.db_config)
-            except mysql.connector.Error as err:
-                print(f"Erro ao conectar: {err}")
-                raise err
+                return self.get_pool().get_connection()
+            except mysql.connector.errors.PoolError:
+                if time.monotonic() - inicio > self.pool_timeout:
+                    raise
+                time.sleep(0.05)
+
+    def get_connection(self):
+        # Cada thread usa a sua própria conexão do pool, retirada uma única vez
+        try:
+            if self.conn is None:
+                self.local.conn = self.obter_conexao_do_pool()
+            elif time.monotonic() - self.local.ultimo_uso > self.ping_apos:
+                self.conn.ping(reconnect=True, attempts=3, delay=1)
+            self.local.ultimo_uso = time.monotonic()
+        except mysql.connector.Error as err:
+            print(f"Erro ao conectar: {err}")
+            self.local.conn = None
+            raise err
 
     def close_db_connection(self):
         try:
-            # Verifica se a conexão existe e está ativa
-            if self.conn and self.conn.is_connected():
+            # Devolve ao pool a conexão da thread atual
+            if self.conn is not None:
                 self.conn.close()
 
-            self.conn = None
+            self.local.conn = None
             
         except mysql.connector.Error as err:
+            self.local.conn = None
             print(f"❌ Erro ao fechar a conexão: {err}")
 
+    @contextmanager
+    def transacao(self):
+        """Entrega a conexão da thread atual e faz commit ao final, ou rollback em caso de erro"""
+        self.get_connection()
+        conn = self.conn
+        try:
+            yield conn
+            conn.commit()
+        except mysql.connector.Error as err:
+            conn.rollback()
+            if isinstance(err, (mysql.connector.errors.OperationalError, mysql.connector.errors.InterfaceError)):
+                # Conexão perdida: a próxima chamada retira outra do pool
+                self.close_db_connection()
+            raise
+        except Exception:
+            conn.rollback()
+            raise
+
     def insert_into_table(self, table_name, data):
         self.get_connection()
         cursor = self.conn.cursor()
@@ -57,28 +135,60 @@ class Repository():
             self.conn.rollback()
         finally:
             cursor.close()
-                
+
+    def insert_many(self, table_name, registros, tamanho_lote=None):
+        """Insere vários registros (dicts com as mesmas chaves) com executemany, um commit por lote"""
+        if not registros:
+            return 0
+        tamanho_lote = tamanho_lote or self.tamanho_lote
+        columns = ", ".join(registros[0].keys())
+        placeholders = ", ".join(["%s"] * len(registros[0]))
+        sql = f"INSERT INTO {table_name} ({columns}) VALUES ({placeholders})"
+        inseridos = 0
+
+        self.get_connection()
+        cursor = self.conn.cursor()
+        try:
+            for inicio in range(0, len(registros), tamanho_lote):
+                lote = registros[inicio:inicio + tamanho_lote]
+                try:
+                    # O conector reescreve o executemany de INSERT ... VALUES em um único INSERT multi-linha
+                    cursor.executemany(sql, [tuple(registro.values()) for registro in lote])
+                    self.conn.commit()
+                    inseridos += len(lote)
+                except mysql.connector.Error as err:
+                    print(f"❌ Erro ao inserir lote na tabela '{table_name}': {err}")
+                    self.conn.rollback()
+        finally:
+            cursor.close()
+        print(f"✅ {inseridos} registros inseridos na tabela '{table_name}'")
+        return inseridos
+
+
+    def montar_select(self, table_name, campos=None, data=None, filter=None, size = 100000):
+        filters = ""
+        values = ()  # ✅ Inicializa values para evitar o erro se data for None
+        
+        if data is not None:
+            where_clause = " AND ".join([f"{k} = %s" for k in data.keys()])
+            values = tuple(data.values())
+            filters = f"WHERE {where_clause}"
+        
+        if  filters == "" and filter is not None:
+            filters = f"WHERE {filter}"
+
+        if campos:
+            sql = f"SELECT {', '.join(campos)} FROM {table_name} {filters} LIMIT {size}"
+        else:
+            sql = f"SELECT * FROM {table_name} {filters} LIMIT {size}"
+        return sql, values
 
     def select_into_table(self, table_name, campos=None, data=None, filter=None, size = 100000):
         self.get_connection()
         cursor = self.conn.cursor(dictionary=True)
         
         try:
-            filters = ""
-            values = ()  # ✅ Inicializa values para evitar o erro se data for None
-            
-            if data is not None:
-                where_clause = " AND ".join([f"{k} = %s" for k in data.keys()])
-                values = tuple(data.values())
-                filters = f"WHERE {where_clause}"
-            
-            if  filters == "" and filter is not None:
-                filters = f"WHERE {filter}"
-
-            if campos:
-                sql = f"SELECT {', '.join(campos)} FROM {table_name} {filters} LIMIT {size}"
-            else:
-                sql = f"SELECT * FROM {table_name} {filters} LIMIT {size}"
+            sql, values = self.montar_select(table_name, campos, data, filter, size)
             
             # Agora values sempre existe, mesmo que seja uma tupla vazia ()
             cursor.execute(sql, values)
@@ -90,24 +200,69 @@ class Repository():
             return []
         finally:
             cursor.close()
+
+    def select_into_table_stream(self, table_name, campos=None, data=None, filter=None, size = 100000, tamanho_lote=500):
+        """Mesma consulta de select_into_table, mas entrega as linhas conforme chegam do servidor"""
+        sql, values = self.montar_select(table_name, campos, data, filter, size)
+        yield from self.stream(sql, values, tamanho_lote)
+
+    def stream(self, sql, values=(), tamanho_lote=500):
+        """
+        Executa a consulta com cursor não bufferizado e entrega as linhas em blocos de
+        `tamanho_lote`, sem carregar o resultado inteiro na memória. Usa uma conexão
+        própria do pool, então o chamador pode continuar gravando pela conexão da thread
+        enquanto consome as linhas.
+        """
+        conn = self.obter_conexao_do_pool()
+        cursor = conn.cursor(dictionary=True, buffered=False)
+        try:
+            # O consumidor pode demorar (ex.: uma chamada à LLM por linha); sem isso o servidor
+            # derruba a conexão após net_write_timeout segundos com o envio bloqueado
+            cursor.execute("SET SESSION net_write_timeout = %s", (self.stream_timeout,))
+            cursor.execute(sql, values)
+            while True:
+                linhas = cursor.fetchmany(tamanho_lote)
+                if not linhas:
+                    break
+                yield from linhas
+        except mysql.connector.Error as err:
+            # Propaga: um stream interrompido não pode parecer um resultado completo (e menor)
+            print(f"❌ Erro ao selecionar: {err}")
+            raise
+        finally:
+            try:
+                # Descarta linhas não lidas se o consumidor parou antes do fim
+                conn.consume_results()
+                cursor.close()
+            except mysql.connector.Error:
+                pass
+            conn.close()
     
+    def sql_resultados_baseline_nao_executados(self, tipo, size):
+        """
+        Anti-join com NOT EXISTS: o lado externo percorre idx_resultados_tipo e a sonda
+        (id_desafio, id_modelo, tipo, linguagem) é resolvida só no índice uk_resultados_chave.
+        """
+        sql = ("SELECT BASELINE.id_resultado, BASELINE.id_desafio, BASELINE.id_modelo, BASELINE.codigo_fonte, BASELINE.linguagem FROM resultados AS BASELINE "
+                "WHERE BASELINE.tipo = 'baseline' "
+                "AND BASELINE.codigo_fonte is not null "
+                "AND NOT EXISTS ("
+                    "SELECT 1 FROM resultados AS REFATORADO "
+                    "WHERE REFATORADO.id_desafio = BASELINE.id_desafio "
+                    "AND REFATORADO.id_modelo = BASELINE.id_modelo "
+                    "AND REFATORADO.tipo = %s "
+                    "AND REFATORADO.linguagem = BASELINE.linguagem) "
+                f"ORDER BY BASELINE.id_resultado LIMIT {int(size)}")
+        return sql, (tipo,)
+
     def getResultadosBaselineNaoExecutados(self, tipo, size):
         self.get_connection()
         cursor = self.conn.cursor(dictionary=True)
         
         try:
-            sql = ("SELECT BASELINE.id_resultado, BASELINE.id_desafio, BASELINE.id_modelo, BASELINE.codigo_fonte, BASELINE.linguagem FROM tcc_refatoracao_llm.resultados AS BASELINE "
-                    "LEFT JOIN tcc_refatoracao_llm.resultados AS REFATORADO "
-                    f"ON (REFATORADO.TIPO = '{tipo}' "
-                        "AND REFATORADO.id_desafio = BASELINE.id_desafio "
-                        "AND REFATORADO.id_modelo = BASELINE.id_modelo "
-                        "AND REFATORADO.linguagem = BASELINE.linguagem) "
-                    "WHERE BASELINE.tipo = 'baseline' "
-                    "AND BASELINE.codigo_fonte is not null "
-                    f"AND REFATORADO.id_resultado is null LIMIT {size}")
+            sql, values = self.sql_resultados_baseline_nao_executados(tipo, size)
             
-            # Agora values sempre existe, mesmo que seja uma tupla vazia ()
-            cursor.execute(sql)
+            cursor.execute(sql, values)
             result = cursor.fetchall()
             return result
             
@@ -117,30 +272,34 @@ class Repository():
         finally:
             cursor.close()
 
+    def getResultadosBaselineNaoExecutadosStream(self, tipo, size, tamanho_lote=500):
+        sql, values = self.sql_resultados_baseline_nao_executados(tipo, size)
+        yield from self.stream(sql, values, tamanho_lote)
+
+    # Usar aspas triplas (""") é a melhor prática para SQL em Python:
+    # 1. Evita erros de concatenação/espaço
+    # 2. Fica muito mais legível
+    SQL_ALL_RESULTADOS = """
+        SELECT 
+            resultados.tipo, 
+            resultados.linguagem, 
+            resultados.complexidade_ciclomatica, 
+            resultados.divida_tecnica, 
+            resultados.code_smells, 
+            resultados.loc,
+            modelos.nome_modelo as modelo
+        FROM tcc_refatoracao_llm.resultados as resultados
+        JOIN tcc_refatoracao_llm.modelos as modelos 
+            ON modelos.id_modelo = resultados.id_modelo
+        ORDER BY resultados.id_resultado
+    """
+
     def getAllResultados(self):
         self.get_connection()
         cursor = self.conn.cursor(dictionary=True)
         
         try:
-            # Usar aspas triplas (""") é a melhor prática para SQL em Python:
-            # 1. Evita erros de concatenação/espaço
-            # 2. Fica muito mais legível
-            sql = """
-                SELECT 
-                    resultados.tipo, 
-                    resultados.linguagem, 
-                    resultados.complexidade_ciclomatica, 
-                    resultados.divida_tecnica, 
-                    resultados.code_smells, 
-                    resultados.loc,
-                    modelos.nome_modelo as modelo
-                FROM tcc_refatoracao_llm.resultados as resultados
-                JOIN tcc_refatoracao_llm.modelos as modelos 
-                    ON modelos.id_modelo = resultados.id_modelo
-                ORDER BY resultados.id_resultado
-            """
-            
-            cursor.execute(sql)
+            cursor.execute(self.SQL_ALL_RESULTADOS)
             result = cursor.fetchall()
             return result
             
@@ -150,6 +309,86 @@ class Repository():
         finally:
             cursor.close()
 
+    def getAllResultadosStream(self, tamanho_lote=5000):
+        yield from self.stream(self.SQL_ALL_RESULTADOS, (), tamanho_lote)
+
+    # Cubos pré-agregados para os gráficos (analytic_view/cubos_analiticos.py): só os totais saem do banco
+    SQL_CUBO_MEDIAS = """
+        SELECT
+            modelos.nome_modelo as modelo,
+            resultados.tipo,
+            resultados.linguagem,
+            COUNT(*) as contagem,
+            CAST(SUM(resultados.complexidade_ciclomatica) AS SIGNED) as soma_complexidade_ciclomatica,
+            CAST(SUM(resultados.divida_tecnica) AS SIGNED) as soma_divida_tecnica,
+            CAST(SUM(resultados.code_smells) AS SIGNED) as soma_code_smells,
+            CAST(SUM(resultados.loc) AS SIGNED) as soma_loc
+        FROM resultados
+        JOIN modelos
+            ON modelos.id_modelo = resultados.id_modelo
+        GROUP BY modelos.nome_modelo, resultados.tipo, resultados.linguagem
+    """
+
+    SQL_CUBO_DISPERSAO = """
+        SELECT
+            resultados.tipo,
+            resultados.linguagem,
+            resultados.loc,
+            resultados.complexidade_ciclomatica,
+            COUNT(*) as contagem
+        FROM resultados
+        JOIN modelos
+            ON modelos.id_modelo = resultados.id_modelo
+        GROUP BY resultados.tipo, resultados.linguagem, resultados.loc, resultados.complexidade_ciclomatica
+    """
+
+    def getCuboMediasResultados(self):
+        """Contagem e somas das métricas por (modelo, tipo, linguagem)"""
+        return self.selecionar_sql(self.SQL_CUBO_MEDIAS)
+
+    def getCuboDispersaoResultados(self):
+        """Frequência de cada par (loc, complexidade) por (tipo, linguagem)"""
+        return self.selecionar_sql(self.SQL_CUBO_DISPERSAO)
+
+    def selecionar_sql(self, sql, values=()):
+        self.get_connection()
+        cursor = self.conn.cursor(dictionary=True)
+
+        try:
+            cursor.execute(sql, values)
+            return cursor.fetchall()
+
+        except mysql.connector.Error as err:
+            print(f"❌ Erro ao selecionar: {err}")
+            return []
+        finally:
+            cursor.close()
+
+    def getChavesResultados(self, tamanho_lote=1000):
+        """Chaves de todos os resultados com código, em streaming (o código só é usado para validação)"""
+        sql = ("SELECT id_desafio, id_modelo, tipo, linguagem, codigo_fonte "
+               "FROM resultados "
+               "WHERE codigo_fonte IS NOT NULL")
+        yield from self.stream(sql, (), tamanho_lote)
+
+    def ids_resultados(self, chaves):
+        """{(id_desafio, id_modelo, tipo, linguagem): id_resultado} das chaves informadas, em uma única consulta"""
+        if not chaves:
+            return {}
+        self.get_connection()
+        cursor = self.conn.cursor()
+        try:
+            condicoes = ", ".join(["(%s, %s, %s, %s)"] * len(chaves))
+            sql = ("SELECT id_desafio, id_modelo, tipo, linguagem, id_resultado FROM resultados "
+                   f"WHERE (id_desafio, id_modelo, tipo, linguagem) IN ({condicoes})")
+            cursor.execute(sql, tuple(valor for chave in chaves for valor in chave))
+            return {tuple(linha[:4]): linha[4] for linha in cursor.fetchall()}
+        except mysql.connector.Error as err:
+            print(f"❌ Erro ao buscar ids de resultados: {err}")
+            return {}
+        finally:
+            cursor.close()
+
     def update_table(self, table_name, data, conditions):
         self.get_connection()
         cursor = self.conn.cursor()
@@ -171,59 +410,104 @@ class Repository():
         finally:
             cursor.close()
 
-    def insert_resultados(self, resultados: list[Resultado]):
+    def update_table_lote(self, table_name, registros, coluna_chave):
+        """
+        UPDATE em lote (executemany) de registros com as mesmas colunas, identificados por coluna_chave.
+        Tudo em uma transação: retorna True se o lote foi gravado e False se houve rollback.
+        """
         self.get_connection()
         cursor = self.conn.cursor()
         
         try:
-            quantidade_inserida = 0
-            for resultado in resultados:
-                # Verifica se já existe um resultado para esse desafio, modelo, tipo, linguagem e com o código_fonte não nulo nem vazio
-                sql = "SELECT id_resultado FROM resultados WHERE id_desafio = %s AND id_modelo = %s AND tipo = %s AND linguagem = %s AND codigo_fonte IS NOT NULL AND codigo_fonte != ''"
-                values = (resultado.id_desafio, resultado.id_modelo, resultado.tipo, resultado.linguagem)
-                cursor.execute(sql, values) 
-                existing = cursor.fetchone()
-                if existing:
-                    continue
-                quantidade_inserida += 1
-                sql = f"INSERT INTO resultados (id_desafio, id_modelo, tipo, codigo_fonte, linguagem, id_resultado_origem) VALUES (%s, %s, %s, %s, %s, %s)"
-                values = (resultado.id_desafio, resultado.id_modelo, resultado.tipo, resultado.codigo_fonte, resultado.linguagem, resultado.id_resultado_origem)
-                cursor.execute(sql, values)
-
+            colunas = [k for k in registros[0].keys() if k != coluna_chave]
+            set_clause = ", ".join([f"{k} = %s" for k in colunas])
+            
+            values = [tuple(registro[k] for k in colunas) + (registro[coluna_chave],) for registro in registros]
             
+            sql = f"UPDATE {table_name} SET {set_clause} WHERE {coluna_chave} = %s"
+            cursor.executemany(sql, values)
             self.conn.commit()
-            print(f"✅ Inseridos {quantidade_inserida} resultados na tabela 'resultados'")
+            print(f"✅ Atualizados {len(registros)} registros na tabela '{table_name}'")
+            return True
             
         except mysql.connector.Error as err:
-            print(f"❌ Erro ao inserir resultados: {err}")
+            print(f"❌ Erro ao atualizar: {err}")
             self.conn.rollback()
+            return False
         finally:
             cursor.close()
 
-
-    def insert_resultado(self, resultado: Resultado):
+    def insert_resultados(self, resultados: BufferResultados | list[Resultado], tamanho_lote=None):
+        """
+        Grava os resultados em lotes com INSERT ... ON DUPLICATE KEY UPDATE sobre a chave
+        única (id_desafio, id_modelo, tipo, linguagem). Resultados cuja chave já tem
+        codigo_fonte preenchido são ignorados. Retorna a contagem por desfecho.
+        Um BufferResultados (já sem chaves repetidas) é exportado direto das colunas.
+        """
+        tamanho_lote = tamanho_lote or self.tamanho_lote
+        contagem = {'inseridos': 0, 'ignorados': 0, 'falhas': 0}
+        if not isinstance(resultados, BufferResultados):
+            # Chaves repetidas na lista: fica a primeira ocorrência
+            quantidade = len(resultados)
+            resultados = BufferResultados(resultados)
+            contagem['ignorados'] += quantidade - len(resultados)
         self.get_connection()
+
+        for inicio in range(0, len(resultados), tamanho_lote):
+            parcial = self.upsert_lote_resultados(resultados.linhas(inicio, inicio + tamanho_lote))
+            for desfecho, quantidade in parcial.items():
+                contagem[desfecho] += quantidade
+
+        print(f"✅ Resultados na tabela 'resultados': {contagem['inseridos']} inseridos, {contagem['ignorados']} ignorados, {contagem['falhas']} falhas")
+        return contagem
+
+    def upsert_lote_resultados(self, lote: list[tuple]):
+        """`lote`: tuplas na ordem de SQL_UPSERT_RESULTADO, sem chaves repetidas (BufferResultados.linhas)"""
+        contagem = {'inseridos': 0, 'ignorados': 0, 'falhas': 0}
         cursor = self.conn.cursor()
-        
+
         try:
-            # Verifica se já existe um resultado para esse desafio, modelo, tipo, linguagem e com o código_fonte não nulo nem vazio
-            sql = "SELECT id_resultado FROM resultados WHERE id_desafio = %s AND id_modelo = %s AND tipo = %s AND linguagem = %s AND codigo_fonte IS NOT NULL AND codigo_fonte != ''"
-            values = (resultado.id_desafio, resultado.id_modelo, resultado.tipo, resultado.linguagem)
-            cursor.execute(sql, values) 
-            existing = cursor.fetchone()
-            if existing:
-                return
-            
-            sql = f"INSERT INTO resultados (id_desafio, id_modelo, tipo, codigo_fonte, linguagem) VALUES (%s, %s, %s, %s, %s)"
-            values = (resultado.id_desafio, resultado.id_modelo, resultado.tipo, resultado.codigo_fonte, resultado.linguagem)
-            cursor.execute(sql, values)
+            por_chave = {(linha[0], linha[1], linha[2], linha[4]): linha for linha in lote}
+
+            # Uma única consulta para descobrir quais chaves já têm código salvo
+            condicoes = ", ".join(["(%s, %s, %s, %s)"] * len(por_chave))
+            sql = ("SELECT id_desafio, id_modelo, tipo, linguagem FROM resultados "
+                   "WHERE codigo_fonte IS NOT NULL AND codigo_fonte != '' "
+                   f"AND (id_desafio, id_modelo, tipo, linguagem) IN ({condicoes})")
+            cursor.execute(sql, tuple(valor for chave in por_chave for valor in chave))
+            existentes = {tuple(linha) for linha in cursor.fetchall()}
+
+            valores = [linha for chave, linha in por_chave.items() if chave not in existentes]
+            contagem['ignorados'] += len(por_chave) - len(valores)
+            if not valores:
+                return contagem
+
+            try:
+                cursor.executemany(self.SQL_UPSERT_RESULTADO, valores)
+                self.conn.commit()
+                contagem['inseridos'] += len(valores)
+            except mysql.connector.Error as err:
+                # Refaz linha a linha só para isolar quais registros falharam
+                print(f"❌ Erro ao inserir lote de resultados, tentando linha a linha: {err}")
+                self.conn.rollback()
+                for linha in valores:
+                    try:
+                        cursor.execute(self.SQL_UPSERT_RESULTADO, linha)
+                        self.conn.commit()
+                        contagem['inseridos'] += 1
+                    except mysql.connector.Error as err_linha:
+                        print(f"❌ Erro ao inserir resultado do desafio {linha[0]} (modelo {linha[1]}, {linha[2]}, {linha[4]}): {err_linha}")
+                        self.conn.rollback()
+                        contagem['falhas'] += 1
 
-            
-            self.conn.commit()
-            print(f"✅ Resultado {resultado.id_desafio} para o tipo {resultado.linguagem}")
-            
         except mysql.connector.Error as err:
             print(f"❌ Erro ao inserir resultados: {err}")
             self.conn.rollback()
+            contagem['falhas'] += len(lote) - contagem['inseridos'] - contagem['ignorados']
         finally:
-            cursor.close()
\ No newline at end of file
+            cursor.close()
+
+        return contagem
+
+    def insert_resultado(self, resultado: Resultado):
+        return self.insert_resultados([resultado])
@@ -0,0 +1,16 @@
+import threading
+
+_carregado = False
+_lock = threading.Lock()
+
+
+def carregar_ambiente():
+    """Carrega o .env uma única vez por processo (as chamadas seguintes não fazem nada)"""
+    global _carregado
+    if _carregado:
+        return
+    with _lock:
+        if not _carregado:
+            from dotenv import load_dotenv
+            load_dotenv()
+            _carregado = True
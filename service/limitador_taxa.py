@@ -0,0 +1,31 @@
+import threading
+import time
+
+
+class LimitadorTaxa:
+    """
+    Balde de fichas (token bucket) compartilhado entre threads: libera no máximo
+    `taxa_por_segundo` requisições por segundo, com rajadas de até `capacidade`.
+    Cada chamada reserva a próxima ficha e dorme só o necessário, então a taxa é
+    respeitada com precisão independente da latência de cada requisição.
+    """
+
+    def __init__(self, taxa_por_segundo, capacidade=1):
+        if taxa_por_segundo <= 0:
+            raise ValueError("taxa_por_segundo deve ser maior que zero.")
+        self.taxa_por_segundo = taxa_por_segundo
+        self.capacidade = capacidade
+        self.fichas = float(capacidade)
+        self.ultima_reposicao = time.monotonic()
+        self.lock = threading.Lock()
+
+    def aguardar(self):
+        with self.lock:
+            agora = time.monotonic()
+            self.fichas = min(self.capacidade, self.fichas + (agora - self.ultima_reposicao) * self.taxa_por_segundo)
+            self.ultima_reposicao = agora
+            # Saldo negativo = fichas já reservadas por outras threads que estão esperando
+            self.fichas -= 1
+            espera = -self.fichas / self.taxa_por_segundo if self.fichas < 0 else 0
+        if espera > 0:
+            time.sleep(espera)
@@ -1,22 +1,95 @@
+import time
+from email.utils import parsedate_to_datetime
+
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Respostas repetidas por RequestService.enviar (e não pelo adaptador, que não passa pelo limitador)
+STATUS_RETENTAVEIS = (429, 500, 502, 503, 504)
+
+
+class ErroRequisicao(Exception):
+    pass
 
 
 class RequestService:
-    def __init__(self):
-        pass
+    def __init__(self, tamanho_pool=10, limitador=None, timeout=30, max_tentativas=3):
+        # Uma sessão com pool de conexões keep-alive: evita refazer TCP+TLS a cada chamada
+        self.session = requests.Session()
+        # O adaptador só repete falhas de conexão (a requisição não chegou ao servidor); respostas
+        # 429/5xx são repetidas em enviar(), onde cada nova tentativa consome uma ficha do limitador
+        retentativas = Retry(total=None, connect=max_tentativas, read=0, status=0, other=0, backoff_factor=1, allowed_methods=None)
+        adaptador = HTTPAdapter(pool_connections=tamanho_pool, pool_maxsize=tamanho_pool, max_retries=retentativas)
+        self.session.mount('http://', adaptador)
+        self.session.mount('https://', adaptador)
+        self.limitador = limitador
+        self.timeout = timeout
+        self.max_tentativas = max_tentativas
+
+    def enviar(self, metodo, url, **kwargs):
+        """Requisição passando pelo limitador a cada tentativa; 429/5xx são repetidos até max_tentativas vezes"""
+        tentativa = 0
+        while True:
+            if self.limitador:
+                self.limitador.aguardar()
+            response = self.session.request(metodo, url, timeout=self.timeout, **kwargs)
+            if response.status_code not in STATUS_RETENTAVEIS or tentativa >= self.max_tentativas:
+                return response
+            espera = self.espera_retentativa(response, tentativa)
+            response.close()
+            time.sleep(espera)
+            tentativa += 1
+
+    @staticmethod
+    def espera_retentativa(response, tentativa):
+        """Retry-After (segundos ou data HTTP) quando o servidor informa; senão backoff exponencial"""
+        retry_after = response.headers.get('Retry-After')
+        if retry_after:
+            try:
+                return max(0.0, float(retry_after))
+            except ValueError:
+                try:
+                    return max(0.0, parsedate_to_datetime(retry_after).timestamp() - time.time())
+                except (TypeError, ValueError):
+                    pass
+        return float(2 ** tentativa)
+
     def get_request(self, url, headers=None, params=None):
-            """Faz uma requisição GET e retorna o JSON ou None em caso de erro."""
+            """Faz uma requisição GET e retorna o JSON; levanta ErroRequisicao em caso de erro."""
             try:
-                response = requests.get(url, headers=headers, params=params)
+                response = self.enviar('GET', url, headers=headers, params=params)
                 response.raise_for_status()
                 return response.json()
             except requests.exceptions.RequestException as e:
-                raise f"Erro na requisição GET: {e}"
+                raise ErroRequisicao(f"Erro na requisição GET: {e}") from e
     def post_request(self, url, headers=None, json=None):
-            """Faz uma requisição POST e retorna o JSON ou None em caso de erro."""
+            """Faz uma requisição POST e retorna o JSON; levanta ErroRequisicao em caso de erro."""
             try:
-                response = requests.post(url, headers=headers, json=json)
+                response = self.enviar('POST', url, headers=headers, json=json)
                 response.raise_for_status()
                 return response.json()
             except requests.exceptions.RequestException as e:
-                raise f"Erro na requisição POST: {e}"
\ No newline at end of file
+                raise ErroRequisicao(f"Erro na requisição POST: {e}") from e
+
+    def get_condicional(self, url, headers=None, etag=None, last_modified=None):
+        """
+        GET com If-None-Match/If-Modified-Since. Devolve (json, etag, last_modified);
+        json é None quando o servidor responde 304 (conteúdo não mudou).
+        """
+        cabecalhos = dict(headers or {})
+        if etag:
+            cabecalhos['If-None-Match'] = etag
+        if last_modified:
+            cabecalhos['If-Modified-Since'] = last_modified
+        try:
+            response = self.enviar('GET', url, headers=cabecalhos)
+            if response.status_code == 304:
+                return None, etag, last_modified
+            response.raise_for_status()
+            return response.json(), response.headers.get('ETag'), response.headers.get('Last-Modified')
+        except requests.exceptions.RequestException as e:
+            raise ErroRequisicao(f"Erro na requisição GET condicional: {e}") from e
+
+    def close(self):
+        self.session.close()
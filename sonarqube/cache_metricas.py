@@ -0,0 +1,37 @@
+import hashlib
+import os
+
+from repository.cache_sqlite import CacheSqlite
+
+
+class CacheMetricas(CacheSqlite):
+    """
+    Cache de métricas endereçado pelo conteúdo: a chave é o hash do código normalizado,
+    a linguagem e a versão do analisador. Códigos idênticos (ex.: o modelo devolveu o
+    baseline sem alterações) reaproveitam as métricas sem novo scan.
+    """
+
+    def __init__(self, caminho_arquivo=None, max_entradas=None):
+        super().__init__(
+            caminho_arquivo or os.getenv('METRICAS_CACHE_ARQUIVO', 'cache_metricas.sqlite'),
+            max_entradas or int(os.getenv('METRICAS_CACHE_MAX', 200000))
+        )
+
+    @staticmethod
+    def normalizar(codigo):
+        """Ignora diferenças de quebra de linha e espaços no fim das linhas, que não mudam as métricas"""
+        linhas = (codigo or "").replace('\r\n', '\n').replace('\r', '\n').split('\n')
+        return "\n".join(linha.rstrip() for linha in linhas).strip('\n')
+
+    def chave(self, codigo, linguagem, versao_analisador):
+        hash_codigo = hashlib.sha256(self.normalizar(codigo).encode('utf-8')).hexdigest()
+        return f"{hash_codigo}:{linguagem.lower()}:{versao_analisador}"
+
+    def obter_metricas(self, codigo, linguagem, versao_analisador):
+        if versao_analisador is None:
+            return None
+        return self.obter(self.chave(codigo, linguagem, versao_analisador))
+
+    def guardar_metricas(self, codigo, linguagem, versao_analisador, metricas):
+        if versao_analisador is not None:
+            self.guardar(self.chave(codigo, linguagem, versao_analisador), metricas)
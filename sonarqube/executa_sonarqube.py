@@ -1,60 +1,150 @@
 import os
+import queue
+import shutil
 import sys
 import subprocess
+import threading
 import time
-from dotenv import load_dotenv
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 import requests
 root_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
 if root_path not in sys.path:
     sys.path.append(root_path)
 from enums.lingagem import Linguagem
-from gerar_codigo_llm.llm_request import LLMRequester
+from repository.fila_trabalho import TAREFA_METRICAS, FilaTrabalho
 from repository.repository import Repository
+from service.ambiente import carregar_ambiente
+from sonarqube import metricas_locais
+from sonarqube.cache_metricas import CacheMetricas
+
+
+# Resultados ainda sem métricas (coluna status_metricas, migração 003)
+STATUS_PENDENTE = 'pendente'
+STATUS_CALCULADO = 'calculado'
 
 
 class executa_sonarqube:
     def __init__(self):
+        carregar_ambiente()
         self.repository = Repository()
-        self.llm_request = LLMRequester()
-        load_dotenv()
         self.scan_config = {
         'project_key': os.getenv('PROJECT_KEY'),
         'sonar_url': os.getenv('SONAR_URL'),
         'sonar_token': os.getenv('SONAR_TOKEN'),
         'executable': os.getenv('SONAR_SCANNER_PATH')
         }
+        self.diretorio_workers = os.getenv('SONAR_WORKERS_DIR', 'sonar_workers')
+        self.cache_metricas = CacheMetricas()
+        self.versao_analisador_sonar = None
+
+    def versao_sonar(self):
+        """Versão do servidor (+ SONAR_VERSAO_REGRAS, para mudanças de quality profile), usada na chave do cache"""
+        if self.versao_analisador_sonar is None:
+            try:
+                response = requests.get(f"{self.scan_config['sonar_url']}/api/server/version", auth=(self.scan_config['sonar_token'], ""))
+                response.raise_for_status()
+                self.versao_analisador_sonar = f"sonar-{response.text.strip()}-{os.getenv('SONAR_VERSAO_REGRAS', '')}"
+            except Exception as e:
+                # Sem versão conhecida o cache fica desligado para o Sonar
+                print(f"  [!] Não foi possível obter a versão do Sonar, cache desativado: {e}")
+        return self.versao_analisador_sonar
+
+    def versao_sonar_lote(self):
+        """
+        Chave do cache para o scan em lote: duplicated_lines_density inclui duplicação entre os
+        arquivos do lote, então essas métricas não podem ser servidas para o scan de arquivo único
+        """
+        versao = self.versao_sonar()
+        return f"{versao}-lote" if versao else None
+
+    def filtrar_cache(self, resultados, versao_analisador, salvos=None):
+        """
+        Grava direto as métricas de códigos já analisados e entrega apenas os que precisam de análise.
+        Com `salvos`, acrescenta a ele os id_resultado cujas métricas do cache foram de fato gravadas.
+        """
+        salvos = set() if salvos is None else salvos
+        acertos = {}
+        for resultado in resultados:
+            metricas = self.cache_metricas.obter_metricas(resultado['codigo_fonte'], resultado['linguagem'], versao_analisador)
+            if metricas is None:
+                yield resultado
+                continue
+            acertos[resultado['id_resultado']] = metricas
+            if len(acertos) >= 100:
+                salvos |= self.salvar_metricas_lote(acertos)
+                acertos = {}
+        if acertos:
+            salvos |= self.salvar_metricas_lote(acertos)
+        print(f"Cache de métricas ({versao_analisador}): {self.cache_metricas.estatisticas()}")
 
-    def run_sonar_scanner(self, file_path):
+    def run_sonar_scanner(self, file_path, project_key=None, diretorio_trabalho=None):
         command = [
         self.scan_config['executable'],
-        f"-Dsonar.projectKey={self.scan_config['project_key']}",
+        f"-Dsonar.projectKey={project_key or self.scan_config['project_key']}",
         f"-Dsonar.sources={file_path}",
         f"-Dsonar.host.url={self.scan_config['sonar_url']}",
         f"-Dsonar.login={self.scan_config['sonar_token']}",
         "-Dsonar.python.version=3"
         ]
-        subprocess.run(command, check=True)
+        # Com diretorio_trabalho cada worker tem o seu próprio .scannerwork/report-task.txt
+        subprocess.run(command, check=True, cwd=diretorio_trabalho)
 
-    def get_sonar_metrics(self):
+    def get_sonar_metrics(self, project_key=None, sessao=None):
         # Endpoint da API para buscar medidas específicas
         metrics = "code_smells,sqale_index,complexity,duplicated_lines_density,ncloc"
-        url = f"{self.scan_config['sonar_url']}/api/measures/component?component={self.scan_config['project_key']}&metricKeys={metrics}"
-        response = requests.get(url, auth=(self.scan_config['sonar_token'], ""))
+        url = f"{self.scan_config['sonar_url']}/api/measures/component?component={project_key or self.scan_config['project_key']}&metricKeys={metrics}"
+        response = (sessao or requests).get(url, auth=(self.scan_config['sonar_token'], ""))
         return response.json()
 
-    def salvar_metricas(self, id_resultado, metricas):
+    def get_sonar_metrics_por_arquivo(self, project_key=None, sessao=None):
+        """Métricas de cada arquivo do projeto via api/measures/component_tree, percorrendo todas as páginas"""
+        metrics = "code_smells,sqale_index,complexity,duplicated_lines_density,ncloc"
+        url = f"{self.scan_config['sonar_url']}/api/measures/component_tree"
+        metricas_por_arquivo = {}
+        pagina = 1
+        while True:
+            params = {
+                'component': project_key or self.scan_config['project_key'],
+                'metricKeys': metrics,
+                'qualifiers': 'FIL',
+                'ps': 500,
+                'p': pagina
+            }
+            response = (sessao or requests).get(url, params=params, auth=(self.scan_config['sonar_token'], ""))
+            dados = response.json()
+            for componente in dados.get('components', []):
+                metricas_por_arquivo[componente['name']] = {m['metric']: m['value'] for m in componente.get('measures', []) if 'value' in m}
+            paginacao = dados.get('paging', {})
+            if pagina * paginacao.get('pageSize', 500) >= paginacao.get('total', 0):
+                return metricas_por_arquivo
+            pagina += 1
+
+    def converter_metricas(self, metricas):
         # O dicionário deve ser uma estrutura única de chave: valor
-        metricas_db = {
+        return {
             'code_smells': int(metricas.get('code_smells', 0)),
             'divida_tecnica': int(metricas.get('sqale_index', 0)),
             'complexidade_ciclomatica': int(metricas.get('complexity', 0)),
             'duplicacao_percentual': float(metricas.get('duplicated_lines_density', 0)),
             'loc': int(metricas.get('ncloc', 0))
         }
+
+    def salvar_metricas(self, id_resultado, metricas):
+        metricas_db = {**self.converter_metricas(metricas), 'status_metricas': STATUS_CALCULADO}
         self.repository.update_table(table_name='resultados', data=metricas_db, conditions={'id_resultado': id_resultado})
 
-    def wait_for_sonar_task(self, timeout=60):
-        task_file = ".scannerwork/report-task.txt"
+    def salvar_metricas_lote(self, metricas_por_resultado):
+        """Grava {id_resultado: métricas do Sonar} com um único UPDATE em lote e retorna os id_resultado gravados"""
+        registros = [
+            {**self.converter_metricas(metricas), 'status_metricas': STATUS_CALCULADO, 'id_resultado': id_resultado}
+            for id_resultado, metricas in metricas_por_resultado.items()
+        ]
+        if registros and self.repository.update_table_lote(table_name='resultados', registros=registros, coluna_chave='id_resultado'):
+            return set(metricas_por_resultado)
+        return set()
+
+    def wait_for_sonar_task(self, timeout=60, task_file=".scannerwork/report-task.txt", sessao=None):
         start_time = time.time()
         
         # 1. Aguarda o arquivo aparecer
@@ -86,7 +176,7 @@ class executa_sonarqube:
 
             try:
                 # Importante: O Sonar pede o token no campo de 'username' e nada no 'password'
-                response = requests.get(task_url, auth=(self.scan_config['sonar_token'], ""))
+                response = (sessao or requests).get(task_url, auth=(self.scan_config['sonar_token'], ""))
                 
                 if response.status_code == 200:
                     task_data = response.json().get('task', {})
@@ -105,49 +195,307 @@ class executa_sonarqube:
             except Exception as e:
                 print(f"  [!] Erro de conexão: {e}")
                 return False
+
+    def criar_workers(self, quantidade):
+        """
+        Cada worker tem diretório de trabalho, project key e sessão HTTP próprios, para que
+        scans simultâneos não disputem o mesmo report-task.txt nem as métricas do mesmo projeto.
+        O worker 0 usa o PROJECT_KEY do .env; os demais usam PROJECT_KEY_1, PROJECT_KEY_2...,
+        que precisam existir no servidor (ou o token precisa de permissão para criá-los no scan).
+        """
+        workers = queue.Queue()
+        for indice in range(quantidade):
+            diretorio = os.path.abspath(os.path.join(self.diretorio_workers, f"worker_{indice}"))
+            os.makedirs(diretorio, exist_ok=True)
+            project_key = self.scan_config['project_key'] if indice == 0 else f"{self.scan_config['project_key']}_{indice}"
+            workers.put(WorkerSonar(project_key, diretorio, requests.Session()))
+        return workers
+
+    def analisar_resultado(self, resultado, workers, coletores):
+        """
+        Roda o scanner na thread atual; a espera pelo processamento no servidor (CE) e a
+        leitura das métricas vão para o pool `coletores`, e a thread já pode começar a próxima
+        análise. O worker (diretório e project key) fica reservado até as métricas serem lidas,
+        para que outro scan não sobrescreva as medidas do projeto. Sem `coletores`, a coleta
+        roda na própria thread, logo após o scan.
+        """
+        worker = workers.get()
+        task_file = os.path.join(worker.diretorio, ".scannerwork", "report-task.txt")
+        if os.path.exists(task_file):
+            os.remove(task_file)
+        # Define extensão correta
+        ext = ".py" if "python" in resultado['linguagem'].lower() else ".java"
+        file_name = f"temp_code_{resultado['id_resultado']}{ext}"
+        file_path = os.path.join(worker.diretorio, file_name)
+
+        try:
+            # Salva arquivo
+            with open(file_path, 'w', encoding='utf-8') as f:
+                f.write(resultado['codigo_fonte'])
+            
+            # Executa Scanner
+            print(f"Iniciando Scan ID: {resultado['id_resultado']} ({worker.project_key})")
+            self.run_sonar_scanner(file_name, worker.project_key, worker.diretorio)
+        except Exception as e:
+            print(f"Erro no registro {resultado['id_resultado']}: {e}")
+            workers.put(worker)
+            return
+        finally:
+            if os.path.exists(file_path):
+                os.remove(file_path)
+        if coletores is None:
+            self.coletar_metricas(resultado, worker, workers, task_file)
+        else:
+            coletores.submit(self.coletar_metricas, resultado, worker, workers, task_file)
+
+    def coletar_metricas(self, resultado, worker, workers, task_file):
+        """Aguarda o servidor processar a análise, grava as métricas e devolve o worker"""
+        try:
+            # SUBSTITUIÇÃO DO SLEEP: Aguarda o servidor processar de verdade
+            if self.wait_for_sonar_task(timeout=60, task_file=task_file, sessao=worker.sessao):
+                metrics_raw = self.get_sonar_metrics(worker.project_key, worker.sessao)
+                
+                if 'component' in metrics_raw:
+                    metricas_limpas = {m['metric']: m['value'] for m in metrics_raw['component']['measures']}
+                    self.salvar_metricas(resultado['id_resultado'], metricas_limpas)
+                    self.cache_metricas.guardar_metricas(resultado['codigo_fonte'], resultado['linguagem'], self.versao_sonar(), metricas_limpas)
+                    print(f"Sucesso: {resultado['id_resultado']}")
+            else:
+                print(f"  [!] Falha ao obter métricas para ID {resultado['id_resultado']}")
+        except Exception as e:
+            print(f"Erro no registro {resultado['id_resultado']}: {e}")
+        
+        finally:
+            self.repository.close_db_connection()
+            workers.put(worker)
     
-    def process_sonar(self):
-        resultados = self.repository.select_into_table(
+    def analisar_lote(self, lote, workers):
+        """
+        Materializa o lote em uma árvore de fontes (um arquivo por id_resultado), roda o scanner
+        uma única vez e distribui as métricas por arquivo de volta para cada id_resultado.
+        Observação: duplicated_lines_density passa a considerar duplicação entre arquivos do lote.
+        Retorna o conjunto de id_resultado que tiveram métricas gravadas no banco.
+        """
+        worker = workers.get()
+        task_file = os.path.join(worker.diretorio, ".scannerwork", "report-task.txt")
+        diretorio_lote = os.path.join(worker.diretorio, "lote")
+        ids = [resultado['id_resultado'] for resultado in lote]
+
+        try:
+            if os.path.exists(task_file):
+                os.remove(task_file)
+            shutil.rmtree(diretorio_lote, ignore_errors=True)
+            os.makedirs(diretorio_lote)
+
+            nomes_arquivo = {}
+            resultados_por_id = {}
+            for resultado in lote:
+                resultados_por_id[resultado['id_resultado']] = resultado
+                ext = ".py" if "python" in resultado['linguagem'].lower() else ".java"
+                nome_arquivo = f"resultado_{resultado['id_resultado']}{ext}"
+                with open(os.path.join(diretorio_lote, nome_arquivo), 'w', encoding='utf-8') as f:
+                    f.write(resultado['codigo_fonte'])
+                nomes_arquivo[nome_arquivo] = resultado['id_resultado']
+
+            print(f"Iniciando Scan em lote de {len(lote)} resultados ({ids[0]}..{ids[-1]}, {worker.project_key})")
+            self.run_sonar_scanner("lote", worker.project_key, worker.diretorio)
+
+            if not self.wait_for_sonar_task(timeout=max(60, 2 * len(lote)), task_file=task_file, sessao=worker.sessao):
+                print(f"  [!] Falha ao obter métricas para o lote {ids[0]}..{ids[-1]}")
+                return set()
+
+            metricas_por_arquivo = self.get_sonar_metrics_por_arquivo(worker.project_key, worker.sessao)
+            metricas_por_resultado = {
+                nomes_arquivo[nome]: metricas
+                for nome, metricas in metricas_por_arquivo.items() if nome in nomes_arquivo
+            }
+            salvos = self.salvar_metricas_lote(metricas_por_resultado)
+            for id_resultado, metricas in metricas_por_resultado.items():
+                resultado = resultados_por_id[id_resultado]
+                self.cache_metricas.guardar_metricas(resultado['codigo_fonte'], resultado['linguagem'], self.versao_sonar_lote(), metricas)
+
+            sem_metricas = [id_resultado for id_resultado in ids if id_resultado not in metricas_por_resultado]
+            print(f"Sucesso: {len(salvos)} resultados gravados do lote {ids[0]}..{ids[-1]}")
+            if sem_metricas:
+                print(f"  [!] Sem métricas no Sonar para os IDs {sem_metricas}")
+            return salvos
+        except Exception as e:
+            print(f"Erro no lote {ids[0]}..{ids[-1]}: {e}")
+            return set()
+        finally:
+            shutil.rmtree(diretorio_lote, ignore_errors=True)
+            self.repository.close_db_connection()
+            workers.put(worker)
+
+    def process_sonar_lote(self, tamanho_lote=None, quantidade_workers=None):
+        """Como process_sonar, mas cada invocação do scanner analisa `tamanho_lote` resultados (SONAR_TAMANHO_LOTE)"""
+        tamanho_lote = tamanho_lote or int(os.getenv('SONAR_TAMANHO_LOTE', 200))
+        quantidade_workers = quantidade_workers or int(os.getenv('SONAR_WORKERS', 1))
+        resultados = self.repository.select_into_table_stream(
             table_name="resultados", 
             campos=["id_resultado", "codigo_fonte", "linguagem"], 
-            data={'loc': 0},
+            data={'status_metricas': STATUS_PENDENTE},
             size = 10000
         )
+        resultados = self.filtrar_cache(resultados, self.versao_sonar_lote())
 
-        for resultado in resultados:
-            task_file = ".scannerwork/report-task.txt"
-            if os.path.exists(task_file):
-                os.remove(task_file)
-            # Define extensão correta
-            ext = ".py" if "python" in resultado['linguagem'].lower() else ".java"
-            file_path = f"temp_code_{resultado['id_resultado']}{ext}"
+        workers = self.criar_workers(quantidade_workers)
+        vagas = threading.BoundedSemaphore(quantidade_workers + 1)
+        with ThreadPoolExecutor(max_workers=quantidade_workers) as executor:
+            def enviar(lote):
+                # Todo lote, inclusive o último (parcial), ocupa uma vaga até terminar
+                vagas.acquire()
+                executor.submit(self.analisar_lote, lote, workers).add_done_callback(lambda _: vagas.release())
 
-            try:
-                # Salva arquivo
-                with open(file_path, 'w', encoding='utf-8') as f:
-                    f.write(resultado['codigo_fonte'])
-                
-                # Executa Scanner
-                print(f"Iniciando Scan ID: {resultado['id_resultado']}")
-                self.run_sonar_scanner(file_path)
+            lote = []
+            for resultado in resultados:
+                lote.append(resultado)
+                if len(lote) >= tamanho_lote:
+                    enviar(lote)
+                    lote = []
+            if lote:
+                enviar(lote)
 
-                # SUBSTITUIÇÃO DO SLEEP: Aguarda o servidor processar de verdade
-                if self.wait_for_sonar_task(timeout=60):
-                    metrics_raw = self.get_sonar_metrics()
-                    
-                    if 'component' in metrics_raw:
-                        metricas_limpas = {m['metric']: m['value'] for m in metrics_raw['component']['measures']}
-                        self.salvar_metricas(resultado['id_resultado'], metricas_limpas)
-                        print(f"Sucesso: {resultado['id_resultado']}")
-                else:
-                    print(f"  [!] Falha ao obter métricas para ID {resultado['id_resultado']}")
-            except Exception as e:
-                print(f"Erro no registro {resultado['id_resultado']}: {e}")
-            
-            finally:
-                if os.path.exists(file_path):
-                    os.remove(file_path)
+    def process_sonar_distribuido(self, tamanho_lote=None, quantidade_workers=None):
+        """
+        Scan em lote alimentado pela tabela fila_trabalho: cada worker (thread, processo ou máquina)
+        reivindica `tamanho_lote` tarefas com lease, analisa e conclui as que tiveram métricas
+        gravadas; as demais voltam para a fila até FILA_MAX_TENTATIVAS.
+        """
+        tamanho_lote = tamanho_lote or int(os.getenv('SONAR_TAMANHO_LOTE', 200))
+        quantidade_workers = quantidade_workers or int(os.getenv('SONAR_WORKERS', 1))
+        fila = FilaTrabalho(TAREFA_METRICAS, self.repository)
+        fila.enfileirar_metricas()
+        versao_analisador = self.versao_sonar_lote()
+        workers = self.criar_workers(quantidade_workers)
+
+        def consumir_fila():
+            while True:
+                tarefas = fila.reivindicar(tamanho_lote)
+                if not tarefas:
+                    self.repository.close_db_connection()
+                    return
+                ids_tarefa = {tarefa['id_resultado']: tarefa['id_tarefa'] for tarefa in tarefas}
+                # Acertos do cache são gravados dentro de filtrar_cache; só os demais vão para o scanner
+                com_metricas = set()
+                a_analisar = list(self.filtrar_cache(tarefas, versao_analisador, com_metricas))
+                if a_analisar:
+                    com_metricas |= self.analisar_lote(a_analisar, workers)
+                fila.concluir([id_tarefa for id_resultado, id_tarefa in ids_tarefa.items() if id_resultado in com_metricas])
+                fila.devolver([id_tarefa for id_resultado, id_tarefa in ids_tarefa.items() if id_resultado not in com_metricas])
+
+        with ThreadPoolExecutor(max_workers=quantidade_workers) as executor:
+            for futuro in [executor.submit(consumir_fila) for _ in range(quantidade_workers)]:
+                futuro.result()
+        print(f"Fila de métricas ({fila.dono}): {fila.resumo()}")
+
+    def process_metricas_locais(self, tamanho_lote=None, quantidade_processos=None):
+        """
+        Backend local: calcula complexidade, ncloc, duplicação e code smells com metricas_locais
+        em um pool de processos, sem servidor Sonar, e grava as mesmas colunas de salvar_metricas.
+        """
+        tamanho_lote = tamanho_lote or int(os.getenv('METRICAS_TAMANHO_LOTE', 200))
+        quantidade_processos = quantidade_processos or int(os.getenv('METRICAS_PROCESSOS', os.cpu_count() or 1))
+        resultados = self.repository.select_into_table_stream(
+            table_name="resultados", 
+            campos=["id_resultado", "codigo_fonte", "linguagem"], 
+            data={'status_metricas': STATUS_PENDENTE},
+            size = 10000
+        )
+        resultados = self.filtrar_cache(resultados, metricas_locais.VERSAO_ANALISADOR)
+
+        def lotes():
+            lote = []
+            for resultado in resultados:
+                lote.append((resultado['id_resultado'], resultado['codigo_fonte'], resultado['linguagem']))
+                if len(lote) >= tamanho_lote:
+                    yield lote
+                    lote = []
+            if lote:
+                yield lote
+
+        total = 0
+        inicio = time.time()
+        with ProcessPoolExecutor(max_workers=quantidade_processos) as executor:
+            # Gravação no banco fica no processo principal; os workers só calculam
+            em_andamento = deque()
+            for lote in lotes():
+                em_andamento.append((lote, executor.submit(metricas_locais.calcular_metricas_lote, lote)))
+                if len(em_andamento) >= quantidade_processos * 2:
+                    total += self.salvar_metricas_calculadas(*em_andamento.popleft())
+            while em_andamento:
+                total += self.salvar_metricas_calculadas(*em_andamento.popleft())
+        print(f"Métricas locais calculadas para {total} resultados em {time.time() - inicio:.1f}s")
+
+    def salvar_metricas_calculadas(self, lote, futuro):
+        metricas_por_resultado = futuro.result()
+        salvos = self.salvar_metricas_lote(metricas_por_resultado)
+        for id_resultado, codigo, linguagem in lote:
+            if id_resultado in metricas_por_resultado:
+                self.cache_metricas.guardar_metricas(codigo, linguagem, metricas_locais.VERSAO_ANALISADOR, metricas_por_resultado[id_resultado])
+        return len(salvos)
+
+    def process_metricas(self, backend=None):
+        """Escolhe o backend de métricas: 'sonar' (padrão), 'sonar_lote', 'sonar_distribuido' ou 'local' (METRICAS_BACKEND)"""
+        backend = backend or os.getenv('METRICAS_BACKEND', 'sonar')
+        if backend == 'local':
+            self.process_metricas_locais()
+        elif backend == 'sonar_lote':
+            self.process_sonar_lote()
+        elif backend == 'sonar_distribuido':
+            self.process_sonar_distribuido()
+        else:
+            self.process_sonar()
+
+    def process_sonar(self, quantidade_workers=None):
+        """
+        Analisa os resultados sem métricas com até `quantidade_workers` scanners simultâneos
+        (SONAR_WORKERS no .env). A espera pelo servidor e a leitura das métricas rodam em um
+        pool à parte (SONAR_COLETORES), então cada scanner passa ao próximo resultado assim que
+        a JVM termina. Cada coletor exige um project key a mais (ver criar_workers); por isso,
+        com um único worker o padrão é nenhum coletor: só o PROJECT_KEY e o fluxo sequencial de
+        antes. Com mais workers o padrão é um coletor por worker.
+        """
+        quantidade_workers = quantidade_workers or int(os.getenv('SONAR_WORKERS', 1))
+        resultados = self.repository.select_into_table_stream(
+            table_name="resultados", 
+            campos=["id_resultado", "codigo_fonte", "linguagem"], 
+            data={'status_metricas': STATUS_PENDENTE},
+            size = 10000
+        )
+        resultados = self.filtrar_cache(resultados, self.versao_sonar())
+
+        quantidade_coletores = int(os.getenv('SONAR_COLETORES', quantidade_workers if quantidade_workers > 1 else 0))
+        # Um project key por análise em andamento (no scanner ou aguardando o servidor)
+        workers = self.criar_workers(quantidade_workers + quantidade_coletores)
+        # Limita quantos resultados (com o código-fonte) ficam em memória aguardando um worker
+        vagas = threading.BoundedSemaphore(quantidade_workers * 2)
+        coletores = ThreadPoolExecutor(max_workers=quantidade_coletores) if quantidade_coletores else None
+        try:
+            with ThreadPoolExecutor(max_workers=quantidade_workers) as executor:
+                for resultado in resultados:
+                    vagas.acquire()
+                    futuro = executor.submit(self.analisar_resultado, resultado, workers, coletores)
+                    futuro.add_done_callback(lambda _: vagas.release())
+        finally:
+            # Os scans já terminaram (e deixaram de enviar coletas) quando o pool de coletores é encerrado
+            if coletores is not None:
+                coletores.shutdown()
+
+
+class WorkerSonar:
+    def __init__(self, project_key, diretorio, sessao):
+        self.project_key = project_key
+        self.diretorio = diretorio
+        self.sessao = sessao
 
 if __name__ == "__main__":
     sonarqube_processor = executa_sonarqube()
-    sonarqube_processor.process_sonar()
\ No newline at end of file
+    if "--local" in sys.argv:
+        sonarqube_processor.process_metricas('local')
+    elif "--lote" in sys.argv:
+        sonarqube_processor.process_metricas('sonar_lote')
+    elif "--distribuido" in sys.argv:
+        sonarqube_processor.process_metricas('sonar_distribuido')
+    else:
+        sonarqube_processor.process_metricas()
\ No newline at end of file
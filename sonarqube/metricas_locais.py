@@ -0,0 +1,248 @@
+import ast
+import hashlib
+import io
+import re
+import tokenize
+
+# Incrementar sempre que as regras abaixo mudarem (usado para invalidar caches de métricas)
+VERSAO_ANALISADOR = "local-1"
+
+# Mesmo critério de tamanho mínimo de bloco duplicado usado pelo CPD do Sonar
+LINHAS_BLOCO_DUPLICADO = 10
+
+LIMITE_PARAMETROS = 7
+LIMITE_COMPLEXIDADE_FUNCAO = 15
+LIMITE_ANINHAMENTO = 3
+LIMITE_TAMANHO_LINHA = 120
+
+PALAVRAS_CONTROLE_JAVA = {'if', 'for', 'while', 'switch', 'catch', 'synchronized', 'return', 'new', 'else', 'do', 'try'}
+
+
+def calcular_metricas(codigo, linguagem):
+    """
+    Calcula localmente as mesmas métricas buscadas no Sonar, com as mesmas chaves
+    (complexity, ncloc, duplicated_lines_density, code_smells), para uso em salvar_metricas.
+    """
+    if "python" in linguagem.lower():
+        linhas_codigo, complexidade, code_smells = analisar_python(codigo)
+    else:
+        linhas_codigo, complexidade, code_smells = analisar_java(codigo)
+
+    return {
+        'complexity': complexidade,
+        'ncloc': len(linhas_codigo),
+        'duplicated_lines_density': densidade_duplicacao(linhas_codigo),
+        'code_smells': code_smells,
+    }
+
+
+def calcular_metricas_lote(lote):
+    """Recebe [(id_resultado, codigo_fonte, linguagem)] e devolve {id_resultado: métricas}; roda em outro processo"""
+    metricas_por_resultado = {}
+    for id_resultado, codigo, linguagem in lote:
+        try:
+            metricas_por_resultado[id_resultado] = calcular_metricas(codigo or "", linguagem)
+        except Exception as e:
+            print(f"Erro ao calcular métricas locais do ID {id_resultado}: {e}")
+    return metricas_por_resultado
+
+
+def densidade_duplicacao(linhas_codigo):
+    """Percentual de linhas de código que fazem parte de blocos de LINHAS_BLOCO_DUPLICADO linhas repetidos no arquivo"""
+    if len(linhas_codigo) < 2 * LINHAS_BLOCO_DUPLICADO:
+        return 0.0
+
+    normalizadas = [re.sub(r'\s+', ' ', linha).strip() for linha in linhas_codigo]
+    blocos = {}
+    for inicio in range(len(normalizadas) - LINHAS_BLOCO_DUPLICADO + 1):
+        bloco = "\n".join(normalizadas[inicio:inicio + LINHAS_BLOCO_DUPLICADO])
+        chave = hashlib.blake2b(bloco.encode('utf-8'), digest_size=8).digest()
+        blocos.setdefault(chave, []).append(inicio)
+
+    duplicadas = set()
+    for inicios in blocos.values():
+        if len(inicios) > 1:
+            for inicio in inicios:
+                duplicadas.update(range(inicio, inicio + LINHAS_BLOCO_DUPLICADO))
+    return round(100.0 * len(duplicadas) / len(linhas_codigo), 1)
+
+
+def linhas_longas(codigo):
+    return sum(1 for linha in codigo.splitlines() if len(linha) > LIMITE_TAMANHO_LINHA)
+
+
+# ---------------------------------------------------------------- Python
+
+class VisitanteComplexidade(ast.NodeVisitor):
+    """Soma a complexidade ciclomática no estilo do Sonar e conta code smells estruturais"""
+
+    def __init__(self):
+        self.complexidade = 0
+        self.code_smells = 0
+        self.aninhamento = 0
+
+    def visitar_funcao(self, node):
+        argumentos = node.args
+        total_parametros = len(argumentos.posonlyargs) + len(argumentos.args) + len(argumentos.kwonlyargs)
+        if total_parametros - (1 if argumentos.args and argumentos.args[0].arg in ('self', 'cls') else 0) > LIMITE_PARAMETROS:
+            self.code_smells += 1
+
+        complexidade_externa = self.complexidade
+        aninhamento_externo = self.aninhamento
+        self.complexidade = 1
+        self.aninhamento = 0
+        self.generic_visit(node)
+        if self.complexidade > LIMITE_COMPLEXIDADE_FUNCAO:
+            self.code_smells += 1
+        self.complexidade += complexidade_externa
+        self.aninhamento = aninhamento_externo
+
+    visit_FunctionDef = visitar_funcao
+    visit_AsyncFunctionDef = visitar_funcao
+
+    def visit_Lambda(self, node):
+        self.complexidade += 1
+        self.generic_visit(node)
+
+    def visitar_bloco(self, node):
+        self.complexidade += 1
+        self.aninhamento += 1
+        if self.aninhamento == LIMITE_ANINHAMENTO + 1:
+            self.code_smells += 1
+        self.generic_visit(node)
+        self.aninhamento -= 1
+
+    visit_If = visitar_bloco
+    visit_For = visitar_bloco
+    visit_AsyncFor = visitar_bloco
+    visit_While = visitar_bloco
+
+    def visit_Try(self, node):
+        self.aninhamento += 1
+        self.generic_visit(node)
+        self.aninhamento -= 1
+
+    def visit_ExceptHandler(self, node):
+        # except: genérico ou except que só faz pass
+        if node.type is None or (len(node.body) == 1 and isinstance(node.body[0], ast.Pass)):
+            self.code_smells += 1
+        self.generic_visit(node)
+
+    def visit_IfExp(self, node):
+        self.complexidade += 1
+        self.generic_visit(node)
+
+    def visit_BoolOp(self, node):
+        self.complexidade += len(node.values) - 1
+        self.generic_visit(node)
+
+    def visit_comprehension(self, node):
+        self.complexidade += 1 + len(node.ifs)
+        self.generic_visit(node)
+
+    def visit_match_case(self, node):
+        self.complexidade += 1
+        self.generic_visit(node)
+
+
+def linhas_codigo_python(codigo):
+    numeros = set()
+    ignorados = {tokenize.COMMENT, tokenize.NL, tokenize.NEWLINE, tokenize.INDENT, tokenize.DEDENT, tokenize.ENCODING, tokenize.ENDMARKER}
+    for token in tokenize.generate_tokens(io.StringIO(codigo).readline):
+        if token.type not in ignorados:
+            numeros.update(range(token.start[0], token.end[0] + 1))
+    linhas = codigo.splitlines()
+    return [linhas[numero - 1] for numero in sorted(numeros) if numero <= len(linhas)]
+
+
+def analisar_python(codigo):
+    try:
+        arvore = ast.parse(codigo)
+        linhas_codigo = linhas_codigo_python(codigo)
+    except (SyntaxError, ValueError, tokenize.TokenError):
+        # Código que não compila: mesma heurística por tokens usada para Java
+        return analisar_java(codigo)
+
+    visitante = VisitanteComplexidade()
+    visitante.visit(arvore)
+    comentarios_pendentes = len(re.findall(r'#\s*(TODO|FIXME)', codigo))
+    return linhas_codigo, visitante.complexidade, visitante.code_smells + comentarios_pendentes + linhas_longas(codigo)
+
+
+# ---------------------------------------------------------------- Java
+
+TOKEN_JAVA = re.compile(
+    r'(?P<comentario>//[^\n]*|/\*.*?\*/)'
+    r'|(?P<texto>"""(?:.|\n)*?"""|"(?:\\.|[^"\\\n])*"|\'(?:\\.|[^\'\\\n])*\')'
+    r'|(?P<palavra>[A-Za-z_$][\w$]*)'
+    r'|(?P<operador>&&|\|\||->|::|[{}()\[\];,?:])',
+    re.DOTALL
+)
+
+PADRAO_METODO_JAVA = re.compile(r'(?P<nome>[A-Za-z_$][\w$]*)\s*\((?P<parametros>[^()]*)\)\s*(?:throws\s+[\w.$,\s]+)?\{')
+
+
+def linhas_codigo_java(codigo):
+    sem_comentarios = TOKEN_JAVA.sub(lambda m: re.sub(r'[^\n]', ' ', m.group()) if m.group('comentario') else m.group(), codigo)
+    return [linha for linha in sem_comentarios.splitlines() if linha.strip()]
+
+
+def analisar_java(codigo):
+    """Tokenizador leve: ignora comentários e literais de texto e conta os pontos de decisão"""
+    complexidade = 0
+    code_smells = len(re.findall(r'//\s*(TODO|FIXME)|/\*\s*(TODO|FIXME)', codigo))
+    aninhamento = 0
+    blocos_controle = []
+    ultimo_controle = None
+    anterior = None
+    parenteses = 0
+    tokens_codigo = []
+
+    for token in TOKEN_JAVA.finditer(codigo):
+        if token.group('comentario'):
+            continue
+        valor = 'STR' if token.group('texto') else token.group()
+        tokens_codigo.append(valor)
+
+        if valor in ('if', 'for', 'while', 'case', 'catch'):
+            complexidade += 1
+            ultimo_controle = valor
+        elif valor in ('&&', '||', '?'):
+            complexidade += 1
+        elif valor == 'else' or valor == 'do' or valor == 'try' or valor == 'switch':
+            ultimo_controle = valor
+        elif valor == '(':
+            parenteses += 1
+        elif valor == ')':
+            parenteses = max(0, parenteses - 1)
+        elif valor == ';' and parenteses == 0:
+            # if/for/while sem chaves: o controle termina no fim da instrução
+            ultimo_controle = None
+        elif valor == '{':
+            controle = ultimo_controle is not None
+            blocos_controle.append(controle)
+            if controle:
+                aninhamento += 1
+                if aninhamento == LIMITE_ANINHAMENTO + 1:
+                    code_smells += 1
+            # catch vazio
+            if anterior == ')' and ultimo_controle == 'catch':
+                proximo = codigo[token.end():].lstrip()
+                if proximo.startswith('}'):
+                    code_smells += 1
+            ultimo_controle = None
+        elif valor == '}':
+            if blocos_controle and blocos_controle.pop():
+                aninhamento -= 1
+        anterior = valor
+
+    sem_comentarios_e_textos = " ".join(tokens_codigo)
+    for metodo in PADRAO_METODO_JAVA.finditer(sem_comentarios_e_textos):
+        if metodo.group('nome') in PALAVRAS_CONTROLE_JAVA:
+            continue
+        complexidade += 1
+        parametros = [p for p in metodo.group('parametros').split(',') if p.strip()]
+        if len(parametros) > LIMITE_PARAMETROS:
+            code_smells += 1
+
+    return linhas_codigo_java(codigo), complexidade, code_smells + linhas_longas(codigo)